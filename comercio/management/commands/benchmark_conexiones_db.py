@@ -0,0 +1,76 @@
+# management/commands/benchmark_conexiones_db.py
+import statistics
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand
+from django.core.signals import request_started, request_finished
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide la latencia por request simulada contra la base de datos: '
+        'conexión nueva por request, conexión persistente (CONN_MAX_AGE) y pool de psycopg'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests simulados por modo')
+        parser.add_argument('--consultas', type=int, default=3, help='Consultas por request')
+        parser.add_argument('--conn-max-age', type=int, default=60, help='CONN_MAX_AGE del modo persistente')
+        parser.add_argument('--pool', action='store_true', help='Incluir el modo pool (requiere psycopg 3)')
+        parser.add_argument('--database', default='default', help='Alias de base de datos a copiar')
+
+    def handle(self, *args, **options):
+        base = dict(connections[options['database']].settings_dict)
+        opciones_base = {k: v for k, v in base.get('OPTIONS', {}).items() if k != 'pool'}
+
+        modos = [
+            ('sin_persistencia', {'CONN_MAX_AGE': 0, 'OPTIONS': dict(opciones_base)}),
+            ('persistente', {'CONN_MAX_AGE': options['conn_max_age'], 'OPTIONS': dict(opciones_base)}),
+        ]
+        if options['pool']:
+            modos.append(('pool', {
+                'CONN_MAX_AGE': 0,
+                'OPTIONS': {**opciones_base, 'pool': {'min_size': 1, 'max_size': 4}},
+            }))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Benchmark de conexiones: {options['requests']} requests x {options['consultas']} consultas "
+            f"contra {base.get('HOST') or 'localhost'}:{base.get('PORT') or ''}"
+        ))
+
+        for nombre, ajustes in modos:
+            alias = f'benchmark_{nombre}'
+            connections.settings[alias] = {**base, **ajustes}
+            try:
+                tiempos = self._medir(alias, options['requests'], options['consultas'])
+            except ImproperlyConfigured as e:
+                self.stdout.write(self.style.WARNING(f'  {nombre}: omitido ({e})'))
+                continue
+            finally:
+                connections[alias].close()
+                if hasattr(connections[alias], 'close_pool'):
+                    connections[alias].close_pool()
+
+            tiempos.sort()
+            p95 = tiempos[int(len(tiempos) * 0.95) - 1]
+            self.stdout.write(
+                f'  {nombre:<17} media {statistics.mean(tiempos):7.2f} ms | '
+                f'p50 {statistics.median(tiempos):7.2f} ms | p95 {p95:7.2f} ms'
+            )
+
+    def _medir(self, alias, total_requests, consultas):
+        conexion = connections[alias]
+        tiempos = []
+        for _ in range(total_requests):
+            inicio = time.perf_counter()
+            # Mismo ciclo que un request real: close_old_connections al inicio y al final
+            request_started.send(sender=self.__class__)
+            with conexion.cursor() as cursor:
+                for _ in range(consultas):
+                    cursor.execute('SELECT 1')
+                    cursor.fetchone()
+            request_finished.send(sender=self.__class__)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return tiempos
@@ -2,6 +2,8 @@
 from rest_framework.response import Response
 from rest_framework import status
 from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
 from usuario.models import Privilegio, Grupo
 
 def requiere_permiso(componente, accion):
@@ -49,27 +51,63 @@ def has_permission(usuario, componente_nombre, accion):
         print("❌ ERROR: Usuario no tiene grupo asignado")
         return False
 
-    try:
-        privilegio = Privilegio.objects.get(
-            grupo=usuario.grupo,
-            componente__nombre__iexact=componente_nombre,
-            componente__is_active=True
-        )
-        
-    except Privilegio.DoesNotExist:
+    # Matriz de privilegios del grupo en caché (una consulta por grupo hasta que cambie)
+    mapping = obtener_matriz_privilegios(usuario.grupo_id).get(componente_nombre.lower())
+    if mapping is None:
         print(f"❌ ERROR: No existe privilegio para grupo '{usuario.grupo}' y componente '{componente_nombre}'")
         return False
-    
-    mapping = {
-        "leer": privilegio.puede_leer,
-        "crear": privilegio.puede_crear,
-        "actualizar": privilegio.puede_actualizar,
-        "eliminar": privilegio.puede_eliminar,
-    }
 
     resultado = mapping.get(accion, False)
     return resultado
 
+# --------------------------
+# Caché de la matriz de privilegios por grupo
+# --------------------------
+# Con Redis la invalidación llega a todos los workers y la matriz puede vivir minutos.
+# Con la memoria local del proceso, invalidar solo limpia el worker que hizo el cambio:
+# los demás ven los privilegios nuevos cuando vence el TTL, por eso ahí es de segundos.
+PRIVILEGIOS_CACHE_TTL = getattr(
+    settings, 'PRIVILEGIOS_CACHE_TTL',
+    60 * 10 if getattr(settings, 'CACHE_COMPARTIDA', False) else 5
+)
+
+
+def _clave_privilegios(grupo_id):
+    return f"privilegios:grupo:{grupo_id}"
+
+
+def obtener_matriz_privilegios(grupo_id):
+    """{nombre de componente en minúsculas: {"leer": bool, "crear": ..., "actualizar": ..., "eliminar": ...}}"""
+    clave = _clave_privilegios(grupo_id)
+    matriz = cache.get(clave)
+    if matriz is None:
+        matriz = {
+            nombre.lower(): {
+                "leer": leer,
+                "crear": crear,
+                "actualizar": actualizar,
+                "eliminar": eliminar,
+            }
+            for nombre, leer, crear, actualizar, eliminar in Privilegio.objects.filter(
+                grupo_id=grupo_id, componente__is_active=True
+            ).values_list(
+                'componente__nombre', 'puede_leer', 'puede_crear', 'puede_actualizar', 'puede_eliminar'
+            )
+        }
+        cache.set(clave, matriz, PRIVILEGIOS_CACHE_TTL)
+    return matriz
+
+
+def invalidar_privilegios_grupo(grupo_id=None):
+    """
+    Invalida la matriz de un grupo, o la de todos si no se indica (p. ej. al cambiar un componente).
+    Sin caché compartida solo afecta a este proceso (ver PRIVILEGIOS_CACHE_TTL).
+    """
+    if grupo_id is not None:
+        cache.delete(_clave_privilegios(grupo_id))
+        return
+    cache.delete_many([_clave_privilegios(id_) for id_ in Grupo.objects.values_list('id', flat=True)])
+
 # Alias para mayor claridad
 requiere_lectura = lambda componente: requiere_permiso(componente, "leer")
 requiere_creacion = lambda componente: requiere_permiso(componente, "crear")
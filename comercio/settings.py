@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # índices OpClass de usuario
     'cloudinary',
     'cloudinary_storage',
     'corsheaders',
@@ -49,7 +50,8 @@ INSTALLED_APPS = [
     'reportes',
     'rest_framework',
     'rest_framework_simplejwt',
-    'drf_yasg'
+    'drf_yasg',
+    'comercio',  # comandos de gestión a nivel de proyecto
 ]
 
 # Configuración de Cloudinary (Obligatorio)
@@ -61,6 +63,20 @@ from decouple import config
 STRIPE_PUBLISHABLE_KEY = config('STRIPE_PUBLISHABLE_KEY')
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY')
 FRONTEND_URL = config('FRONTEND_URL')
+# Solo para apuntar a un Stripe simulado (pruebas de carga); en producción se deja vacío
+STRIPE_API_BASE = config('STRIPE_API_BASE', default='')
+STRIPE_WEBHOOK_SECRET = config('STRIPE_WEBHOOK_SECRET', default='')
+# El webhook guarda el evento y responde 200; si es True además lo procesa en un hilo al confirmar.
+# Con False solo lo procesa el worker (python manage.py procesar_eventos_stripe --continuo)
+STRIPE_EVENTOS_PROCESAR_AL_RECIBIR = config('STRIPE_EVENTOS_PROCESAR_AL_RECIBIR', default=True, cast=bool)
+STRIPE_EVENTOS_MAX_INTENTOS = config('STRIPE_EVENTOS_MAX_INTENTOS', default=8, cast=int)
+# Cada cuántos segundos se vuelve a preguntar a Stripe por una sesión de pago todavía abierta (venta/estado_pagos.py)
+STRIPE_ESTADO_PAGO_TTL = config('STRIPE_ESTADO_PAGO_TTL', default=10, cast=int)
+# Minutos que el stock queda reservado al agregarlo al carrito y al iniciar el pago (venta/reservas.py)
+RESERVA_STOCK_MINUTOS_CARRITO = config('RESERVA_STOCK_MINUTOS_CARRITO', default=15, cast=int)
+RESERVA_STOCK_MINUTOS_PAGO = config('RESERVA_STOCK_MINUTOS_PAGO', default=30, cast=int)
+# Cada cuántos segundos se aplican a la BD las ventas flash descontadas en caché (0 = solo con el comando)
+VENTA_FLASH_RECONCILIAR_SEGUNDOS = config('VENTA_FLASH_RECONCILIAR_SEGUNDOS', default=2, cast=int)
 # Asegúrate de que estas variables de entorno existan en tu servidor/entorno local
 cloudinary.config( 
   cloud_name = config('CLOUDINARY_CLOUD_NAME'),
@@ -68,9 +84,15 @@ cloudinary.config(
   api_secret = config('CLOUDINARY_API_SECRET')
 )
 
+# AUTH_CLAIMS_JWT: arma request.user desde los claims del token sin consultar la tabla usuario
+# (usuario/authentication.py). El estado (activo, grupo, revocación) se cachea AUTH_ESTADO_USUARIO_TTL segundos.
+AUTH_CLAIMS_JWT = config('AUTH_CLAIMS_JWT', default=True, cast=bool)
+AUTH_ESTADO_USUARIO_TTL = config('AUTH_ESTADO_USUARIO_TTL', default=30, cast=int)
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'usuario.authentication.ClaimsJWTAuthentication' if AUTH_CLAIMS_JWT
+        else 'rest_framework_simplejwt.authentication.JWTAuthentication',
     )
 }
 
@@ -85,6 +107,13 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
 }
 
+# Cliente LLM compartido (utils/llm_client.py)
+LLM_TIMEOUT_SEGUNDOS = config('LLM_TIMEOUT_SEGUNDOS', default=15, cast=int)
+LLM_MAX_CONCURRENCIA = config('LLM_MAX_CONCURRENCIA', default=4, cast=int)
+LLM_ESPERA_COLA_SEGUNDOS = config('LLM_ESPERA_COLA_SEGUNDOS', default=2, cast=int)
+LLM_CIRCUITO_UMBRAL_ERROR = config('LLM_CIRCUITO_UMBRAL_ERROR', default=0.5, cast=float)
+LLM_CIRCUITO_ENFRIAMIENTO_SEGUNDOS = config('LLM_CIRCUITO_ENFRIAMIENTO_SEGUNDOS', default=30, cast=int)
+
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -92,10 +121,20 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'venta.idempotencia.IdempotenciaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Rutas (nombre de URL) donde se respeta la cabecera Idempotency-Key (venta/idempotencia.py)
+IDEMPOTENCIA_RUTAS = [
+    'generar_pedido',
+    'crear_sesion_stripe',
+    'crear-payment-intent',
+    'crear_sesion_stripe_async',
+    'crear-payment-intent-async',
+]
+
 ROOT_URLCONF = 'comercio.urls'
 
 TEMPLATES = [
@@ -114,26 +153,68 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'comercio.wsgi.application'
+# Modo async: SERVIDOR_ASGI=True uvicorn comercio.asgi:application --workers 2
+ASGI_APPLICATION = 'comercio.asgi.application'
+SERVIDOR_ASGI = config('SERVIDOR_ASGI', default=False, cast=bool)
 
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
 
+# Conexiones a la base de datos (configurable por entorno):
+#   DB_SSLMODE            -> 'require' en producción, 'disable' para un Postgres local
+#   DB_CONN_MAX_AGE       -> segundos que se reutiliza una conexión persistente (0 = una por request);
+#                            bajo ASGI (SERVIDOR_ASGI) siempre 0: las conexiones persistentes quedan
+#                            atadas a hilos de sync_to_async y no se cierran, Django recomienda el pool
+#   DB_CONN_HEALTH_CHECKS -> verifica la conexión persistente antes de reutilizarla
+#   DB_POOL               -> usa el pool de psycopg 3 (activo por defecto bajo ASGI);
+#                            con pool activo Django exige CONN_MAX_AGE = 0
+DB_POOL = config('DB_POOL', default=SERVIDOR_ASGI, cast=bool)
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'django.db.backends.postgresql',
         'NAME': config('DB_NAME'),
         'USER': config('DB_USER'),
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST'),
         'PORT': config('DB_PORT', cast=int),
+        'CONN_MAX_AGE': 0 if DB_POOL or SERVIDOR_ASGI else config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
         'OPTIONS': {
-            'sslmode': 'require',  # Deshabilita el uso de SSL
+            'sslmode': config('DB_SSLMODE', default='require'),
         },
     }    
 } 
 
+if DB_POOL:
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': config('DB_POOL_MIN', default=2, cast=int),
+        'max_size': config('DB_POOL_MAX', default=10, cast=int),
+        'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+    }
+
+# Caché compartida. Con CACHE_REDIS_URL (redis://...) todos los procesos ven los mismos contadores
+# (ventas flash, estado de pagos, privilegios); sin ella se usa memoria local por proceso.
+# ⚠️ En producción con varios workers hace falta Redis: sin él las ventas flash quedan desactivadas.
+CACHE_REDIS_URL = config('CACHE_REDIS_URL', default='')
+CACHE_COMPARTIDA = bool(CACHE_REDIS_URL)
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'comercio',
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -154,6 +235,20 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Login: un solo backend que trae el grupo junto con el usuario (usuario/backends.py)
+AUTHENTICATION_BACKENDS = ['usuario.backends.UsuarioBackend']
+
+# Costo del hash de contraseñas. Ajustar con `python manage.py benchmark_login` según el
+# presupuesto de latencia del login; por defecto el de Django.
+PASSWORD_PBKDF2_ITERACIONES = config('PASSWORD_PBKDF2_ITERACIONES', default=1_000_000, cast=int)
+PASSWORD_HASHERS = [
+    'usuario.hashers.PBKDF2IteracionesHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -171,6 +266,17 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Imágenes de productos: 'cloudinary' o 'local' (MEDIA_ROOT, para desarrollo y pruebas)
+PRODUCTO_IMAGENES_BACKEND = config('PRODUCTO_IMAGENES_BACKEND', default='cloudinary')
+PRODUCTO_IMAGENES_TIMEOUT = config('PRODUCTO_IMAGENES_TIMEOUT', default=30, cast=int)
+PRODUCTO_IMAGENES_PARALELAS = config('PRODUCTO_IMAGENES_PARALELAS', default=6, cast=int)
+# Variantes thumbnail/card/full: 'WEBP' o 'JPEG'
+PRODUCTO_IMAGENES_FORMATO = config('PRODUCTO_IMAGENES_FORMATO', default='WEBP')
+PRODUCTO_IMAGENES_CALIDAD = config('PRODUCTO_IMAGENES_CALIDAD', default=80, cast=int)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -187,6 +293,10 @@ CORS_ALLOWED_ORIGINS = [
 ]
 # Permitir cookies / credenciales
 CORS_ALLOW_CREDENTIALS = True
+# Reintentos seguros de checkout y pagos (venta/idempotencia.py)
+from corsheaders.defaults import default_headers
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
+CORS_EXPOSE_HEADERS = ["Idempotent-Replayed", "Retry-After"]
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
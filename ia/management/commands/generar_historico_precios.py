@@ -5,6 +5,7 @@ from datetime import timedelta
 import random
 from decimal import Decimal
 from producto.models import ProductoModel, CambioPrecioModel
+from producto.precios import registrar_cambios_precio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -73,6 +74,7 @@ class Command(BaseCommand):
         fechas = self.generar_fechas_aleatorias(fecha_inicio, fecha_fin, num_cambios)
         
         cambios_creados = 0
+        cambios = []
         precio_anterior_contado = precio_actual_contado
         precio_anterior_cuota = precio_actual_cuota
         
@@ -111,17 +113,16 @@ class Command(BaseCommand):
                 precio_nuevo_contado = max(round(precio_nuevo_contado, 2), Decimal('10.00'))
                 precio_nuevo_cuota = max(round(precio_nuevo_cuota, 2), Decimal('10.00'))
                 
-                # Crear el cambio de precio
-                CambioPrecioModel.objects.create(
+                # Crear el cambio de precio (se guardan todos juntos al final)
+                cambios.append(CambioPrecioModel(
                     producto=producto,
                     precio_anterior=precio_anterior_contado,
                     precio_nuevo=precio_nuevo_contado,
                     precio_cuota_anterior=precio_anterior_cuota,
                     precio_cuota_nuevo=precio_nuevo_cuota,
                     fecha_cambio=fecha
-                )
+                ))
                 
-                cambios_creados += 1
                 precio_anterior_contado = precio_nuevo_contado
                 precio_anterior_cuota = precio_nuevo_cuota
                 
@@ -129,6 +130,12 @@ class Command(BaseCommand):
                 logger.error(f"Error producto {producto.id}: {e}")
                 continue
         
+        # Un solo insert por producto; también actualiza los resúmenes semanales/mensuales
+        try:
+            cambios_creados = len(registrar_cambios_precio(cambios))
+        except Exception as e:
+            logger.error(f"Error producto {producto.id}: {e}")
+        
         return cambios_creados
     
     def elegir_tipo_cambio(self):
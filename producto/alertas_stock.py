@@ -0,0 +1,92 @@
+# producto/alertas_stock.py
+"""
+Alertas de stock bajo (stock <= stock_minimo en productos activos).
+
+`revisar_stock_bajo` se llama desde registrar_movimientos con los productos que
+acaban de tener una salida (venta, ajuste): solo se revisan esos, con una consulta
+que usa el índice parcial producto_stock_bajo_idx. Cada producto genera como mucho
+una alerta por día (unique producto/fecha, INSERT ... ON CONFLICT DO NOTHING).
+
+Al confirmar la transacción, un hilo toma todas las alertas aún no notificadas
+(SELECT ... FOR UPDATE SKIP LOCKED, así dos procesos no avisan dos veces) y envía
+una sola notificación a los administradores con todo el lote.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from comercio.utils import NotificacionService
+from .models import AlertaStockModel, ProductoModel
+
+logger = logging.getLogger(__name__)
+
+MAX_NOMBRES_NOTIFICACION = 5
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="alertas-stock")
+
+
+def productos_stock_bajo():
+    """Productos activos en o bajo su punto de reposición (usa el índice parcial)."""
+    return ProductoModel.objects.filter(is_active=True, stock__lte=F('stock_minimo'))
+
+
+def revisar_stock_bajo(producto_ids):
+    """Crea las alertas del día de los productos indicados que quedaron con stock bajo."""
+    bajos = list(productos_stock_bajo().filter(id__in=producto_ids).values_list('id', 'stock', 'stock_minimo'))
+    if not bajos:
+        return 0
+    hoy = timezone.localdate()
+    AlertaStockModel.objects.bulk_create(
+        [AlertaStockModel(producto_id=pid, fecha=hoy, stock=stock, stock_minimo=minimo) for pid, stock, minimo in bajos],
+        ignore_conflicts=True,
+    )
+    transaction.on_commit(lambda: _executor.submit(_notificar_en_hilo))
+    return len(bajos)
+
+
+def _notificar_en_hilo():
+    try:
+        notificar_pendientes()
+    except Exception as e:
+        logger.error("Error notificando alertas de stock: %s", e)
+    finally:
+        close_old_connections()
+
+
+def _mensaje(alertas):
+    if len(alertas) == 1:
+        alerta = alertas[0]
+        return (f"Stock bajo: {alerta.producto.nombre}",
+                f"Quedan {alerta.stock} unidades (mínimo {alerta.stock_minimo})")
+    nombres = ", ".join(f"{a.producto.nombre} ({a.stock})" for a in alertas[:MAX_NOMBRES_NOTIFICACION])
+    resto = len(alertas) - MAX_NOMBRES_NOTIFICACION
+    if resto > 0:
+        nombres += f" y {resto} más"
+    return f"{len(alertas)} productos con stock bajo", nombres
+
+
+def notificar_pendientes():
+    """Envía en una sola notificación las alertas no notificadas. Devuelve cuántas."""
+    with transaction.atomic():
+        alertas = list(
+            AlertaStockModel.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(notificada=False).select_related('producto').order_by('stock', 'id')
+        )
+        if not alertas:
+            return 0
+        AlertaStockModel.objects.filter(id__in=[a.id for a in alertas]).update(notificada=True)
+
+    titulo, mensaje = _mensaje(alertas)
+    try:
+        NotificacionService.enviar_a_administradores(titulo, mensaje, {
+            "tipo": "stock_bajo",
+            "productos": ",".join(str(a.producto_id) for a in alertas),
+        })
+    except Exception:
+        # Se reintentan en el próximo disparo
+        AlertaStockModel.objects.filter(id__in=[a.id for a in alertas]).update(notificada=False)
+        raise
+    return len(alertas)
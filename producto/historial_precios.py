@@ -0,0 +1,240 @@
+# producto/historial_precios.py
+"""
+Series de historial de precios pre-agregadas.
+
+Cada cambio de precio (CambioPrecioModel) se acumula en ResumenPrecioModel por
+producto, semana y mes: mínimo, máximo, suma, último precio y estadísticas de
+variación (mín/máx/suma/suma de cuadrados) para contado y cuota. Así una gráfica
+de 24 meses lee como máximo 24 filas (o ~104 semanales) en lugar de todo el
+historial, y las estadísticas se calculan sobre esos acumulados.
+
+La variación de cada cambio se mide contra su propio `precio_anterior`.
+"""
+import math
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+
+from .models import CambioPrecioModel, ResumenPrecioModel
+
+GRANULARIDADES = ('semana', 'mes')
+TIPOS_PRECIO = {
+    # tipo: (campo anterior, campo nuevo) en CambioPrecioModel
+    'contado': ('precio_anterior', 'precio_nuevo'),
+    'cuota': ('precio_cuota_anterior', 'precio_cuota_nuevo'),
+}
+
+
+def inicio_periodo(fecha, granularidad):
+    if granularidad == 'semana':
+        return fecha - timedelta(days=fecha.weekday())
+    return fecha.replace(day=1)
+
+
+def elegir_granularidad(meses):
+    """Granularidad por defecto según la ventana pedida: cambios sueltos en ventanas cortas, rollups en las largas."""
+    if meses <= 3:
+        return 'cambio'
+    if meses <= 12:
+        return 'semana'
+    return 'mes'
+
+
+# --------------------------
+# Mantenimiento de los resúmenes
+# --------------------------
+def _acumular(resumen, cambio):
+    """Suma un cambio de precio (en orden cronológico) al resumen de su periodo."""
+    for tipo, (campo_anterior, campo_nuevo) in TIPOS_PRECIO.items():
+        anterior = getattr(cambio, campo_anterior) or Decimal('0')
+        nuevo = getattr(cambio, campo_nuevo) or Decimal('0')
+
+        if resumen.cantidad == 0:
+            setattr(resumen, f'{tipo}_minimo', nuevo)
+            setattr(resumen, f'{tipo}_maximo', nuevo)
+        else:
+            setattr(resumen, f'{tipo}_minimo', min(getattr(resumen, f'{tipo}_minimo'), nuevo))
+            setattr(resumen, f'{tipo}_maximo', max(getattr(resumen, f'{tipo}_maximo'), nuevo))
+        setattr(resumen, f'{tipo}_suma', getattr(resumen, f'{tipo}_suma') + nuevo)
+        setattr(resumen, f'{tipo}_ultimo', nuevo)
+
+        if anterior > 0:
+            variacion = float((nuevo - anterior) / anterior * 100)
+            if getattr(resumen, f'{tipo}_var_cantidad') == 0:
+                setattr(resumen, f'{tipo}_var_minima', variacion)
+                setattr(resumen, f'{tipo}_var_maxima', variacion)
+            else:
+                setattr(resumen, f'{tipo}_var_minima', min(getattr(resumen, f'{tipo}_var_minima'), variacion))
+                setattr(resumen, f'{tipo}_var_maxima', max(getattr(resumen, f'{tipo}_var_maxima'), variacion))
+            setattr(resumen, f'{tipo}_var_cantidad', getattr(resumen, f'{tipo}_var_cantidad') + 1)
+            setattr(resumen, f'{tipo}_var_suma', getattr(resumen, f'{tipo}_var_suma') + variacion)
+            setattr(resumen, f'{tipo}_var_suma_cuadrados',
+                    getattr(resumen, f'{tipo}_var_suma_cuadrados') + variacion * variacion)
+            setattr(resumen, f'{tipo}_var_ultima', variacion)
+
+    resumen.cantidad += 1
+    resumen.fecha_ultimo_cambio = cambio.fecha_cambio
+
+
+def actualizar_resumenes(cambios):
+    """
+    Acumula cambios de precio ya guardados en sus resúmenes semanal y mensual.
+    Los periodos que aún no tienen fila se insertan vacíos (ON CONFLICT DO NOTHING, por
+    la restricción única producto/granularidad/periodo); después todas las filas se
+    bloquean con una sola consulta y se escriben en bloque. Así dos transacciones que
+    abren el mismo periodo a la vez no chocan: la segunda espera el bloqueo y acumula
+    sobre lo que dejó la primera.
+    Debe llamarse dentro de la misma transacción que guarda los cambios.
+    """
+    cambios = sorted((c for c in cambios if c.fecha_cambio), key=lambda c: (c.fecha_cambio, c.pk or 0))
+    if not cambios:
+        return
+
+    claves = {
+        (cambio.producto_id, granularidad, inicio_periodo(cambio.fecha_cambio, granularidad))
+        for cambio in cambios for granularidad in GRANULARIDADES
+    }
+    ResumenPrecioModel.objects.bulk_create(
+        [ResumenPrecioModel(producto_id=p, granularidad=g, periodo=periodo) for p, g, periodo in sorted(claves)],
+        batch_size=1000, ignore_conflicts=True,
+    )
+    productos = {producto_id for producto_id, _, _ in claves}
+    periodos = {periodo for _, _, periodo in claves}
+    resumenes = {
+        (r.producto_id, r.granularidad, r.periodo): r
+        for r in ResumenPrecioModel.objects.select_for_update().filter(
+            producto_id__in=productos, periodo__in=periodos
+        ).order_by('id')
+    }
+
+    for cambio in cambios:
+        for granularidad in GRANULARIDADES:
+            clave = (cambio.producto_id, granularidad, inicio_periodo(cambio.fecha_cambio, granularidad))
+            _acumular(resumenes[clave], cambio)
+
+    campos = [
+        campo.name for campo in ResumenPrecioModel._meta.concrete_fields
+        if campo.name not in ('id', 'producto', 'granularidad', 'periodo')
+    ]
+    ResumenPrecioModel.objects.bulk_update([resumenes[clave] for clave in claves], campos, batch_size=1000)
+
+
+def reconstruir_resumenes(producto_ids=None, tamano_lote=5000):
+    """Recalcula los resúmenes desde CambioPrecioModel (todo el historial o solo algunos productos)."""
+    cambios = CambioPrecioModel.objects.order_by('producto_id', 'fecha_cambio', 'id').only(
+        'id', 'producto_id', 'fecha_cambio', *[campo for par in TIPOS_PRECIO.values() for campo in par]
+    )
+    resumenes = ResumenPrecioModel.objects.all()
+    if producto_ids is not None:
+        cambios = cambios.filter(producto_id__in=producto_ids)
+        resumenes = resumenes.filter(producto_id__in=producto_ids)
+
+    total = 0
+    with transaction.atomic():
+        resumenes.delete()
+        pendientes = {}
+        producto_actual = None
+        for cambio in cambios.iterator(chunk_size=tamano_lote):
+            if cambio.producto_id != producto_actual and len(pendientes) >= tamano_lote:
+                # Los cambios vienen ordenados por producto: los resúmenes pendientes ya están completos
+                ResumenPrecioModel.objects.bulk_create(pendientes.values(), batch_size=1000)
+                pendientes = {}
+            producto_actual = cambio.producto_id
+            for granularidad in GRANULARIDADES:
+                clave = (cambio.producto_id, granularidad, inicio_periodo(cambio.fecha_cambio, granularidad))
+                resumen = pendientes.get(clave)
+                if resumen is None:
+                    resumen = ResumenPrecioModel(producto_id=clave[0], granularidad=granularidad, periodo=clave[2])
+                    pendientes[clave] = resumen
+                _acumular(resumen, cambio)
+            total += 1
+        ResumenPrecioModel.objects.bulk_create(pendientes.values(), batch_size=1000)
+    return total
+
+
+# --------------------------
+# Lectura para gráficas
+# --------------------------
+def _estadisticas(filas, tipo):
+    cantidad = sum(f['cantidad'] for f in filas)
+    if not cantidad:
+        return {}
+    var_cantidad = sum(f[f'{tipo}_var_cantidad'] for f in filas)
+    estadisticas = {
+        'precio_maximo': float(max(f[f'{tipo}_maximo'] for f in filas)),
+        'precio_minimo': float(min(f[f'{tipo}_minimo'] for f in filas)),
+        'precio_promedio': float(sum(f[f'{tipo}_suma'] for f in filas)) / cantidad,
+        'total_cambios': cantidad,
+    }
+    if var_cantidad:
+        con_variacion = [f for f in filas if f[f'{tipo}_var_cantidad']]
+        media = sum(f[f'{tipo}_var_suma'] for f in filas) / var_cantidad
+        varianza = max(sum(f[f'{tipo}_var_suma_cuadrados'] for f in filas) / var_cantidad - media * media, 0)
+        ultima = con_variacion[-1][f'{tipo}_var_ultima']
+        estadisticas.update({
+            'variacion_maxima': max(f[f'{tipo}_var_maxima'] for f in con_variacion),
+            'variacion_minima': min(f[f'{tipo}_var_minima'] for f in con_variacion),
+            'variacion_promedio': media,
+            'volatilidad': math.sqrt(varianza),
+            'tendencia': 'subida' if ultima > 0 else 'bajada' if ultima < 0 else 'estable',
+        })
+    else:
+        estadisticas.update({
+            'variacion_maxima': 0,
+            'variacion_minima': 0,
+            'variacion_promedio': 0,
+            'volatilidad': 0,
+            'tendencia': 'estable',
+        })
+    return estadisticas
+
+
+def _serie(filas, tipo):
+    precios, variaciones, minimos, maximos = [], [], [], []
+    anterior = None
+    for fila in filas:
+        precio = fila[f'{tipo}_ultimo']
+        precios.append(float(precio))
+        minimos.append(float(fila[f'{tipo}_minimo']))
+        maximos.append(float(fila[f'{tipo}_maximo']))
+        if anterior is not None and anterior > 0:
+            variaciones.append(float((precio - anterior) / anterior * 100))
+        else:
+            variaciones.append(0.0)
+        anterior = precio
+    return {
+        'precios': precios,
+        'variaciones_porcentuales': variaciones,
+        'minimos': minimos,
+        'maximos': maximos,
+    }
+
+
+def obtener_serie_resumida(producto_id, granularidad, fecha_inicio, fecha_fin, tipos=('contado', 'cuota')):
+    """
+    Devuelve (datos_grafica, estadisticas) con un punto por periodo (precio de cierre, mínimo y máximo).
+    Los periodos se incluyen completos si empiezan dentro de la ventana o la contienen.
+    """
+    campos = ['periodo', 'cantidad']
+    for tipo in tipos:
+        campos += [
+            f'{tipo}_minimo', f'{tipo}_maximo', f'{tipo}_suma', f'{tipo}_ultimo',
+            f'{tipo}_var_cantidad', f'{tipo}_var_minima', f'{tipo}_var_maxima',
+            f'{tipo}_var_suma', f'{tipo}_var_suma_cuadrados', f'{tipo}_var_ultima',
+        ]
+    filas = list(
+        ResumenPrecioModel.objects.filter(
+            producto_id=producto_id,
+            granularidad=granularidad,
+            periodo__gte=inicio_periodo(fecha_inicio, granularidad),
+            periodo__lte=fecha_fin,
+        ).order_by('periodo').values(*campos)
+    )
+
+    datos_grafica = {'labels': [fila['periodo'].isoformat() for fila in filas]}
+    estadisticas = {}
+    for tipo in tipos:
+        datos_grafica[tipo] = _serie(filas, tipo)
+        estadisticas[tipo] = _estadisticas(filas, tipo)
+    return datos_grafica, estadisticas
@@ -0,0 +1,135 @@
+# producto/imagenes.py
+"""
+Ingesta de imágenes de productos.
+
+- Backend de almacenamiento intercambiable (settings.PRODUCTO_IMAGENES_BACKEND):
+  "cloudinary" (por defecto) o "local" (carpeta MEDIA_ROOT, útil en desarrollo/pruebas),
+  o la ruta a una clase propia con los métodos `subir(archivo)` y `eliminar(identificador)`.
+- `subir_imagenes` sube todos los archivos en paralelo con un plazo por archivo;
+  si alguno falla, elimina los que ya se subieron y lanza ErrorSubidaImagen.
+"""
+import logging
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT_SUBIDA_SEGUNDOS = getattr(settings, 'PRODUCTO_IMAGENES_TIMEOUT', 30)
+MAX_SUBIDAS_PARALELAS = getattr(settings, 'PRODUCTO_IMAGENES_PARALELAS', 6)
+
+
+class ErrorSubidaImagen(Exception):
+    """Al menos una imagen no se pudo subir; las demás ya fueron revertidas."""
+
+
+# --------------------------
+# Backends de almacenamiento
+# --------------------------
+class AlmacenamientoCloudinary:
+    def __init__(self, timeout=TIMEOUT_SUBIDA_SEGUNDOS):
+        self.timeout = timeout
+
+    def subir(self, archivo, nombre=None):
+        import cloudinary.uploader
+        opciones = {"timeout": self.timeout}
+        if nombre:
+            opciones["public_id"] = nombre
+        resultado = cloudinary.uploader.upload(archivo, **opciones)
+        return {"url": resultado['secure_url'], "id": resultado['public_id']}
+
+    def eliminar(self, identificador):
+        import cloudinary.uploader
+        cloudinary.uploader.destroy(identificador)
+
+
+class AlmacenamientoLocal:
+    """Guarda los archivos en MEDIA_ROOT/productos (sustituto de Cloudinary para desarrollo y pruebas)."""
+
+    def __init__(self, carpeta=None, url_base=None):
+        self.carpeta = carpeta or os.path.join(getattr(settings, 'MEDIA_ROOT', 'media'), 'productos')
+        self.url_base = url_base or getattr(settings, 'MEDIA_URL', '/media/') + 'productos/'
+
+    def subir(self, archivo, nombre=None):
+        os.makedirs(self.carpeta, exist_ok=True)
+        extension = os.path.splitext(getattr(archivo, 'name', '') or '')[1] or '.jpg'
+        nombre_archivo = f"{nombre or uuid.uuid4().hex}{extension}"
+        ruta = os.path.join(self.carpeta, nombre_archivo)
+        if hasattr(archivo, 'seek'):
+            archivo.seek(0)
+        datos = archivo.read() if hasattr(archivo, 'read') else archivo
+        with open(ruta, 'wb') as destino:
+            destino.write(datos)
+        return {"url": self.url_base + nombre_archivo, "id": ruta}
+
+    def eliminar(self, identificador):
+        try:
+            os.remove(identificador)
+        except FileNotFoundError:
+            pass
+
+
+BACKENDS = {
+    "cloudinary": AlmacenamientoCloudinary,
+    "local": AlmacenamientoLocal,
+}
+
+
+def obtener_almacenamiento():
+    backend = getattr(settings, 'PRODUCTO_IMAGENES_BACKEND', 'cloudinary')
+    clase = BACKENDS.get(backend) or import_string(backend)
+    return clase()
+
+
+# --------------------------
+# Subida en paralelo
+# --------------------------
+_executor = ThreadPoolExecutor(max_workers=MAX_SUBIDAS_PARALELAS, thread_name_prefix="subida-imagenes")
+
+
+def _eliminar_silencioso(almacenamiento, identificador):
+    try:
+        almacenamiento.eliminar(identificador)
+    except Exception as e:
+        logger.warning("No se pudo eliminar la imagen %s: %s", identificador, e)
+
+
+def eliminar_subidas(subidas, almacenamiento=None):
+    """Revierte imágenes ya subidas (p. ej. si falla la transacción que crea las filas)."""
+    almacenamiento = almacenamiento or obtener_almacenamiento()
+    for subida in subidas:
+        _eliminar_silencioso(almacenamiento, subida["id"])
+
+
+def subir_imagenes(archivos, almacenamiento=None, timeout=TIMEOUT_SUBIDA_SEGUNDOS):
+    """
+    Sube los archivos en paralelo y devuelve [{"url", "id"}] en el mismo orden.
+    Si alguno falla o vence su plazo, elimina los subidos y lanza ErrorSubidaImagen.
+    """
+    if not archivos:
+        return []
+
+    almacenamiento = almacenamiento or obtener_almacenamiento()
+    futuros = [_executor.submit(almacenamiento.subir, archivo) for archivo in archivos]
+
+    subidas, errores = [], []
+    for indice, futuro in enumerate(futuros):
+        try:
+            subidas.append(futuro.result(timeout=timeout))
+        except FuturesTimeout:
+            errores.append(f"Imagen {indice}: tiempo de subida agotado ({timeout}s)")
+            # Si la subida termina más tarde, se elimina para no dejar archivos huérfanos
+            futuro.add_done_callback(
+                lambda f: f.exception() is None and _eliminar_silencioso(almacenamiento, f.result()["id"])
+            )
+        except Exception as e:
+            errores.append(f"Imagen {indice}: {e}")
+
+    if errores:
+        eliminar_subidas(subidas, almacenamiento)
+        raise ErrorSubidaImagen("; ".join(errores))
+
+    return subidas
@@ -0,0 +1,314 @@
+# producto/importacion.py
+"""
+Importación masiva de productos (catálogos de proveedores).
+
+Acepta una lista de diccionarios, JSON lines o CSV. Las filas se validan por lotes
+con las subcategorías y marcas precargadas en memoria, y cada lote se escribe con
+`bulk_create` / `bulk_update` dentro de su propia transacción. Si la fila trae un
+`modelo` que ya existe, el producto se actualiza (upsert por modelo); si el modelo
+coincide con más de un producto existente, la fila se informa como error.
+
+Columnas/campos reconocidos:
+    nombre*, subcategoria_id o subcategoria (nombre)*, marca_id o marca (nombre),
+    modelo, descripcion, precio_contado, precio_cuota, stock, garantia_meses,
+    is_active, imagenes (lista de URLs; en CSV separadas por "|")
+"""
+import csv
+import io
+import json
+import time
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+
+from .models import ProductoModel, SubcategoriaModel, MarcaModel, ImagenProductoModel, CambioPrecioModel
+from .precios import registrar_cambios_precio
+from .inventario import movimiento, registrar_movimientos, movimientos_cambio_stock
+
+TAMANO_LOTE = 500
+
+CAMPOS_ACTUALIZABLES = [
+    'nombre', 'descripcion', 'subcategoria_id', 'marca_id', 'precio_contado',
+    'precio_cuota', 'stock', 'garantia_meses', 'is_active',
+]
+LARGOS_MAXIMOS = {'nombre': 100, 'descripcion': 300, 'modelo': 100}
+
+
+# --------------------------
+# Lectura de archivos
+# --------------------------
+def leer_filas(archivo, formato=None):
+    """Genera (numero_fila, dict) desde un archivo CSV o JSON lines; las líneas ilegibles generan (numero, Exception)."""
+    nombre = getattr(archivo, 'name', '') or ''
+    formato = (formato or ('csv' if nombre.lower().endswith('.csv') else 'jsonl')).lower()
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig') if not isinstance(archivo, io.TextIOBase) else archivo
+
+    if formato == 'csv':
+        for numero, fila in enumerate(csv.DictReader(texto), start=1):
+            fila = {k.strip(): (v.strip() if isinstance(v, str) else v) for k, v in fila.items() if k}
+            if fila.get('imagenes'):
+                fila['imagenes'] = [url.strip() for url in fila['imagenes'].split('|') if url.strip()]
+            yield numero, fila
+    else:
+        for numero, linea in enumerate(texto, start=1):
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                yield numero, json.loads(linea)
+            except json.JSONDecodeError as e:
+                yield numero, e
+
+
+# --------------------------
+# Validación
+# --------------------------
+class _Catalogos:
+    """Subcategorías y marcas precargadas (tablas pequeñas) para resolver id o nombre sin consultas por fila."""
+
+    def __init__(self):
+        self.subcategorias_ids = set()
+        self.subcategorias_nombre = {}
+        for id_, nombre in SubcategoriaModel.objects.values_list('id', 'nombre'):
+            self.subcategorias_ids.add(id_)
+            self.subcategorias_nombre[(nombre or '').strip().lower()] = id_
+
+        self.marcas_ids = set()
+        self.marcas_nombre = {}
+        for id_, nombre in MarcaModel.objects.values_list('id', 'nombre'):
+            self.marcas_ids.add(id_)
+            self.marcas_nombre[(nombre or '').strip().lower()] = id_
+
+    @staticmethod
+    def _resolver(fila, campo, ids, por_nombre):
+        valor_id = fila.get(f'{campo}_id')
+        if valor_id not in (None, ''):
+            try:
+                valor_id = int(valor_id)
+            except (TypeError, ValueError):
+                return None, f"{campo}_id inválido"
+            return (valor_id, None) if valor_id in ids else (None, f"{campo} {valor_id} no existe")
+        nombre = fila.get(campo)
+        if nombre not in (None, ''):
+            valor_id = por_nombre.get(str(nombre).strip().lower())
+            return (valor_id, None) if valor_id else (None, f"{campo} '{nombre}' no existe")
+        return None, None
+
+    def subcategoria(self, fila):
+        return self._resolver(fila, 'subcategoria', self.subcategorias_ids, self.subcategorias_nombre)
+
+    def marca(self, fila):
+        return self._resolver(fila, 'marca', self.marcas_ids, self.marcas_nombre)
+
+
+def _decimal(valor, campo, errores):
+    if valor in (None, ''):
+        return None
+    try:
+        numero = Decimal(str(valor)).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError):
+        errores[campo] = "Debe ser un número"
+        return None
+    if numero < 0:
+        errores[campo] = "No puede ser negativo"
+    return numero
+
+
+def _entero(valor, campo, errores):
+    if valor in (None, ''):
+        return None
+    try:
+        numero = int(valor)
+    except (TypeError, ValueError):
+        errores[campo] = "Debe ser un entero"
+        return None
+    if numero < 0:
+        errores[campo] = "No puede ser negativo"
+    return numero
+
+
+def _booleano(valor):
+    if valor in (None, ''):
+        return None
+    if isinstance(valor, bool):
+        return valor
+    return str(valor).strip().lower() in ('1', 'true', 'si', 'sí', 'yes')
+
+
+def validar_fila(fila, catalogos):
+    """Devuelve (datos limpios, errores) para una fila del catálogo."""
+    errores = {}
+    if not isinstance(fila, dict):
+        return None, {"fila": "Se esperaba un objeto"}
+
+    datos = {}
+    for campo in ('nombre', 'descripcion', 'modelo'):
+        valor = fila.get(campo)
+        valor = str(valor).strip() if valor not in (None, '') else None
+        if valor and len(valor) > LARGOS_MAXIMOS[campo]:
+            errores[campo] = f"Máximo {LARGOS_MAXIMOS[campo]} caracteres"
+        datos[campo] = valor
+    if not datos['nombre']:
+        errores['nombre'] = "Campo requerido"
+
+    subcategoria_id, error = catalogos.subcategoria(fila)
+    if error:
+        errores['subcategoria'] = error
+    elif subcategoria_id is None:
+        errores['subcategoria'] = "Campo requerido"
+    datos['subcategoria_id'] = subcategoria_id
+
+    marca_id, error = catalogos.marca(fila)
+    if error:
+        errores['marca'] = error
+    datos['marca_id'] = marca_id
+
+    datos['precio_contado'] = _decimal(fila.get('precio_contado'), 'precio_contado', errores)
+    datos['precio_cuota'] = _decimal(fila.get('precio_cuota'), 'precio_cuota', errores)
+    datos['stock'] = _entero(fila.get('stock'), 'stock', errores)
+    datos['garantia_meses'] = _entero(fila.get('garantia_meses'), 'garantia_meses', errores)
+    datos['is_active'] = _booleano(fila.get('is_active'))
+
+    imagenes = fila.get('imagenes') or []
+    if not isinstance(imagenes, list) or not all(isinstance(url, str) for url in imagenes):
+        errores['imagenes'] = "Se esperaba una lista de URLs"
+        imagenes = []
+    datos['imagenes'] = imagenes
+
+    return datos, errores
+
+
+# --------------------------
+# Escritura por lotes
+# --------------------------
+def _bloquear_modelos(modelos):
+    """
+    `modelo` no es único en la tabla: dos importaciones simultáneas del mismo modelo nuevo
+    lo insertarían dos veces. Un bloqueo transaccional por modelo (pg_advisory_xact_lock,
+    en orden para no cruzarse) hace que la segunda espere y lo encuentre ya creado.
+    """
+    if not modelos or connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_advisory_xact_lock(hashtext(m)) FROM (SELECT m FROM unnest(%s::text[]) AS m ORDER BY m) AS modelos",
+            [sorted(modelos)],
+        )
+
+
+def _procesar_lote(lote, catalogos, resultado):
+    """lote: [(numero_fila, fila)]. Valida, resuelve existentes por modelo y escribe en una transacción."""
+    validas = []
+    modelos_vistos = set()
+    for numero, fila in lote:
+        if isinstance(fila, Exception):
+            resultado['errores'].append({"index": numero, "modelo": None, "errors": {"fila": f"JSON inválido: {fila}"}})
+            continue
+        datos, errores = validar_fila(fila, catalogos)
+        modelo = datos.get('modelo') if datos else None
+        if modelo and modelo in modelos_vistos:
+            errores['modelo'] = "Modelo repetido en el mismo lote"
+        if errores:
+            resultado['errores'].append({"index": numero, "modelo": modelo, "errors": errores})
+            continue
+        if modelo:
+            modelos_vistos.add(modelo)
+        validas.append((numero, datos))
+
+    if not validas:
+        return
+
+    ambiguas = []
+    try:
+        with transaction.atomic():
+            _bloquear_modelos(modelos_vistos)
+            # Una sola consulta (con bloqueo) para saber qué modelos ya existen
+            por_modelo = defaultdict(list)
+            if modelos_vistos:
+                for producto in ProductoModel.objects.select_for_update().filter(modelo__in=modelos_vistos).order_by('id'):
+                    por_modelo[producto.modelo].append(producto)
+
+            nuevos, nuevas_imagenes, actualizados, cambios_precio = [], [], [], []
+            stocks_anteriores = {}
+            campos_actualizados = set()
+            for numero, datos in validas:
+                coincidencias = por_modelo.get(datos['modelo']) or []
+                if len(coincidencias) > 1:
+                    # No se elige uno al azar: la fila se informa y esos productos se corrigen a mano
+                    ambiguas.append({"index": numero, "modelo": datos['modelo'], "errors": {
+                        "modelo": f"El modelo coincide con {len(coincidencias)} productos existentes "
+                                  f"(ids {', '.join(str(p.id) for p in coincidencias)})"
+                    }})
+                    continue
+                imagenes = datos.pop('imagenes')
+                if not coincidencias:
+                    valores = {k: v for k, v in datos.items() if v is not None}
+                    producto = ProductoModel(**valores)
+                    nuevos.append(producto)
+                    nuevas_imagenes.append(imagenes)
+                    continue
+
+                producto = coincidencias[0]
+                precio_anterior, precio_cuota_anterior = producto.precio_contado, producto.precio_cuota
+                stocks_anteriores[producto.id] = producto.stock
+                for campo in CAMPOS_ACTUALIZABLES:
+                    if datos.get(campo) is not None:
+                        setattr(producto, campo, datos[campo])
+                        campos_actualizados.add(campo)
+                if (producto.precio_contado, producto.precio_cuota) != (precio_anterior, precio_cuota_anterior):
+                    cambios_precio.append(CambioPrecioModel(
+                        producto=producto,
+                        precio_anterior=precio_anterior or 0,
+                        precio_nuevo=producto.precio_contado or 0,
+                        precio_cuota_anterior=precio_cuota_anterior or 0,
+                        precio_cuota_nuevo=producto.precio_cuota or 0,
+                    ))
+                actualizados.append(producto)
+
+            ProductoModel.objects.bulk_create(nuevos, batch_size=TAMANO_LOTE)
+            ImagenProductoModel.objects.bulk_create([
+                ImagenProductoModel(producto=producto, url_imagen=url, is_main=(orden == 0), orden=orden)
+                for producto, urls in zip(nuevos, nuevas_imagenes)
+                for orden, url in enumerate(urls)
+            ], batch_size=TAMANO_LOTE)
+            if actualizados and campos_actualizados:
+                ProductoModel.objects.bulk_update(actualizados, list(campos_actualizados), batch_size=TAMANO_LOTE)
+            registrar_cambios_precio(cambios_precio)
+            # Stock de los productos nuevos y reposiciones/ajustes de los existentes → libro de inventario
+            registrar_movimientos(
+                [movimiento(p.id, 'inicial', p.stock or 0, p.stock or 0, "importacion") for p in nuevos]
+                + movimientos_cambio_stock(stocks_anteriores, actualizados, referencia="importacion")
+            )
+    except Exception as e:
+        for numero, datos in validas:
+            resultado['errores'].append({"index": numero, "modelo": datos.get('modelo'), "errors": {"lote": str(e)}})
+        return
+
+    resultado['errores'].extend(ambiguas)
+    resultado['creados'].extend({"id": p.id, "modelo": p.modelo, "nombre": p.nombre} for p in nuevos)
+    resultado['actualizados'].extend({"id": p.id, "modelo": p.modelo, "nombre": p.nombre} for p in actualizados)
+
+
+def importar_productos(filas, tamano_lote=TAMANO_LOTE):
+    """
+    Importa productos desde un iterable de dicts o de (numero_fila, dict).
+    Devuelve {"procesadas", "creados", "actualizados", "errores", "duracion_segundos"}.
+    """
+    inicio = time.perf_counter()
+    catalogos = _Catalogos()
+    resultado = {"procesadas": 0, "creados": [], "actualizados": [], "errores": []}
+
+    lote = []
+    for indice, item in enumerate(filas):
+        numero, fila = item if isinstance(item, tuple) else (indice, item)
+        lote.append((numero, fila))
+        resultado['procesadas'] += 1
+        if len(lote) >= tamano_lote:
+            _procesar_lote(lote, catalogos, resultado)
+            lote = []
+    if lote:
+        _procesar_lote(lote, catalogos, resultado)
+
+    resultado['duracion_segundos'] = round(time.perf_counter() - inicio, 3)
+    return resultado
@@ -0,0 +1,157 @@
+# producto/inventario.py
+"""
+Libro de movimientos de inventario (MovimientoInventarioModel) y fotos diarias
+(SnapshotInventarioModel).
+
+Cada cambio de stock agrega una fila con la cantidad y el stock que quedó; las filas
+nunca se modifican. Con eso:
+
+- el stock a una fecha es el `stock_resultante` del último movimiento anterior a esa
+  fecha: una consulta DISTINCT ON sobre el índice (producto, fecha);
+- la rotación de un período sale de un rango de fotos diarias (unique producto/fecha),
+  sin recorrer pedidos.
+
+Los movimientos se escriben con bulk_create desde donde cambia el stock (checkout,
+reconciliación de ventas flash, edición e importación de productos).
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db.models import Avg, Sum
+from django.utils import timezone
+
+from .models import MovimientoInventarioModel, SnapshotInventarioModel, ProductoModel
+from .alertas_stock import revisar_stock_bajo
+
+# La liberación de reservas solo cambia el disponible: no entra en el cálculo de stock físico
+TIPOS_STOCK = ['inicial', 'venta', 'reposicion', 'ajuste']
+
+
+def movimiento(producto_id, tipo, cantidad, stock_resultante, referencia=None, usuario=None):
+    return MovimientoInventarioModel(
+        producto_id=producto_id, tipo=tipo, cantidad=cantidad,
+        stock_resultante=stock_resultante, referencia=referencia, usuario=usuario,
+    )
+
+
+def registrar_movimientos(movimientos):
+    """Agrega los movimientos en un solo INSERT (ignora los de cantidad 0)."""
+    movimientos = [m for m in movimientos if m.cantidad]
+    if movimientos:
+        MovimientoInventarioModel.objects.bulk_create(movimientos, batch_size=1000)
+        # Solo los productos con salidas pueden haber quedado bajo su punto de reposición
+        salidas = {m.producto_id for m in movimientos if m.cantidad < 0}
+        if salidas:
+            revisar_stock_bajo(salidas)
+    return movimientos
+
+
+def movimientos_cambio_stock(anteriores, productos, usuario=None, referencia=None):
+    """
+    Movimientos de reposición/ajuste para productos editados a mano o importados.
+    anteriores: {producto_id: stock antes}; productos: instancias con el stock nuevo.
+    """
+    movimientos = []
+    for producto in productos:
+        anterior = anteriores.get(producto.id) or 0
+        diferencia = (producto.stock or 0) - anterior
+        if diferencia:
+            tipo = 'reposicion' if diferencia > 0 else 'ajuste'
+            movimientos.append(movimiento(producto.id, tipo, diferencia, producto.stock or 0, referencia, usuario))
+    return movimientos
+
+
+def _fin_de_dia(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time.max))
+
+
+def stock_en_fecha(momento, producto_ids=None):
+    """
+    {producto_id: stock} al `momento` (datetime; una fecha se toma al cierre del día).
+    Los productos sin movimientos hasta ese momento no aparecen.
+    """
+    if not isinstance(momento, datetime):
+        momento = _fin_de_dia(momento)
+    movimientos = MovimientoInventarioModel.objects.filter(fecha__lte=momento, tipo__in=TIPOS_STOCK)
+    if producto_ids is not None:
+        movimientos = movimientos.filter(producto_id__in=producto_ids)
+    return dict(
+        movimientos.order_by('producto_id', '-fecha', '-id')
+        .distinct('producto_id')
+        .values_list('producto_id', 'stock_resultante')
+    )
+
+
+def _totales_del_dia(fecha):
+    """{producto_id: {"entradas", "salidas", "vendidas"}} de los movimientos de un día."""
+    inicio = timezone.make_aware(datetime.combine(fecha, time.min))
+    totales = defaultdict(lambda: {"entradas": 0, "salidas": 0, "vendidas": 0})
+    filas = (
+        MovimientoInventarioModel.objects.filter(fecha__gte=inicio, fecha__lt=inicio + timedelta(days=1), tipo__in=TIPOS_STOCK)
+        .values_list('producto_id', 'tipo', 'cantidad')
+    )
+    for producto_id, tipo, cantidad in filas.iterator(chunk_size=5000):
+        if cantidad > 0:
+            totales[producto_id]["entradas"] += cantidad
+        else:
+            totales[producto_id]["salidas"] += -cantidad
+            if tipo == 'venta':
+                totales[producto_id]["vendidas"] += -cantidad
+    return totales
+
+
+def generar_snapshots(fecha):
+    """Guarda (o rehace) la foto del cierre de `fecha` para los productos con stock conocido."""
+    stocks = stock_en_fecha(fecha)
+    totales = _totales_del_dia(fecha)
+    snapshots = [
+        SnapshotInventarioModel(
+            producto_id=producto_id, fecha=fecha, stock_cierre=stock,
+            **totales.get(producto_id, {"entradas": 0, "salidas": 0, "vendidas": 0}),
+        )
+        for producto_id, stock in stocks.items()
+    ]
+    SnapshotInventarioModel.objects.bulk_create(
+        snapshots, batch_size=1000, update_conflicts=True,
+        unique_fields=['producto', 'fecha'], update_fields=['stock_cierre', 'entradas', 'salidas', 'vendidas'],
+    )
+    return len(snapshots)
+
+
+def inicializar_inventario():
+    """Movimiento 'inicial' con el stock actual para los productos que aún no tienen movimientos."""
+    sin_movimientos = ProductoModel.objects.exclude(
+        id__in=MovimientoInventarioModel.objects.values('producto_id')
+    ).values_list('id', 'stock')
+    return len(registrar_movimientos([
+        movimiento(producto_id, 'inicial', stock or 0, stock or 0) for producto_id, stock in sin_movimientos
+    ]))
+
+
+def rotacion(desde, hasta, producto_ids=None):
+    """
+    Rotación por producto en el rango de fotos diarias [desde, hasta]:
+    vendidas / stock promedio y días de inventario (días del período / rotación).
+    """
+    dias = (hasta - desde).days + 1
+    snapshots = SnapshotInventarioModel.objects.filter(fecha__gte=desde, fecha__lte=hasta)
+    if producto_ids is not None:
+        snapshots = snapshots.filter(producto_id__in=producto_ids)
+    resultado = []
+    for fila in (
+        snapshots.values('producto_id', 'producto__nombre')
+        .annotate(vendidas=Sum('vendidas'), entradas=Sum('entradas'), stock_promedio=Avg('stock_cierre'))
+        .order_by('-vendidas')
+    ):
+        stock_promedio = float(fila['stock_promedio'] or 0)
+        indice = fila['vendidas'] / stock_promedio if stock_promedio else None
+        resultado.append({
+            "producto_id": fila['producto_id'],
+            "producto": fila['producto__nombre'],
+            "vendidas": fila['vendidas'],
+            "entradas": fila['entradas'],
+            "stock_promedio": round(stock_promedio, 2),
+            "rotacion": round(indice, 4) if indice is not None else None,
+            "dias_inventario": round(dias / indice, 1) if indice else None,
+        })
+    return resultado
@@ -0,0 +1,36 @@
+# management/commands/generar_snapshots_inventario.py
+import time
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand
+
+from producto.inventario import generar_snapshots, inicializar_inventario
+
+
+def _fecha(valor):
+    return datetime.strptime(valor, '%Y-%m-%d').date()
+
+
+class Command(BaseCommand):
+    help = 'Guarda la foto diaria del inventario (stock al cierre, entradas, salidas y vendidas) por producto'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=_fecha, help='YYYY-MM-DD (por defecto, ayer)')
+        parser.add_argument('--hasta', type=_fecha, help='YYYY-MM-DD (por defecto, igual a --desde)')
+        parser.add_argument('--inicializar', action='store_true',
+                            help="Antes, registra un movimiento 'inicial' para los productos sin movimientos")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        if options['inicializar']:
+            self.stdout.write(f"📦 {inicializar_inventario()} productos con movimiento inicial")
+
+        desde = options['desde'] or date.today() - timedelta(days=1)
+        hasta = options['hasta'] or desde
+        fecha, total = desde, 0
+        while fecha <= hasta:
+            total += generar_snapshots(fecha)
+            fecha += timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {total} fotos de inventario del {desde} al {hasta} en {time.perf_counter() - inicio:.2f}s"
+        ))
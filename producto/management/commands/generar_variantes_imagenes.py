@@ -0,0 +1,34 @@
+# management/commands/generar_variantes_imagenes.py
+import requests
+from django.core.management.base import BaseCommand
+
+from producto.models import ImagenProductoModel
+from producto.variantes import procesar_imagen
+
+
+class Command(BaseCommand):
+    help = 'Genera las variantes (thumbnail, card, full) de las imágenes de productos que aún no las tienen'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limite', type=int, default=500, help='Máximo de imágenes a procesar')
+        parser.add_argument('--todas', action='store_true', help='Regenerar también las que ya tienen variantes')
+
+    def handle(self, *args, **options):
+        imagenes = ImagenProductoModel.objects.order_by('id')
+        if not options['todas']:
+            imagenes = imagenes.filter(url_card__isnull=True)
+        imagenes = list(imagenes.values_list('id', 'url_imagen')[:options['limite']])
+
+        self.stdout.write(self.style.SUCCESS(f'Procesando {len(imagenes)} imágenes...'))
+        procesadas = 0
+        for imagen_id, url in imagenes:
+            try:
+                respuesta = requests.get(url, timeout=30)
+                respuesta.raise_for_status()
+            except requests.RequestException as e:
+                self.stdout.write(self.style.WARNING(f'  Imagen {imagen_id}: no se pudo descargar ({e})'))
+                continue
+            procesar_imagen(imagen_id, respuesta.content)
+            procesadas += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Variantes generadas para {procesadas} imágenes'))
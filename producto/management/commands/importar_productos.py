@@ -0,0 +1,71 @@
+# management/commands/importar_productos.py
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from producto.importacion import importar_productos, leer_filas, TAMANO_LOTE
+from producto.models import ProductoModel, SubcategoriaModel, MarcaModel
+
+PREFIJO_BENCHMARK = "BENCH-"
+
+
+class Command(BaseCommand):
+    help = 'Importa un catálogo de productos (CSV o JSON lines) o mide el rendimiento con datos sintéticos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', nargs='?', help='Ruta del catálogo (.csv o .jsonl)')
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], help='Formato del archivo')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Filas por lote/transacción')
+        parser.add_argument('--benchmark', type=int, default=0,
+                            help='Genera N productos sintéticos, los importa dos veces (alta y upsert) y los elimina')
+
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            return self._benchmark(options['benchmark'], options['lote'])
+
+        if not options['archivo']:
+            raise CommandError('Indica el archivo a importar o usa --benchmark N')
+
+        with open(options['archivo'], 'rb') as archivo:
+            resultado = importar_productos(leer_filas(archivo, options['formato']), tamano_lote=options['lote'])
+        self._imprimir(resultado)
+        for error in resultado['errores'][:50]:
+            self.stdout.write(self.style.WARNING(f"  fila {error['index']} ({error['modelo']}): {error['errors']}"))
+
+    def _imprimir(self, resultado, titulo='Importación'):
+        filas_seg = resultado['procesadas'] / resultado['duracion_segundos'] if resultado['duracion_segundos'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{titulo}: {resultado['procesadas']} filas en {resultado['duracion_segundos']}s "
+            f"({filas_seg:,.0f} filas/s) | creados {len(resultado['creados'])} | "
+            f"actualizados {len(resultado['actualizados'])} | errores {len(resultado['errores'])}"
+        ))
+
+    def _benchmark(self, cantidad, lote):
+        subcategorias = list(SubcategoriaModel.objects.values_list('nombre', flat=True))
+        marcas = list(MarcaModel.objects.values_list('nombre', flat=True))
+        if not subcategorias:
+            raise CommandError('Se necesita al menos una subcategoría para generar productos sintéticos')
+
+        def filas(factor_precio):
+            for i in range(cantidad):
+                precio = Decimal(random.randint(500, 20000)) * factor_precio
+                yield {
+                    "nombre": f"Producto benchmark {i}",
+                    "modelo": f"{PREFIJO_BENCHMARK}{i:07d}",
+                    "subcategoria": random.choice(subcategorias),
+                    "marca": random.choice(marcas) if marcas else None,
+                    "precio_contado": str(precio),
+                    "precio_cuota": str(precio * Decimal('1.15')),
+                    "stock": random.randint(0, 200),
+                    "garantia_meses": 12,
+                }
+
+        try:
+            self._imprimir(importar_productos(filas(Decimal('1')), tamano_lote=lote), 'Alta')
+            self._imprimir(importar_productos(filas(Decimal('1.05')), tamano_lote=lote), 'Upsert')
+        finally:
+            inicio = time.perf_counter()
+            eliminados, _ = ProductoModel.objects.filter(modelo__startswith=PREFIJO_BENCHMARK).delete()
+            self.stdout.write(f"Limpieza: {eliminados} filas eliminadas en {time.perf_counter() - inicio:.2f}s")
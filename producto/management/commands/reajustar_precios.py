@@ -0,0 +1,49 @@
+# management/commands/reajustar_precios.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from producto.precios import reajustar_precios, ErrorReajustePrecio, CAMPOS_PRECIO, TIPOS_AJUSTE
+
+
+class Command(BaseCommand):
+    help = 'Reajusta en bloque los precios de una categoría, subcategoría, marca o lista de productos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tipo', choices=TIPOS_AJUSTE, required=True)
+        parser.add_argument('--valor', required=True, help='Ej: -10 (porcentaje) o 50 (absoluto)')
+        parser.add_argument('--categoria', type=int)
+        parser.add_argument('--subcategoria', type=int)
+        parser.add_argument('--marca', type=int)
+        parser.add_argument('--productos', type=int, nargs='+', help='IDs de productos')
+        parser.add_argument('--campos', nargs='+', choices=CAMPOS_PRECIO, default=list(CAMPOS_PRECIO))
+        parser.add_argument('--simular', action='store_true', help='Solo muestra el resultado, no guarda')
+        parser.add_argument('--sin-notificar', action='store_true', help='No envía la notificación a clientes')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        try:
+            resumen = reajustar_precios(
+                tipo=options['tipo'],
+                valor=options['valor'],
+                categoria_id=options['categoria'],
+                subcategoria_id=options['subcategoria'],
+                marca_id=options['marca'],
+                producto_ids=options['productos'],
+                campos=options['campos'],
+                simular=options['simular'],
+                notificar=not options['sin_notificar'],
+            )
+        except ErrorReajustePrecio as e:
+            raise CommandError(str(e))
+        duracion = time.perf_counter() - inicio
+
+        for cambio in resumen['muestra']:
+            self.stdout.write(
+                f"  {cambio['id']} {cambio['nombre']}: {cambio['precio_anterior']} -> {cambio['precio_nuevo']} "
+                f"(cuota {cambio['precio_cuota_anterior']} -> {cambio['precio_cuota_nuevo']})"
+            )
+        estado = "Simulación" if resumen['simulado'] else "Reajuste aplicado"
+        self.stdout.write(self.style.SUCCESS(
+            f"{estado}: {resumen['productos_cambiados']}/{resumen['productos_evaluados']} productos en {duracion:.2f}s"
+        ))
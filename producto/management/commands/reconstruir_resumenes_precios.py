@@ -0,0 +1,26 @@
+# management/commands/reconstruir_resumenes_precios.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from producto.historial_precios import reconstruir_resumenes
+from producto.models import ResumenPrecioModel
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los resúmenes semanales/mensuales del historial de precios desde cambio_precio'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, nargs='+', help='Solo estos IDs de producto')
+        parser.add_argument('--lote', type=int, default=5000, help='Filas leídas por consulta')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        total = reconstruir_resumenes(options['productos'], tamano_lote=options['lote'])
+        resumenes = ResumenPrecioModel.objects.all()
+        if options['productos']:
+            resumenes = resumenes.filter(producto_id__in=options['productos'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {total} cambios de precio acumulados en {resumenes.count()} resúmenes "
+            f"en {time.perf_counter() - inicio:.2f}s"
+        ))
@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
 
@@ -43,10 +45,11 @@ class ProductoModel(models.Model):
     marca = models.ForeignKey(MarcaModel, on_delete=models.CASCADE, related_name="marca_productos", null=True, blank=True)
     nombre = models.CharField(max_length=100, blank=True, null=True)
     descripcion = models.CharField(max_length=300, blank=True, null=True)
-    modelo = models.CharField(max_length=100, blank=True, null=True)
+    modelo = models.CharField(max_length=100, blank=True, null=True, db_index=True)  # clave del upsert en importaciones
     precio_contado = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
     precio_cuota = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
     stock = models.IntegerField(blank=True, null=True, default=0)
+    stock_minimo = models.IntegerField(default=0)  # punto de reposición: en o bajo este valor se alerta
     garantia_meses = models.IntegerField(blank=True, null=True)
     fecha_registro = models.DateField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
@@ -55,6 +58,13 @@ class ProductoModel(models.Model):
 
     class Meta:
         db_table = "producto"
+        indexes = [
+            # Índice parcial: solo los productos activos con stock bajo (listado y alertas de producto/alertas_stock.py)
+            models.Index(
+                fields=['stock'], name='producto_stock_bajo_idx',
+                condition=models.Q(is_active=True, stock__lte=models.F('stock_minimo')),
+            ),
+        ]
 
 
 
@@ -68,6 +78,9 @@ class CambioPrecioModel(models.Model):
 
     class Meta:
         db_table = "cambio_precio"
+        indexes = [
+            models.Index(fields=['producto', 'fecha_cambio'], name='cambio_precio_prod_fecha_idx'),
+        ]
 
     # tipo_operacion = models.CharField(max_length=20, choices=[
     #     ('venta', 'Venta'),
@@ -75,6 +88,45 @@ class CambioPrecioModel(models.Model):
     #     ('anticretico', 'Anticrético'),
     # ], blank=True, null=True)
     
+# RESUMEN (ROLLUP) SEMANAL / MENSUAL DEL HISTORIAL DE PRECIOS
+# Se mantiene en cada cambio de precio (producto/historial_precios.py) para servir gráficas sin recorrer todo el historial
+class ResumenPrecioModel(models.Model):
+    GRANULARIDADES = [
+        ('semana', 'Semana'),
+        ('mes', 'Mes'),
+    ]
+    producto = models.ForeignKey(ProductoModel, on_delete=models.CASCADE, related_name="resumenes_precio")
+    granularidad = models.CharField(max_length=10, choices=GRANULARIDADES)
+    periodo = models.DateField()  # lunes de la semana o día 1 del mes
+    cantidad = models.PositiveIntegerField(default=0)
+    fecha_ultimo_cambio = models.DateField(blank=True, null=True)
+
+    contado_minimo = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    contado_maximo = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    contado_suma = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    contado_ultimo = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    contado_var_cantidad = models.PositiveIntegerField(default=0)
+    contado_var_minima = models.FloatField(default=0)
+    contado_var_maxima = models.FloatField(default=0)
+    contado_var_suma = models.FloatField(default=0)
+    contado_var_suma_cuadrados = models.FloatField(default=0)
+    contado_var_ultima = models.FloatField(default=0)
+
+    cuota_minimo = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    cuota_maximo = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    cuota_suma = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    cuota_ultimo = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    cuota_var_cantidad = models.PositiveIntegerField(default=0)
+    cuota_var_minima = models.FloatField(default=0)
+    cuota_var_maxima = models.FloatField(default=0)
+    cuota_var_suma = models.FloatField(default=0)
+    cuota_var_suma_cuadrados = models.FloatField(default=0)
+    cuota_var_ultima = models.FloatField(default=0)
+
+    class Meta:
+        db_table = "resumen_precio"
+        unique_together = ('producto', 'granularidad', 'periodo')
+
 # TABLA DE IMAGENES DE PRODUCTO
 class ImagenProductoModel(models.Model):
     producto = models.ForeignKey(
@@ -93,6 +145,15 @@ class ImagenProductoModel(models.Model):
     # Campo opcional para ordenar las imágenes
     orden = models.PositiveIntegerField(default=0)
 
+    # Variantes redimensionadas/recomprimidas (las genera producto.variantes en segundo plano)
+    url_thumbnail = models.CharField(max_length=500, null=True, blank=True)
+    url_card = models.CharField(max_length=500, null=True, blank=True)
+    url_full = models.CharField(max_length=500, null=True, blank=True)
+
+    def url_variante(self, variante):
+        """URL de la variante pedida; si aún no se generó, la imagen original."""
+        return getattr(self, f"url_{variante}", None) or self.url_imagen
+
     def __str__(self):
         # Muestra el nombre del producto al que pertenece y si es la principal
         return f"Imagen para {self.producto.nombre} (Principal: {self.is_main})"
@@ -100,4 +161,77 @@ class ImagenProductoModel(models.Model):
     class Meta:
         db_table = "imagen_producto"
         # Esto asegura que las imágenes se recuperen por defecto en orden
-        ordering = ['orden', 'id']
\ No newline at end of file
+        ordering = ['orden', 'id']
+# MOVIMIENTOS DE INVENTARIO (solo se agregan filas, nunca se modifican)
+# stock_resultante permite saber el stock a cualquier fecha con una sola consulta (producto/inventario.py)
+class MovimientoInventarioModel(models.Model):
+    TIPOS = [
+        ('inicial', 'Stock inicial'),
+        ('venta', 'Venta'),
+        ('reposicion', 'Reposición'),
+        ('ajuste', 'Ajuste'),
+        ('liberacion_reserva', 'Liberación de reserva'),  # no cambia el stock físico, solo el disponible
+    ]
+    producto = models.ForeignKey(ProductoModel, on_delete=models.CASCADE, related_name="movimientos_inventario")
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    cantidad = models.IntegerField()  # negativa en salidas
+    stock_resultante = models.IntegerField()
+    referencia = models.CharField(max_length=100, blank=True, null=True)  # "pedido:15", "venta_flash:3", ...
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, blank=True, null=True,
+                                related_name="movimientos_inventario")
+    fecha = models.DateTimeField(default=timezone.now)
+
+    def save(self, *args, **kwargs):
+        if self.pk:
+            raise ValueError("Los movimientos de inventario no se modifican; registre un ajuste")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.tipo} {self.cantidad:+d} - Producto {self.producto_id} ({self.fecha:%Y-%m-%d})"
+
+    class Meta:
+        db_table = "movimiento_inventario"
+        indexes = [
+            models.Index(fields=['producto', 'fecha'], name='mov_inv_prod_fecha_idx'),
+            models.Index(fields=['fecha'], name='mov_inv_fecha_idx'),
+        ]
+
+
+# FOTO DIARIA DEL INVENTARIO POR PRODUCTO (comando generar_snapshots_inventario)
+class SnapshotInventarioModel(models.Model):
+    producto = models.ForeignKey(ProductoModel, on_delete=models.CASCADE, related_name="snapshots_inventario")
+    fecha = models.DateField()
+    stock_cierre = models.IntegerField()
+    entradas = models.PositiveIntegerField(default=0)
+    salidas = models.PositiveIntegerField(default=0)
+    vendidas = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Inventario {self.fecha} - Producto {self.producto_id}: {self.stock_cierre}"
+
+    class Meta:
+        db_table = "snapshot_inventario"
+        unique_together = ('producto', 'fecha')
+        indexes = [
+            models.Index(fields=['fecha', 'producto'], name='snap_inv_fecha_prod_idx'),
+        ]
+
+
+# ALERTAS DE STOCK BAJO (una por producto y día; producto/alertas_stock.py)
+class AlertaStockModel(models.Model):
+    producto = models.ForeignKey(ProductoModel, on_delete=models.CASCADE, related_name="alertas_stock")
+    fecha = models.DateField()
+    stock = models.IntegerField()
+    stock_minimo = models.IntegerField()
+    notificada = models.BooleanField(default=False)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Stock bajo {self.fecha} - Producto {self.producto_id}: {self.stock}/{self.stock_minimo}"
+
+    class Meta:
+        db_table = "alerta_stock"
+        unique_together = ('producto', 'fecha')
+        indexes = [
+            models.Index(fields=['fecha'], condition=models.Q(notificada=False), name='alerta_stock_pendiente_idx'),
+        ]
@@ -4,6 +4,8 @@ import json
 from decouple import config
 import google.generativeai as genai
 
+from utils.llm_client import cliente_gemini, LLMNoDisponible
+
 PROMPT_ECOMMERCE = """Eres un analizador de lenguaje natural para un ecommerce de electrodomésticos.
 Analiza la solicitud del usuario y extrae información estructurada.
 
@@ -37,11 +39,8 @@ def parse_ecommerce_query(texto_usuario: str) -> dict:
     
     try:
         genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.5-flash')
-
         prompt = PROMPT_ECOMMERCE.format(texto_usuario=texto_usuario)
-        response = model.generate_content(prompt)
-        raw_text = response.text.strip()
+        raw_text = cliente_gemini.generar(prompt, modelo='gemini-2.5-flash')
         
         print(f"🔍 Gemini raw response: '{raw_text}'")
         
@@ -54,6 +53,9 @@ def parse_ecommerce_query(texto_usuario: str) -> dict:
         
         return parsed_data
 
+    except LLMNoDisponible as e:
+        print(f"⚠️ Gemini no disponible: {e}")
+        return {"accion": "buscar", "error": "Servicio de IA no disponible"}
     except json.JSONDecodeError as e:
         print(f"❌ Error parseando JSON: {e}")
         return {"accion": "buscar", "error": "Error parseando respuesta"}
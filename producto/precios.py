@@ -0,0 +1,151 @@
+# producto/precios.py
+"""
+Cambios de precio de productos.
+
+`registrar_cambios_precio` es el único punto por el que se escribe el historial
+(CambioPrecioModel), tanto para ediciones individuales como masivas, y por lo
+tanto también el que mantiene los resúmenes de producto/historial_precios.py.
+`reajustar_precios` aplica un ajuste porcentual o absoluto a un conjunto de
+productos con un solo bulk_update y envía una única notificación agregada.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+
+from comercio.utils import NotificacionService
+from .historial_precios import actualizar_resumenes
+from .models import ProductoModel, CambioPrecioModel, CategoriaModel, SubcategoriaModel, MarcaModel
+
+TIPOS_AJUSTE = ('porcentaje', 'absoluto')
+CAMPOS_PRECIO = ('precio_contado', 'precio_cuota')
+CENTAVO = Decimal('0.01')
+
+
+class ErrorReajustePrecio(Exception):
+    pass
+
+
+def registrar_cambios_precio(cambios):
+    """
+    Guarda en bloque las filas de historial de precios (CambioPrecioModel sin guardar)
+    y las acumula en los resúmenes semanales/mensuales de la misma transacción.
+    """
+    if not cambios:
+        return []
+    with transaction.atomic():
+        creados = CambioPrecioModel.objects.bulk_create(cambios, batch_size=1000)
+        actualizar_resumenes(creados)
+    return creados
+
+
+def calcular_precio(actual, tipo, valor):
+    actual = actual or Decimal('0')
+    if tipo == 'porcentaje':
+        nuevo = actual * (Decimal('1') + valor / Decimal('100'))
+    else:
+        nuevo = actual + valor
+    return max(nuevo, Decimal('0')).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+
+
+def _describir_filtro(categoria_id, subcategoria_id, marca_id):
+    partes = []
+    if categoria_id:
+        partes.append(CategoriaModel.objects.filter(id=categoria_id).values_list('nombre', flat=True).first())
+    if subcategoria_id:
+        partes.append(SubcategoriaModel.objects.filter(id=subcategoria_id).values_list('nombre', flat=True).first())
+    if marca_id:
+        partes.append(MarcaModel.objects.filter(id=marca_id).values_list('nombre', flat=True).first())
+    return " ".join(p for p in partes if p)
+
+
+def reajustar_precios(tipo, valor, categoria_id=None, subcategoria_id=None, marca_id=None,
+                      producto_ids=None, campos=CAMPOS_PRECIO, simular=False, notificar=True):
+    """
+    Aplica el ajuste a los productos activos que cumplen el filtro.
+    Devuelve un resumen con la cantidad de productos cambiados y una muestra de los cambios.
+    """
+    if tipo not in TIPOS_AJUSTE:
+        raise ErrorReajustePrecio(f"Tipo de ajuste inválido. Use: {', '.join(TIPOS_AJUSTE)}")
+    try:
+        valor = Decimal(str(valor))
+    except Exception:
+        raise ErrorReajustePrecio("El valor del ajuste debe ser numérico")
+    if not valor.is_finite():
+        raise ErrorReajustePrecio("El valor del ajuste debe ser un número finito")
+    campos = [campo for campo in campos if campo in CAMPOS_PRECIO]
+    if not campos:
+        raise ErrorReajustePrecio("Indique al menos un campo de precio a ajustar")
+    if not (categoria_id or subcategoria_id or marca_id or producto_ids):
+        raise ErrorReajustePrecio("Indique una categoría, subcategoría, marca o lista de productos")
+
+    productos = ProductoModel.objects.filter(is_active=True)
+    if categoria_id:
+        productos = productos.filter(subcategoria__categoria_id=categoria_id)
+    if subcategoria_id:
+        productos = productos.filter(subcategoria_id=subcategoria_id)
+    if marca_id:
+        productos = productos.filter(marca_id=marca_id)
+    if producto_ids:
+        productos = productos.filter(id__in=producto_ids)
+
+    with transaction.atomic():
+        # Lectura y escritura en la misma transacción: los precios se calculan sobre filas
+        # bloqueadas (en orden de id, para no cruzarse con otro reajuste) y una edición
+        # concurrente no se pisa ni queda fuera del historial
+        if not simular:
+            productos = productos.select_for_update(of=('self',))
+        productos = list(productos.order_by('id').only('id', 'nombre', 'precio_contado', 'precio_cuota'))
+
+        cambiados, historial = [], []
+        for producto in productos:
+            anterior = {campo: getattr(producto, campo) for campo in CAMPOS_PRECIO}
+            # Un precio sin cargar (NULL) no se ajusta: quedaría en 0,00 con una fila de historial
+            for campo in campos:
+                if anterior[campo] is not None:
+                    setattr(producto, campo, calcular_precio(anterior[campo], tipo, valor))
+            if all(getattr(producto, campo) == anterior[campo] for campo in campos):
+                continue
+            cambiados.append(producto)
+            historial.append(CambioPrecioModel(
+                producto=producto,
+                precio_anterior=anterior['precio_contado'] or 0,
+                precio_nuevo=producto.precio_contado or 0,
+                precio_cuota_anterior=anterior['precio_cuota'] or 0,
+                precio_cuota_nuevo=producto.precio_cuota or 0,
+            ))
+
+        resumen = {
+            "productos_evaluados": len(productos),
+            "productos_cambiados": len(cambiados),
+            "muestra": [
+                {
+                    "id": cambio.producto.id,
+                    "nombre": cambio.producto.nombre,
+                    "precio_anterior": cambio.precio_anterior,
+                    "precio_nuevo": cambio.precio_nuevo,
+                    "precio_cuota_anterior": cambio.precio_cuota_anterior,
+                    "precio_cuota_nuevo": cambio.precio_cuota_nuevo,
+                }
+                for cambio in historial[:20]
+            ],
+            "simulado": simular,
+        }
+        if simular or not cambiados:
+            return resumen
+
+        ProductoModel.objects.bulk_update(cambiados, campos, batch_size=1000)
+        registrar_cambios_precio(historial)
+
+        if notificar:
+            descripcion = _describir_filtro(categoria_id, subcategoria_id, marca_id) or "seleccionados"
+            if valor < 0:
+                titulo = "¡Bajaron los precios!"
+                detalle = f"{abs(valor)}%" if tipo == 'porcentaje' else f"{abs(valor)} Bs"
+                mensaje = f"{len(cambiados)} productos {descripcion} tienen hasta {detalle} de descuento"
+            else:
+                titulo = "Actualización de precios"
+                mensaje = f"Se actualizaron los precios de {len(cambiados)} productos {descripcion}"
+            # Una sola notificación agregada, enviada cuando el cambio ya está confirmado
+            transaction.on_commit(lambda: NotificacionService.enviar_a_clientes(titulo, mensaje))
+
+    return resumen
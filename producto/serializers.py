@@ -1,5 +1,8 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import ProductoModel, CategoriaModel, MarcaModel, SubcategoriaModel, CambioPrecioModel, ImagenProductoModel
+from .imagenes import subir_imagenes, eliminar_subidas, ErrorSubidaImagen
+from .variantes import encolar_variantes
 
 # SERIALIZER PARA CATEGORÍA DE PRODUCTO
 class CategoriaSerializer(serializers.ModelSerializer):
@@ -23,9 +26,24 @@ class MarcaSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 class ImagenProductoSerializer(serializers.ModelSerializer):
+    # Variante a servir según el contexto ('thumbnail', 'card' o 'full'); sin contexto, la original
+    url = serializers.SerializerMethodField()
+    variantes = serializers.SerializerMethodField()
+
     class Meta:
         model = ImagenProductoModel
-        fields = ['id', 'url_imagen', 'is_main', 'orden']
+        fields = ['id', 'url_imagen', 'url', 'variantes', 'is_main', 'orden']
+
+    def get_url(self, obj):
+        variante = self.context.get('variante_imagen')
+        return obj.url_variante(variante) if variante else obj.url_imagen
+
+    def get_variantes(self, obj):
+        return {
+            "thumbnail": obj.url_variante("thumbnail"),
+            "card": obj.url_variante("card"),
+            "full": obj.url_variante("full"),
+        }
 
 # Serializer temporal para manejar la entrada de archivos de imagen.
 class FileInputSerializer(serializers.Serializer):
@@ -55,7 +73,7 @@ class ProductoSerializer(serializers.ModelSerializer):
         model = ProductoModel
         fields = (
             'id', 'subcategoria_id', 'marca_id', 'nombre', 'descripcion', 
-            'modelo', 'precio_contado', 'precio_cuota', 'stock', 
+            'modelo', 'precio_contado', 'precio_cuota', 'stock', 'stock_minimo',
             'garantia_meses', 'is_active', 
             'imagenes', 'imagenes_data', 
             'categoria_nombre', 'marca_nombre',
@@ -65,96 +83,94 @@ class ProductoSerializer(serializers.ModelSerializer):
     
     # --- Sobreescribir el método create para subir y guardar URLs ---
     def create(self, validated_data):
-        import cloudinary.uploader # Importa Cloudinary
-
-       
-        # 1. Crear la instancia del Producto primero
-        producto = ProductoModel.objects.create(**validated_data)
-
-        # 2. Verificar si se enviaron imágenes
-        imagenes_data = validated_data.get('imagenes', None)
-        if imagenes_data:  # Si hay imágenes, procesarlas
-            # 3. Subir y crear cada instancia de ImagenProductoModel
-            for item in imagenes_data:
-                uploaded_file = item['file']
-
-                # --- Lógica de Subida a Cloudinary ---
-                try:
-                    # Sube el archivo a Cloudinary
-                    upload_result = cloudinary.uploader.upload(uploaded_file)
-                    url_final = upload_result['secure_url']
-                except Exception as e:
-                    # Manejo de error de subida (crucial en producción)
-                    print(f"Error subiendo a Cloudinary: {e}")
-                    # Si falla la subida, puedes optar por abortar o ignorar la imagen
-                    continue 
-                
-                # 4. Crear la instancia de ImagenProductoModel con la URL de Cloudinary
-                ImagenProductoModel.objects.create(
-                    producto=producto, 
-                    url_imagen=url_final, # Guardamos la URL de Cloudinary
-                    is_main=item.get('is_main', False),
-                    orden=item.get('orden', 0)
-                )     
+        imagenes_data = validated_data.pop('imagenes', None) or []
+
+        # 1. Subir todas las imágenes en paralelo (si una falla, se revierten las demás)
+        originales = [self._leer_bytes(item['file']) for item in imagenes_data]
+        subidas = self._subir_imagenes([item['file'] for item in imagenes_data])
+
+        # 2. Crear el producto y sus imágenes en una sola transacción
+        try:
+            with transaction.atomic():
+                producto = ProductoModel.objects.create(**validated_data)
+                creadas = ImagenProductoModel.objects.bulk_create([
+                    ImagenProductoModel(
+                        producto=producto,
+                        url_imagen=subida['url'],
+                        is_main=item.get('is_main', False),
+                        orden=item.get('orden', 0)
+                    )
+                    for item, subida in zip(imagenes_data, subidas)
+                ])
+                # 3. Variantes (thumbnail/card/full) en segundo plano tras el commit
+                encolar_variantes(zip([img.id for img in creadas], originales))
+        except Exception:
+            eliminar_subidas(subidas)
+            raise
         return producto
     
     def update(self, instance, validated_data):
-        import cloudinary.uploader
-        
         # 1. Extraer la lista de imágenes (si está presente en la solicitud PATCH)
         imagenes_data = validated_data.pop('imagenes', None)
-        
-        # 2. Actualizar los campos del modelo Producto (nombre, stock, etc.)
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-
-        # 3. Lógica de Edición y Borrado de Imágenes
-        if imagenes_data is not None:
-            
-            # IDs de las imágenes que el frontend quiere mantener/actualizar
-            imagenes_ids_a_mantener = [item['id'] for item in imagenes_data if item.get('id')]
-            
-            # --- Borrar imágenes antiguas no enviadas ---
-            # Las imágenes que existían pero NO tienen ID en la nueva lista deben ser eliminadas.
-            for existing_image in instance.imagenes.all():
-                if existing_image.id not in imagenes_ids_a_mantener:
-                    # Opcional: Borrar de Cloudinary también
-                    # import re
-                    # public_id = re.findall(r'v\d+/(.*)\.jpg', existing_image.url_imagen)[0]
-                    # cloudinary.uploader.destroy(public_id)
-                    
-                    existing_image.delete()
-                    
-            # --- Crear nuevas y actualizar existentes ---
-            for item in imagenes_data:
-                # Caso 1: Imagen Existente (se actualiza solo metadata: is_main, orden)
-                if item.get('id'):
-                    img_instance = ImagenProductoModel.objects.get(id=item['id'], producto=instance)
-                    img_instance.is_main = item.get('is_main', img_instance.is_main)
-                    img_instance.orden = item.get('orden', img_instance.orden)
-                    # Si el archivo ('file') está presente, ignóralo, ya que no queremos reemplazar la imagen solo por actualizar metadata.
-                    img_instance.save() 
-                
-                # Caso 2: Nueva Imagen (se sube a Cloudinary y se crea)
-                elif 'file' in item: 
-                    uploaded_file = item['file']
-                    
-                    try:
-                        upload_result = cloudinary.uploader.upload(uploaded_file)
-                        url_final = upload_result['secure_url']
-                    except Exception as e:
-                        print(f"Error subiendo nueva imagen a Cloudinary: {e}")
-                        continue 
-                        
-                    ImagenProductoModel.objects.create(
-                        producto=instance, 
-                        url_imagen=url_final,
-                        is_main=item.get('is_main', False),
-                        orden=item.get('orden', 0)
-                    )
+
+        # 2. Subir primero las imágenes nuevas (en paralelo), fuera de la transacción
+        nuevas = [item for item in (imagenes_data or []) if not item.get('id') and 'file' in item]
+        originales = [self._leer_bytes(item['file']) for item in nuevas]
+        subidas = self._subir_imagenes([item['file'] for item in nuevas])
+
+        try:
+            with transaction.atomic():
+                # 3. Actualizar los campos del modelo Producto (nombre, stock, etc.)
+                for attr, value in validated_data.items():
+                    setattr(instance, attr, value)
+                instance.save()
+
+                # 4. Lógica de Edición y Borrado de Imágenes
+                if imagenes_data is not None:
+                    # IDs de las imágenes que el frontend quiere mantener/actualizar
+                    metadata_por_id = {item['id']: item for item in imagenes_data if item.get('id')}
+
+                    # --- Borrar imágenes antiguas no enviadas ---
+                    instance.imagenes.exclude(id__in=metadata_por_id.keys()).delete()
+
+                    # --- Actualizar metadata (is_main, orden) de las existentes ---
+                    existentes = list(instance.imagenes.filter(id__in=metadata_por_id.keys()))
+                    for img_instance in existentes:
+                        item = metadata_por_id[img_instance.id]
+                        img_instance.is_main = item.get('is_main', img_instance.is_main)
+                        img_instance.orden = item.get('orden', img_instance.orden)
+                    ImagenProductoModel.objects.bulk_update(existentes, ['is_main', 'orden'])
+
+                    # --- Crear las nuevas ---
+                    creadas = ImagenProductoModel.objects.bulk_create([
+                        ImagenProductoModel(
+                            producto=instance,
+                            url_imagen=subida['url'],
+                            is_main=item.get('is_main', False),
+                            orden=item.get('orden', 0)
+                        )
+                        for item, subida in zip(nuevas, subidas)
+                    ])
+                    encolar_variantes(zip([img.id for img in creadas], originales))
+        except Exception:
+            eliminar_subidas(subidas)
+            raise
 
         return instance
+
+    @staticmethod
+    def _leer_bytes(archivo):
+        datos = archivo.read()
+        archivo.seek(0)
+        return datos
+
+    @staticmethod
+    def _subir_imagenes(archivos):
+        try:
+            return subir_imagenes(archivos)
+        except ErrorSubidaImagen as e:
+            print(f"Error subiendo imágenes: {e}")
+            raise serializers.ValidationError({"imagenes": [str(e)]})
     
 class CambioPrecioSerializer(serializers.ModelSerializer):
     class Meta:
@@ -31,6 +31,7 @@ urlpatterns = [
 # CRUD PRODUCTO
     path('crear_producto', views.crear_producto, name='crear_producto'),
     path('editar_producto/<int:producto_id>', views.editar_producto, name='editar_producto'),
+    path('reajustar_precios', views.reajustar_precios_masivo, name='reajustar_precios'),
     path('eliminar_producto/<int:producto_id>', views.eliminar_producto, name='eliminar_producto'),
     path('activar_producto/<int:producto_id>', views.activar_producto, name='activar_producto'),
     path('listar_productos_activos', views.listar_productos_activos, name='listar_productos_activas'),
@@ -38,6 +39,12 @@ urlpatterns = [
     path('obtener_producto/<int:producto_id>/', views.obtener_producto_por_id, name='obtener_producto_por_id'),
     path('buscar_productos', views.buscar_productos, name='buscar_productos'),
     path('crear_productos_lista', views.crear_productos_lista, name='crear_productos_lista'),
+    path('importar_productos', views.importar_productos_archivo, name='importar_productos'),
+
+# INVENTARIO
+    path('stock_en_fecha', views.obtener_stock_en_fecha, name='stock_en_fecha'),
+    path('rotacion_inventario', views.obtener_rotacion_inventario, name='rotacion_inventario'),
+    path('listar_stock_bajo', views.listar_stock_bajo, name='listar_stock_bajo'),
 
 # GRAFICAS DE CAMBIO PRECIO
     path('obtener_historial_precios_producto/<int:producto_id>/', views.obtener_historial_precios, name='obtener_historial_precios_producto'),
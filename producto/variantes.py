@@ -0,0 +1,96 @@
+# producto/variantes.py
+"""
+Variantes de imágenes de productos (thumbnail, card, full).
+
+Al subir una imagen se encolan sus bytes originales en un worker en segundo plano
+que genera versiones redimensionadas y recomprimidas (WebP por defecto, JPEG
+opcional), las sube con el mismo backend de almacenamiento y guarda sus URLs en
+ImagenProductoModel. Mientras no existan, el serializer sirve la original.
+"""
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .imagenes import obtener_almacenamiento, eliminar_subidas
+from .models import ImagenProductoModel
+
+logger = logging.getLogger(__name__)
+
+# Lado mayor (px) de cada variante
+VARIANTES = {
+    "thumbnail": 200,
+    "card": 600,
+    "full": 1600,
+}
+FORMATO = getattr(settings, 'PRODUCTO_IMAGENES_FORMATO', 'WEBP').upper()
+CALIDAD = getattr(settings, 'PRODUCTO_IMAGENES_CALIDAD', 80)
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="variantes-imagenes")
+
+
+def generar_variantes(datos):
+    """Devuelve {variante: archivo en memoria} a partir de los bytes de la imagen original."""
+    original = Image.open(io.BytesIO(datos))
+    original = ImageOps.exif_transpose(original)
+    if FORMATO == 'JPEG' and original.mode not in ('RGB', 'L'):
+        original = original.convert('RGB')
+    elif original.mode not in ('RGB', 'RGBA', 'L'):
+        original = original.convert('RGBA')
+
+    extension = 'jpg' if FORMATO == 'JPEG' else FORMATO.lower()
+    archivos = {}
+    for nombre, lado in VARIANTES.items():
+        imagen = original.copy()
+        imagen.thumbnail((lado, lado), Image.LANCZOS)  # nunca agranda
+        buffer = io.BytesIO()
+        opciones = {"quality": CALIDAD, "optimize": True}
+        if FORMATO == 'JPEG':
+            opciones["progressive"] = True
+        elif FORMATO == 'WEBP':
+            opciones = {"quality": CALIDAD, "method": 4}
+        imagen.save(buffer, FORMATO, **opciones)
+        buffer.seek(0)
+        buffer.name = f"{nombre}.{extension}"
+        archivos[nombre] = buffer
+    return archivos
+
+
+def procesar_imagen(imagen_id, datos):
+    """Genera y sube las variantes de una imagen y guarda sus URLs."""
+    almacenamiento = obtener_almacenamiento()
+    subidas = []
+    try:
+        for nombre, archivo in generar_variantes(datos).items():
+            subidas.append((nombre, almacenamiento.subir(archivo)))
+
+        actualizadas = ImagenProductoModel.objects.filter(id=imagen_id).update(**{
+            f"url_{nombre}": subida["url"] for nombre, subida in subidas
+        })
+        if not actualizadas:
+            # La imagen se borró mientras se procesaba
+            eliminar_subidas([subida for _, subida in subidas], almacenamiento)
+    except Exception as e:
+        logger.error("No se pudieron generar las variantes de la imagen %s: %s", imagen_id, e)
+        eliminar_subidas([subida for _, subida in subidas], almacenamiento)
+    finally:
+        close_old_connections()
+
+
+def encolar_variantes(imagenes):
+    """
+    Encola [(imagen_id, bytes)] para procesar en segundo plano una vez confirmada
+    la transacción actual (si se revierte, no se procesa nada).
+    """
+    imagenes = [(imagen_id, datos) for imagen_id, datos in imagenes if imagen_id and datos]
+    if not imagenes:
+        return
+
+    def _encolar():
+        for imagen_id, datos in imagenes:
+            _executor.submit(procesar_imagen, imagen_id, datos)
+
+    transaction.on_commit(_encolar)
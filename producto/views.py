@@ -9,7 +9,13 @@ from rest_framework.response import Response
 from drf_yasg.utils import swagger_auto_schema
 from .serializers import CategoriaSerializer, SubcategoriaSerializer, MarcaSerializer, ProductoSerializer, ImagenProductoSerializer
 from .models import CategoriaModel, SubcategoriaModel, MarcaModel, ProductoModel, CambioPrecioModel
+from .importacion import importar_productos, leer_filas
+from .historial_precios import elegir_granularidad, obtener_serie_resumida
+from .precios import registrar_cambios_precio, reajustar_precios, ErrorReajustePrecio, CAMPOS_PRECIO
+from .alertas_stock import revisar_stock_bajo, productos_stock_bajo
+from .inventario import movimiento, registrar_movimientos, movimientos_cambio_stock, stock_en_fecha, rotacion
 from django.core.paginator import Paginator, EmptyPage
+from django.db import transaction
 from django.db.models import Q
 # Create your views here.
 
@@ -483,7 +489,10 @@ def crear_producto(request):
     serializer = ProductoSerializer(data=request.data) 
     
     if serializer.is_valid():
-        serializer.save()
+        # El producto y su movimiento 'inicial' se guardan juntos: no queda stock sin asiento
+        with transaction.atomic():
+            producto = serializer.save()
+            registrar_movimientos([movimiento(producto.id, 'inicial', producto.stock or 0, producto.stock or 0, usuario=request.user)])
         return Response({
             "status": 1,
             "error": 0,
@@ -508,20 +517,20 @@ def crear_producto(request):
 @requiere_permiso("Producto", "crear")
 def crear_productos_lista(request):
     """
-    Recibe una lista de productos en 'request.data' y crea cada producto junto con sus imágenes.
+    Recibe una lista de productos en 'request.data' y los importa por lotes
+    (ver producto/importacion.py). Si el 'modelo' ya existe, el producto se actualiza.
     Espera un JSON como:
     [
         {
             "nombre": "Producto 1",
-            "precio": 100,
-            "imagenes": [{"file": <archivo>, "is_main": True, "orden": 0}],
+            "subcategoria_id": 3,
+            "marca": "Samsung",
+            "modelo": "RT-38",
+            "precio_contado": 100,
+            "imagenes": ["https://.../foto.jpg"],
             ...
         },
-        {
-            "nombre": "Producto 2",
-            "precio": 200,
-            "imagenes": [...]
-        }
+        ...
     ]
     """
     productos_data = request.data
@@ -532,17 +541,9 @@ def crear_productos_lista(request):
             "message": "Se esperaba una lista de productos",
             "values": {}
         }, status=400)
-    
-    productos_creados = []
-    errores = []
 
-    for i, producto_data in enumerate(productos_data):
-        serializer = ProductoSerializer(data=producto_data)
-        if serializer.is_valid():
-            producto = serializer.save()
-            productos_creados.append(serializer.data)
-        else:
-            errores.append({"index": i, "errors": serializer.errors})
+    resultado = importar_productos(productos_data)
+    errores = resultado["errores"]
 
     status_code = 201 if not errores else 207  # 207 = Partial Success
     return Response({
@@ -550,10 +551,48 @@ def crear_productos_lista(request):
         "error": len(errores),
         "message": "Productos procesados",
         "values": {
-            "productos_creados": productos_creados,
+            "productos_creados": resultado["creados"],
+            "productos_actualizados": resultado["actualizados"],
             "errores": errores
         }
-    })
+    }, status=status_code)
+
+# --------------------- Importar Productos (CSV / JSON lines) -------------------
+@swagger_auto_schema(
+    method="post",
+    manual_parameters=[
+        openapi.Parameter('archivo', openapi.IN_FORM, type=openapi.TYPE_FILE, required=True,
+                          description="Catálogo en CSV o JSON lines"),
+        openapi.Parameter('formato', openapi.IN_FORM, type=openapi.TYPE_STRING, required=False,
+                          description="'csv' o 'jsonl' (por defecto según la extensión)"),
+    ],
+)
+@api_view(['POST'])
+@requiere_permiso("Producto", "crear")
+def importar_productos_archivo(request):
+    archivo = request.FILES.get('archivo')
+    if not archivo:
+        return Response({
+            "status": 0,
+            "error": 1,
+            "message": "Se requiere el archivo del catálogo",
+            "values": {}
+        }, status=400)
+
+    resultado = importar_productos(leer_filas(archivo, request.data.get('formato')))
+    errores = resultado["errores"]
+
+    return Response({
+        "status": 1 if not errores else 0,
+        "error": len(errores),
+        "message": f"{resultado['procesadas']} filas procesadas en {resultado['duracion_segundos']}s",
+        "values": {
+            "procesadas": resultado["procesadas"],
+            "creados": len(resultado["creados"]),
+            "actualizados": len(resultado["actualizados"]),
+            "errores": errores
+        }
+    }, status=201 if not errores else 207)
 
 # --------------------- Actualizar Producto ---------------------
 @swagger_auto_schema(
@@ -562,20 +601,38 @@ def crear_productos_lista(request):
     responses={200: ProductoSerializer} 
 )
 @api_view(['PATCH'])
-@requiere_permiso("Producto", "editar")
+@requiere_permiso("Producto", "actualizar")
 def editar_producto(request, producto_id):
     try:
-        producto = ProductoModel.objects.get(id=producto_id)
-        data = request.data.copy()
+        with transaction.atomic():
+            # Fila bloqueada: el stock y los precios anteriores son los que esta edición reemplaza,
+            # aunque otra edición o un pedido concurrente lo modifique al mismo tiempo
+            producto = ProductoModel.objects.select_for_update().get(id=producto_id)
+            data = request.data.copy()
 
-        # Guardamos precios antiguos para comparar
-        precio_anterior = producto.precio_contado
-        precio_cuota_anterior = producto.precio_cuota
+            # Guardamos precios antiguos para comparar
+            precio_anterior = producto.precio_contado
+            precio_cuota_anterior = producto.precio_cuota
+            stock_anterior = producto.stock
 
-        serializer = ProductoSerializer(producto, data=data, partial=True)
-        if serializer.is_valid():
+            serializer = ProductoSerializer(producto, data=data, partial=True)
+            if not serializer.is_valid():
+                return Response({
+                    "status": 0,
+                    "error": 1,
+                    "message": "Error al actualizar Producto",
+                    "values": serializer.errors
+                })
             serializer.save()
-            
+
+            # Reposición o ajuste manual de stock → libro de inventario (misma transacción)
+            movimientos = registrar_movimientos(movimientos_cambio_stock(
+                {producto.id: stock_anterior}, [producto], request.user, "edicion_producto"
+            ))
+            if not movimientos and 'stock_minimo' in serializer.validated_data:
+                # Cambió solo el punto de reposición: puede haber quedado en stock bajo
+                revisar_stock_bajo([producto.id])
+
             # Obtenemos los precios nuevos (por si se actualizaron)
             precio_nuevo = serializer.validated_data.get(
                 "precio_contado", producto.precio_contado
@@ -589,33 +646,26 @@ def editar_producto(request, producto_id):
                 precio_anterior != precio_nuevo
                 or precio_cuota_anterior != precio_cuota_nuevo
             ):
-                from .models import CambioPrecioModel
-                CambioPrecioModel.objects.create(
+                registrar_cambios_precio([CambioPrecioModel(
                     producto=producto,
-                    precio_anterior=precio_anterior,
-                    precio_nuevo=precio_nuevo,
-                    precio_cuota_anterior=precio_cuota_anterior,
-                    precio_cuota_nuevo=precio_cuota_nuevo,
-                )
+                    precio_anterior=precio_anterior or 0,
+                    precio_nuevo=precio_nuevo or 0,
+                    precio_cuota_anterior=precio_cuota_anterior or 0,
+                    precio_cuota_nuevo=precio_cuota_nuevo or 0,
+                )])
                 titulo = f"Actualización de precio en {producto.nombre}"
-                if precio_anterior < precio_nuevo:
+                if (precio_anterior or 0) < (precio_nuevo or 0):
                     mensaje = f"El producto {producto.nombre} ha subido de precio. Nuevo precio: {precio_nuevo} Bs"
                 else:
                     mensaje = f"¡Buenas noticias! El producto {producto.nombre} ha bajado de precio. Nuevo precio: {precio_nuevo} Bs"
-                NotificacionService.enviar_a_clientes(titulo, mensaje)
-
-            return Response({
-                "status": 1,
-                "error": 0,
-                "message": "Producto actualizado correctamente",
-                "values": {"producto": serializer.data}
-            })
+                # La notificación sale cuando el cambio ya está confirmado
+                transaction.on_commit(lambda: NotificacionService.enviar_a_clientes(titulo, mensaje))
 
         return Response({
-            "status": 0,
-            "error": 1,
-            "message": "Error al actualizar Producto",
-            "values": serializer.errors
+            "status": 1,
+            "error": 0,
+            "message": "Producto actualizado correctamente",
+            "values": {"producto": serializer.data}
         })
 
     except ProductoModel.DoesNotExist:
@@ -625,6 +675,56 @@ def editar_producto(request, producto_id):
             "message": "Producto no encontrado",
             "values": {}
         })
+# --------------------- Reajuste Masivo de Precios ---------------------
+@swagger_auto_schema(
+    method="post",
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        required=['tipo', 'valor'],
+        properties={
+            'tipo': openapi.Schema(type=openapi.TYPE_STRING, description="'porcentaje' o 'absoluto'"),
+            'valor': openapi.Schema(type=openapi.TYPE_NUMBER, description="Ej: -10 (baja 10%) o 50 (sube 50 Bs)"),
+            'categoria_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+            'subcategoria_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+            'marca_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+            'productos': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER)),
+            'campos': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING),
+                                     description="precio_contado y/o precio_cuota (por defecto ambos)"),
+            'simular': openapi.Schema(type=openapi.TYPE_BOOLEAN, description="Solo calcula, no guarda"),
+        }
+    )
+)
+@api_view(['POST'])
+@requiere_permiso("Producto", "actualizar")
+def reajustar_precios_masivo(request):
+    data = request.data
+    try:
+        resumen = reajustar_precios(
+            tipo=data.get('tipo'),
+            valor=data.get('valor'),
+            categoria_id=data.get('categoria_id'),
+            subcategoria_id=data.get('subcategoria_id'),
+            marca_id=data.get('marca_id'),
+            producto_ids=data.get('productos'),
+            campos=data.get('campos') or CAMPOS_PRECIO,
+            simular=bool(data.get('simular', False)),
+        )
+    except ErrorReajustePrecio as e:
+        return Response({
+            "status": 0,
+            "error": 1,
+            "message": str(e),
+            "values": {}
+        }, status=400)
+
+    return Response({
+        "status": 1,
+        "error": 0,
+        "message": f"{resumen['productos_cambiados']} productos con precio actualizado"
+                   if not resumen['simulado'] else "Simulación de reajuste",
+        "values": resumen
+    })
+
 # --------------------- Eliminar ( desactivar ) Producto ---------------------
 @api_view(['DELETE'])
 @requiere_permiso("Producto", "eliminar")
@@ -671,8 +771,10 @@ def activar_producto(request, producto_id):
 @api_view(['GET'])
 @requiere_permiso("Producto", "listar")
 def listar_productos_activos(request):
-    productos = ProductoModel.objects.filter(is_active=True)
-    serializer = ProductoSerializer(productos, many=True)
+    productos = ProductoModel.objects.filter(is_active=True).select_related(
+        'marca', 'subcategoria__categoria'
+    ).prefetch_related('imagenes')
+    serializer = ProductoSerializer(productos, many=True, context={'variante_imagen': 'card'})
     return Response({
         "status": 1,
         "error": 0,
@@ -685,7 +787,7 @@ def listar_productos_activos(request):
 def obtener_producto_por_id(request, producto_id):
     try:
         producto = ProductoModel.objects.get(id=producto_id, is_active=True)
-        serializer = ProductoSerializer(producto)
+        serializer = ProductoSerializer(producto, context={'variante_imagen': 'full'})
         return Response({
             "status": 1,
             "error": 0,
@@ -703,8 +805,10 @@ def obtener_producto_por_id(request, producto_id):
 @api_view(['GET'])
 @requiere_permiso("Producto", "listar")
 def listar_productos(request):
-    productos = ProductoModel.objects.all()
-    serializer = ProductoSerializer(productos, many=True)
+    productos = ProductoModel.objects.all().select_related(
+        'marca', 'subcategoria__categoria'
+    ).prefetch_related('imagenes')
+    serializer = ProductoSerializer(productos, many=True, context={'variante_imagen': 'card'})
     return Response({
         "status": 1,
         "error": 0,
@@ -788,7 +892,9 @@ def buscar_productos(request):
             queryset = queryset.filter(stock=0)
         
         # Ordenar por fecha de registro (más recientes primero)
-        queryset = queryset.order_by('-fecha_registro')
+        queryset = queryset.order_by('-fecha_registro').select_related(
+            'marca', 'subcategoria__categoria'
+        ).prefetch_related('imagenes')
         
         # Aplicar paginación
         paginator = Paginator(queryset, page_size)
@@ -799,7 +905,7 @@ def buscar_productos(request):
             productos_pagina = paginator.page(paginator.num_pages)
         
         # Serializar los datos
-        serializer = ProductoSerializer(productos_pagina, many=True)
+        serializer = ProductoSerializer(productos_pagina, many=True, context={'variante_imagen': 'card'})
         
         # Datos de paginación para la respuesta
         pagination_data = {
@@ -859,6 +965,14 @@ def buscar_productos(request):
             type=openapi.TYPE_STRING,
             default='ambos',
             enum=['contado', 'cuota', 'ambos']
+        ),
+        openapi.Parameter(
+            'granularidad',
+            openapi.IN_QUERY,
+            description="'cambio' (cada cambio), 'semana' o 'mes' (resúmenes). Default 'auto': cambio hasta 3 meses, semana hasta 12, mes para más",
+            type=openapi.TYPE_STRING,
+            default='auto',
+            enum=['auto', 'cambio', 'semana', 'mes']
         )
     ],
     responses={
@@ -938,6 +1052,9 @@ def obtener_historial_precios(request, producto_id):
 
 # Obtener ambos con período específico (meses atrás)
 # GET /obtener_historial_precios_producto/8/?meses=12&tipo=ambos
+
+# Forzar la granularidad (cada cambio, semanal o mensual)
+# GET /obtener_historial_precios_producto/8/?meses=24&granularidad=semana
     
     try:
         # Verificar que el producto existe
@@ -946,6 +1063,7 @@ def obtener_historial_precios(request, producto_id):
         # Obtener parámetros de la consulta
         meses = int(request.GET.get('meses', 24))
         tipo_precio = request.GET.get('tipo', 'ambos')  # Default: ambos
+        granularidad = request.GET.get('granularidad', 'auto')
         
         # Validar parámetros
         if meses <= 0:
@@ -963,20 +1081,36 @@ def obtener_historial_precios(request, producto_id):
                 "message": "El parámetro 'tipo' debe ser 'contado', 'cuota' o 'ambos'",
                 "values": {}
             })
+
+        if granularidad not in ['auto', 'cambio', 'semana', 'mes']:
+            return Response({
+                "status": 0,
+                "error": 1,
+                "message": "El parámetro 'granularidad' debe ser 'auto', 'cambio', 'semana' o 'mes'",
+                "values": {}
+            })
+        if granularidad == 'auto':
+            granularidad = elegir_granularidad(meses)
         
         # Calcular fecha de inicio
         fecha_fin = datetime.now().date()
         fecha_inicio = fecha_fin - timedelta(days=meses * 30)
         
         # Obtener cambios de precio en el período
-        cambios = CambioPrecioModel.objects.filter(
+        cambios = list(CambioPrecioModel.objects.filter(
             producto_id=producto_id,
             fecha_cambio__gte=fecha_inicio,
             fecha_cambio__lte=fecha_fin
-        ).order_by('fecha_cambio')
+        ).order_by('fecha_cambio')) if granularidad == 'cambio' else None
         
         # Preparar datos según el tipo solicitado
-        if tipo_precio == 'ambos':
+        if granularidad != 'cambio':
+            # Ventanas largas: un punto por semana/mes leído de los resúmenes pre-agregados
+            tipos = ('contado', 'cuota') if tipo_precio == 'ambos' else (tipo_precio,)
+            datos_grafica, estadisticas = obtener_serie_resumida(
+                producto_id, granularidad, fecha_inicio, fecha_fin, tipos
+            )
+        elif tipo_precio == 'ambos':
             datos_grafica = preparar_datos_grafica_ambos(cambios)
             estadisticas = calcular_estadisticas_ambos(cambios)
         else:
@@ -1000,6 +1134,7 @@ def obtener_historial_precios(request, producto_id):
                     "meses": meses,
                     "fecha_inicio": fecha_inicio.isoformat(),
                     "fecha_fin": fecha_fin.isoformat(),
+                    "granularidad": granularidad,
                 },
                 "estadisticas": estadisticas,
                 "datos_grafica": datos_grafica,
@@ -1216,4 +1351,136 @@ def calcular_estadisticas_precios(cambios, tipo_precio):
             'tendencia': 'estable'
         })
     
-    return estadisticas
\ No newline at end of file
+    return estadisticas
+# --------------------- Inventario: stock a una fecha y rotación ---------------------
+def _leer_fecha(valor):
+    return datetime.strptime(valor, '%Y-%m-%d').date() if valor else None
+
+def _leer_ids(valor):
+    return [int(x) for x in valor.split(',') if x.strip()] if valor else None
+
+@swagger_auto_schema(
+    method="get",
+    manual_parameters=[
+        openapi.Parameter('fecha', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="YYYY-MM-DD (al cierre del día)"),
+        openapi.Parameter('productos', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="IDs separados por coma"),
+    ]
+)
+@api_view(['GET'])
+@requiere_permiso("Producto", "leer")
+def obtener_stock_en_fecha(request):
+    """Stock de cada producto al cierre de una fecha, según el libro de movimientos"""
+    try:
+        fecha = _leer_fecha(request.GET.get('fecha'))
+        producto_ids = _leer_ids(request.GET.get('productos'))
+    except ValueError:
+        return Response({
+            "status": 0,
+            "error": 1,
+            "message": "Parámetros inválidos: fecha YYYY-MM-DD y productos como IDs separados por coma",
+            "values": {}
+        }, status=400)
+    if not fecha:
+        return Response({
+            "status": 0,
+            "error": 1,
+            "message": "Debe indicar la fecha",
+            "values": {}
+        }, status=400)
+
+    stocks = stock_en_fecha(fecha, producto_ids)
+    nombres = dict(ProductoModel.objects.filter(id__in=stocks).values_list('id', 'nombre'))
+    return Response({
+        "status": 1,
+        "error": 0,
+        "message": "Stock a la fecha obtenido correctamente",
+        "values": {
+            "fecha": fecha,
+            "productos": [
+                {"producto_id": producto_id, "producto": nombres.get(producto_id), "stock": stock}
+                for producto_id, stock in sorted(stocks.items())
+            ]
+        }
+    })
+
+@swagger_auto_schema(
+    method="get",
+    manual_parameters=[
+        openapi.Parameter('desde', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="YYYY-MM-DD"),
+        openapi.Parameter('hasta', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="YYYY-MM-DD (por defecto ayer)"),
+        openapi.Parameter('productos', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="IDs separados por coma"),
+    ]
+)
+@api_view(['GET'])
+@requiere_permiso("Producto", "leer")
+def obtener_rotacion_inventario(request):
+    """Rotación (vendidas / stock promedio) y días de inventario a partir de las fotos diarias"""
+    try:
+        hasta = _leer_fecha(request.GET.get('hasta')) or (datetime.now() - timedelta(days=1)).date()
+        desde = _leer_fecha(request.GET.get('desde')) or hasta - timedelta(days=29)
+        producto_ids = _leer_ids(request.GET.get('productos'))
+    except ValueError:
+        return Response({
+            "status": 0,
+            "error": 1,
+            "message": "Parámetros inválidos: fechas YYYY-MM-DD y productos como IDs separados por coma",
+            "values": {}
+        }, status=400)
+    if desde > hasta:
+        return Response({
+            "status": 0,
+            "error": 1,
+            "message": "La fecha 'desde' debe ser anterior a 'hasta'",
+            "values": {}
+        }, status=400)
+
+    return Response({
+        "status": 1,
+        "error": 0,
+        "message": "Rotación de inventario obtenida correctamente",
+        "values": {
+            "desde": desde,
+            "hasta": hasta,
+            "productos": rotacion(desde, hasta, producto_ids)
+        }
+    })
+
+# --------------------- Productos con stock bajo ---------------------
+@swagger_auto_schema(
+    method="get",
+    manual_parameters=[
+        openapi.Parameter('limite', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description="Máximo de productos (por defecto 100)"),
+    ]
+)
+@api_view(['GET'])
+@requiere_permiso("Producto", "leer")
+def listar_stock_bajo(request):
+    """Productos activos en o bajo su stock mínimo, del más crítico al menos (índice parcial)"""
+    try:
+        limite = min(max(int(request.GET.get('limite', 100)), 1), 1000)
+    except ValueError:
+        limite = 100
+    productos = (
+        productos_stock_bajo()
+        .order_by('stock', 'id')
+        .values('id', 'nombre', 'modelo', 'stock', 'stock_minimo', 'marca__nombre')[:limite]
+    )
+    return Response({
+        "status": 1,
+        "error": 0,
+        "message": "Productos con stock bajo obtenidos correctamente",
+        "values": {
+            "productos": [
+                {
+                    "producto_id": p['id'],
+                    "nombre": p['nombre'],
+                    "modelo": p['modelo'],
+                    "marca": p['marca__nombre'],
+                    "stock": p['stock'],
+                    "stock_minimo": p['stock_minimo'],
+                    "faltante": p['stock_minimo'] - (p['stock'] or 0),
+                }
+                for p in productos
+            ]
+        }
+    })
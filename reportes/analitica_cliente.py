@@ -0,0 +1,136 @@
+# reportes/analitica_cliente.py
+"""
+Snapshot de estadísticas por cliente para los endpoints de IA del cliente.
+
+En lugar de recorrer el historial de pedidos en cada consulta, el snapshot se
+calcula con una consulta agrupada sobre pedidos (estado + mes) y otra sobre
+los detalles (productos frecuentes), y se guarda en caché por usuario.
+Las señales de `reportes.signals` lo invalidan cuando se confirman cambios en sus pedidos.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from venta.models import PedidoModel, DetallePedidoModel
+
+SNAPSHOT_TTL = getattr(settings, 'REPORTES_SNAPSHOT_CLIENTE_TTL', 60 * 30)
+MESES_TENDENCIA = 6
+
+
+def _clave_snapshot(usuario_id):
+    return f"reportes:snapshot_cliente:{usuario_id}"
+
+
+def _a_float(valor):
+    if isinstance(valor, Decimal):
+        return float(valor)
+    return valor
+
+
+def calcular_snapshot_cliente(usuario_id):
+    """Calcula las estadísticas de pedidos de un cliente sin pasar por la caché."""
+    # 1️⃣ Una sola consulta agrupada por (estado, mes): de aquí salen los totales,
+    #    el conteo por estado, la tendencia mensual y la fecha del último pedido.
+    filas = (
+        PedidoModel.objects.filter(usuario_id=usuario_id)
+        .annotate(mes=TruncMonth('fecha'))
+        .values('estado', 'mes')
+        .annotate(pedidos=Count('id'), total=Sum('total'))
+        .order_by()
+    )
+
+    total_pedidos = 0
+    total_gastado = Decimal('0')
+    por_estado = {}
+    por_mes = {}
+    for fila in filas:
+        pedidos = fila['pedidos']
+        total = fila['total'] or Decimal('0')
+        total_pedidos += pedidos
+        total_gastado += total
+        por_estado[fila['estado']] = por_estado.get(fila['estado'], 0) + pedidos
+        mes = por_mes.setdefault(fila['mes'], {'total_mes': Decimal('0'), 'pedidos_mes': 0})
+        mes['total_mes'] += total
+        mes['pedidos_mes'] += pedidos
+
+    desde = (timezone.now() - timedelta(days=30 * MESES_TENDENCIA)).date().replace(day=1)
+    tendencia_mensual = [
+        {'mes': mes, 'total_mes': float(datos['total_mes']), 'pedidos_mes': datos['pedidos_mes']}
+        for mes, datos in sorted(por_mes.items())
+        if mes and mes >= desde
+    ]
+
+    # 2️⃣ Productos más comprados (agregado sobre los detalles)
+    productos_frecuentes = [
+        {clave: _a_float(valor) for clave, valor in fila.items()}
+        for fila in DetallePedidoModel.objects.filter(
+            pedido__usuario_id=usuario_id
+        ).values(
+            'producto__nombre',
+            'producto__marca__nombre'
+        ).annotate(
+            veces_comprado=Count('id'),
+            total_unidades=Sum('cantidad'),
+            total_gastado=Sum('subtotal')
+        ).order_by('-veces_comprado')[:3]
+    ]
+
+    # 3️⃣ Último pedido: solo si existe, lectura puntual por índice
+    ultimo_pedido = {}
+    if total_pedidos:
+        pedido = (
+            PedidoModel.objects.filter(usuario_id=usuario_id)
+            .only('fecha', 'total', 'estado')
+            .order_by('-fecha', '-id')
+            .first()
+        )
+        if pedido:
+            ultimo_pedido = {
+                "fecha": pedido.fecha.strftime('%Y-%m-%d'),
+                "total": float(pedido.total),
+                "estado": pedido.estado
+            }
+
+    return {
+        "total_pedidos": total_pedidos,
+        "total_gastado": float(total_gastado),
+        "promedio_por_pedido": float(total_gastado / total_pedidos) if total_pedidos > 0 else 0,
+        "productos_frecuentes": productos_frecuentes,
+        "ultimo_pedido": ultimo_pedido,
+        "pedidos_por_estado": [
+            {"estado": estado, "total": total} for estado, total in por_estado.items()
+        ],
+        "tendencia_mensual": tendencia_mensual,
+    }
+
+
+def obtener_snapshot_cliente(usuario_id):
+    """Devuelve el snapshot del cliente desde caché, calculándolo si no existe."""
+    clave = _clave_snapshot(usuario_id)
+    snapshot = cache.get(clave)
+    if snapshot is None:
+        snapshot = calcular_snapshot_cliente(usuario_id)
+        cache.set(clave, snapshot, SNAPSHOT_TTL)
+    return snapshot
+
+
+def invalidar_snapshot_cliente(usuario_id):
+    """Descarta el snapshot de un cliente (se recalcula en la próxima consulta)."""
+    if usuario_id:
+        cache.delete(_clave_snapshot(usuario_id))
+
+
+def invalidar_snapshots_al_confirmar(usuario_ids):
+    """
+    Invalida los snapshots cuando la transacción en curso se confirma (inmediato si no hay una):
+    invalidar antes del COMMIT deja que otro request recalcule con datos viejos y los vuelva a cachear.
+    """
+    usuario_ids = {usuario_id for usuario_id in usuario_ids if usuario_id}
+    if usuario_ids:
+        transaction.on_commit(lambda: cache.delete_many([_clave_snapshot(u) for u in usuario_ids]))
@@ -0,0 +1,233 @@
+# reportes/plantillas.py
+"""
+Reconocimiento de prompts frecuentes de reportes sin pasar por Gemini.
+
+1. `interpretar_con_plantilla` compara el prompt normalizado contra un conjunto
+   de plantillas ("ventas por marca este mes", "productos con poco stock", ...)
+   y lo compila directamente a una interpretación.
+2. `obtener_interpretacion_aprendida` / `aprender_interpretacion` guardan en caché
+   las interpretaciones de Gemini que ya produjeron un reporte válido, indexadas
+   por el prompt normalizado. Los prompts con periodos relativos ("hoy", "este mes",
+   "últimos 7 días") no se aprenden: sus filtros llevan las fechas del día en que
+   se interpretaron y mañana serían otra ventana.
+"""
+import copy
+import hashlib
+import re
+import unicodedata
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+CACHE_INTERPRETACIONES_TTL = getattr(settings, 'REPORTES_CACHE_INTERPRETACIONES_TTL', 60 * 60 * 24)
+
+# Palabras de cortesía / verbos que no cambian el reporte pedido
+_PREFIJOS = re.compile(
+    r"^(?:(?:por favor|porfa|quiero|quisiera|necesito|dame|damelo|muestrame|mostrar|muestra|"
+    r"ver|listar|lista|listado|genera|generar|reporte|informe|consulta|de|del|la|el|los|las|un|una)\s+)+"
+)
+
+
+def normalizar_prompt(prompt):
+    """Minúsculas, sin tildes ni puntuación y con espacios colapsados."""
+    texto = unicodedata.normalize('NFKD', (prompt or "").lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r"[^a-z0-9ñ\s]", " ", texto)
+    return re.sub(r"\s+", " ", texto).strip()
+
+
+# --------------------------
+# Periodos relativos
+# --------------------------
+_PERIODO = (
+    r"(?:\s+(?:de |en |del |durante )?(?:los |las )?(?P<periodo>hoy|esta semana|este mes|el mes pasado|mes pasado|el mes anterior|mes anterior|"
+    r"este ano|ultimos? (?P<dias>\d+) dias))?"
+)
+
+
+# Cualquier mención de tiempo relativo a la fecha actual
+_RELATIVO = re.compile(
+    r"\b(?:hoy|ayer|manana|semana|semanal|mes|mensual|ano|anual|trimestre|dias?|ultim[oa]s?|"
+    r"pasad[oa]s?|anterior|actual|reciente|recientes|vigente)\b"
+)
+
+
+def es_periodo_relativo(prompt):
+    return bool(_RELATIVO.search(normalizar_prompt(prompt)))
+
+
+def _filtros_periodo(match, campo_fecha, fecha_hora=False):
+    """fecha_hora: el campo es DateTimeField ('hoy' compara solo la parte de fecha)."""
+    periodo = match.groupdict().get('periodo')
+    if not periodo:
+        return {}
+
+    hoy = timezone.localdate()
+    if periodo == 'hoy':
+        return {f"{campo_fecha}__date" if fecha_hora else campo_fecha: hoy.isoformat()}
+    if periodo == 'esta semana':
+        return {f"{campo_fecha}__gte": (hoy - timedelta(days=hoy.weekday())).isoformat()}
+    if periodo == 'este mes':
+        return {f"{campo_fecha}__year": hoy.year, f"{campo_fecha}__month": hoy.month}
+    if periodo.endswith('mes pasado') or periodo.endswith('mes anterior'):
+        fin = hoy.replace(day=1)
+        inicio = (fin - timedelta(days=1)).replace(day=1)
+        return {f"{campo_fecha}__gte": inicio.isoformat(), f"{campo_fecha}__lt": fin.isoformat()}
+    if periodo == 'este ano':
+        return {f"{campo_fecha}__year": hoy.year}
+    if match.group('dias'):
+        return {f"{campo_fecha}__gte": (hoy - timedelta(days=int(match.group('dias')))).isoformat()}
+    return {}
+
+
+def _limite(match, defecto=None):
+    valor = match.groupdict().get('limite')
+    return int(valor) if valor else defecto
+
+
+# --------------------------
+# Constructores de interpretaciones
+# --------------------------
+def _ventas_agrupadas(campos):
+    def construir(match):
+        filtros = {"pedido__estado__iexact": "pagado"}
+        filtros.update(_filtros_periodo(match, "pedido__fecha"))
+        return {
+            "tipo_reporte": "ventas",
+            "filtros": filtros,
+            "agrupacion": campos,
+            "calculos": {
+                "total_ventas": "Sum('subtotal')",
+                "unidades_vendidas": "Sum('cantidad')"
+            },
+            "orden": ["-total_ventas"],
+            "limite": _limite(match, 20),
+        }
+    return construir
+
+
+def _productos_mas_vendidos(match):
+    filtros = {"pedido__estado__iexact": "pagado"}
+    filtros.update(_filtros_periodo(match, "pedido__fecha"))
+    return {
+        "tipo_reporte": "ventas",
+        "filtros": filtros,
+        "agrupacion": ["producto__id", "producto__nombre"],
+        "calculos": {
+            "unidades_vendidas": "Sum('cantidad')",
+            "ingresos_totales": "Sum('subtotal')"
+        },
+        "orden": ["-unidades_vendidas"],
+        "limite": _limite(match, 10),
+    }
+
+
+def _productos_stock_bajo(match):
+    return {
+        "tipo_reporte": "productos",
+        # Mismo criterio que producto.alertas_stock: stock en o bajo el punto de reposición
+        "filtros": {"stock__lte": "CAMPO:stock_minimo", "is_active": True},
+        "orden": ["stock"],
+        "limite": _limite(match, 20),
+    }
+
+
+def _productos_sin_stock(match):
+    return {
+        "tipo_reporte": "productos",
+        "filtros": {"stock": 0, "is_active": True},
+        "orden": ["nombre"],
+        "limite": _limite(match, 20),
+    }
+
+
+def _pedidos_por_estado(match):
+    filtros = {}
+    estado = match.group('estado')
+    if estado:
+        filtros["estado__iexact"] = {
+            "pendientes": "pendiente", "pagados": "pagado", "cancelados": "cancelado"
+        }[estado]
+    filtros.update(_filtros_periodo(match, "fecha"))
+    return {
+        "tipo_reporte": "pedidos",
+        "filtros": filtros,
+        "orden": ["-fecha"],
+        "limite": _limite(match, 20),
+    }
+
+
+def _clientes_nuevos(match):
+    return {
+        "tipo_reporte": "clientes",
+        "filtros": _filtros_periodo(match, "date_joined", fecha_hora=True),
+        "orden": ["-date_joined"],
+        "limite": _limite(match, 20),
+    }
+
+
+_TOP = r"(?:(?:top |primeros |primeras )?(?P<limite>\d+) )?"
+
+PLANTILLAS = [
+    (re.compile(rf"^{_TOP}(?:ventas|ingresos) por marcas?{_PERIODO}$"),
+     _ventas_agrupadas(["producto__marca__nombre"])),
+    (re.compile(rf"^{_TOP}marcas? mas vendidas?{_PERIODO}$"),
+     _ventas_agrupadas(["producto__marca__nombre"])),
+    (re.compile(rf"^{_TOP}(?:ventas|ingresos) por categorias?{_PERIODO}$"),
+     _ventas_agrupadas(["producto__subcategoria__categoria__nombre"])),
+    (re.compile(rf"^{_TOP}categorias? mas vendidas?{_PERIODO}$"),
+     _ventas_agrupadas(["producto__subcategoria__categoria__nombre"])),
+    (re.compile(rf"^{_TOP}productos? mas vendidos?{_PERIODO}$"),
+     _productos_mas_vendidos),
+    (re.compile(rf"^{_TOP}(?:productos? (?:con )?(?:poco|bajo) stock|stock bajo)$"),
+     _productos_stock_bajo),
+    (re.compile(rf"^{_TOP}productos? (?:sin stock|agotados?)$"),
+     _productos_sin_stock),
+    (re.compile(rf"^{_TOP}pedidos(?: (?P<estado>pendientes|pagados|cancelados))?{_PERIODO}$"),
+     _pedidos_por_estado),
+    (re.compile(rf"^{_TOP}clientes (?:nuevos|registrados){_PERIODO}$"),
+     _clientes_nuevos),
+]
+
+
+def interpretar_con_plantilla(prompt):
+    """Devuelve la interpretación de la primera plantilla que coincide, o None."""
+    texto = _PREFIJOS.sub("", normalizar_prompt(prompt))
+    for patron, construir in PLANTILLAS:
+        match = patron.match(texto)
+        if match:
+            interpretacion = construir(match)
+            interpretacion.setdefault("formato", "pantalla")
+            interpretacion.setdefault("filtros", {})
+            interpretacion.setdefault("agrupacion", [])
+            interpretacion.setdefault("calculos", {})
+            interpretacion.setdefault("orden", [])
+            interpretacion["error"] = None
+            return interpretacion
+    return None
+
+
+# --------------------------
+# Caché de interpretaciones aprendidas
+# --------------------------
+def _clave_interpretacion(prompt):
+    digest = hashlib.sha1(normalizar_prompt(prompt).encode()).hexdigest()
+    return f"reportes:interpretacion:{digest}"
+
+
+def obtener_interpretacion_aprendida(prompt):
+    if es_periodo_relativo(prompt):
+        return None
+    return cache.get(_clave_interpretacion(prompt))
+
+
+def aprender_interpretacion(prompt, interpretacion):
+    """Guarda una interpretación de Gemini que ya generó un reporte válido (salvo periodos relativos)."""
+    if es_periodo_relativo(prompt):
+        return
+    datos = copy.deepcopy(interpretacion)
+    datos.pop("prompt", None)
+    datos.pop("origen", None)
+    cache.set(_clave_interpretacion(prompt), datos, CACHE_INTERPRETACIONES_TTL)
@@ -0,0 +1,24 @@
+# reportes/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from venta.models import PedidoModel, DetallePedidoModel
+from .analitica_cliente import invalidar_snapshots_al_confirmar
+
+
+# --------------------------
+# Invalidación del snapshot de estadísticas del cliente
+# --------------------------
+@receiver([post_save, post_delete], sender=PedidoModel)
+def invalidar_snapshot_por_pedido(sender, instance, **kwargs):
+    invalidar_snapshots_al_confirmar([instance.usuario_id])
+
+
+@receiver([post_save, post_delete], sender=DetallePedidoModel)
+def invalidar_snapshot_por_detalle(sender, instance, **kwargs):
+    # Normalmente el pedido ya está en la caché de la instancia (se creó con pedido=...)
+    try:
+        usuario_id = instance.pedido.usuario_id
+    except PedidoModel.DoesNotExist:
+        return
+    invalidar_snapshots_al_confirmar([usuario_id])
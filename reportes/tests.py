@@ -1,3 +1,256 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from utils.llm_client import CircuitBreaker, ClienteLLM, LLMNoDisponible
+
+
+# --------------------------
+# Servidor LLM falso (local)
+# --------------------------
+class _ServidorLLMFalso:
+    """
+    Imita la respuesta REST de generateContent de Gemini en 127.0.0.1.
+    modo: 'sano' responde de inmediato, 'lento' espera `demora` segundos, 'error' devuelve 500.
+    """
+
+    def __init__(self):
+        self.modo = 'sano'
+        self.demora = 0.5
+        self.texto = '{"tipo_reporte": "productos"}'
+        self.solicitudes = 0
+        self._lock = threading.Lock()
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                with servidor._lock:
+                    servidor.solicitudes += 1
+                if servidor.modo == 'lento':
+                    time.sleep(servidor.demora)
+                if servidor.modo == 'error':
+                    self.send_response(500)
+                    self.end_headers()
+                    self.wfile.write(b'{"error": {"code": 500, "message": "fallo simulado"}}')
+                    return
+                cuerpo = json.dumps({"candidates": [{"content": {"parts": [{"text": servidor.texto}]}}]}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, *args):
+                pass
+
+        self.http = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.http.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.http.server_address[1]}/v1beta/models/fake:generateContent"
+        self._hilo = threading.Thread(target=self.http.serve_forever, daemon=True)
+        self._hilo.start()
+
+    def llamada(self, contenido, modelo, generation_config, timeout):
+        """Transporte para ClienteLLM: POST al servidor falso con el mismo plazo que la llamada real."""
+        datos = json.dumps({"contents": [{"parts": [{"text": str(contenido)}]}]}).encode()
+        solicitud = urllib.request.Request(self.url, data=datos, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(solicitud, timeout=timeout) as respuesta:
+            cuerpo = json.loads(respuesta.read())
+        return cuerpo["candidates"][0]["content"]["parts"][0]["text"].strip()
+
+    def cerrar(self):
+        self.http.shutdown()
+        self.http.server_close()
+
+
+class ClienteLLMTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.servidor = _ServidorLLMFalso()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.servidor.cerrar()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.servidor.modo = 'sano'
+        self.servidor.demora = 0.5
+
+    def _cliente(self, **kwargs):
+        breaker = kwargs.pop('breaker', None) or CircuitBreaker(
+            umbral_error=0.5, minimo_llamadas=3, ventana_segundos=60, enfriamiento_segundos=0.3,
+        )
+        opciones = {"max_concurrencia": 2, "timeout_segundos": 2, "espera_cola_segundos": 0.05}
+        opciones.update(kwargs)
+        return ClienteLLM("prueba", breaker=breaker, llamada=self.servidor.llamada, **opciones)
+
+    def _esperar_solicitudes(self, cantidad, limite=2.0):
+        fin = time.monotonic() + limite
+        while self.servidor.solicitudes < cantidad and time.monotonic() < fin:
+            time.sleep(0.01)
+
+    def test_respuesta_sana(self):
+        cliente = self._cliente()
+        self.assertEqual(cliente.generar("hola"), self.servidor.texto)
+        self.assertEqual(cliente.metricas()["llamadas"]["ok"], 1)
+
+    def test_plazo_corta_la_espera(self):
+        self.servidor.modo = 'lento'
+        self.servidor.demora = 1.0
+        cliente = self._cliente()
+        inicio = time.monotonic()
+        with self.assertRaises(LLMNoDisponible):
+            cliente.generar("hola", timeout=0.2)
+        self.assertLess(time.monotonic() - inicio, 0.8)
+        self.assertEqual(cliente.metricas()["llamadas"]["timeout"], 1)
+
+    def test_semaforo_se_libera_al_terminar_la_llamada(self):
+        self.servidor.modo = 'lento'
+        self.servidor.demora = 0.5
+        cliente = self._cliente(max_concurrencia=1)
+        # Transporte que no respeta el plazo (como un SDK colgado): la llamada sigue después de vencer
+        cliente._llamada = lambda contenido, modelo, config, timeout: self.servidor.llamada(contenido, modelo, config, 5)
+        with self.assertRaises(LLMNoDisponible):
+            cliente.generar("lenta", timeout=0.1)
+        # La llamada vencida sigue en curso: el único cupo continúa ocupado
+        with self.assertRaises(LLMNoDisponible):
+            cliente.generar("sin cupo")
+        self.assertEqual(cliente.metricas()["llamadas"]["rechazadas"], 1)
+
+        time.sleep(0.6)
+        self.servidor.modo = 'sano'
+        self.assertEqual(cliente.generar("con cupo"), self.servidor.texto)
+
+    def test_semaforo_se_libera_tras_un_error(self):
+        self.servidor.modo = 'error'
+        cliente = self._cliente(max_concurrencia=1, breaker=CircuitBreaker(minimo_llamadas=100))
+        for _ in range(3):
+            with self.assertRaises(urllib.error.HTTPError):
+                cliente.generar("falla")
+        self.servidor.modo = 'sano'
+        self.assertEqual(cliente.generar("ok"), self.servidor.texto)
+
+    def test_circuito_se_abre_y_rechaza_sin_llamar(self):
+        self.servidor.modo = 'error'
+        cliente = self._cliente()
+        for _ in range(3):
+            with self.assertRaises(urllib.error.HTTPError):
+                cliente.generar("falla")
+        self.assertEqual(cliente.breaker.estado, CircuitBreaker.ABIERTO)
+
+        solicitudes = self.servidor.solicitudes
+        with self.assertRaises(LLMNoDisponible):
+            cliente.generar("rechazada")
+        self.assertEqual(self.servidor.solicitudes, solicitudes)
+
+    def test_una_sola_sonda_en_semi_abierto(self):
+        self.servidor.modo = 'error'
+        cliente = self._cliente()
+        for _ in range(3):
+            with self.assertRaises(urllib.error.HTTPError):
+                cliente.generar("falla")
+        time.sleep(0.35)  # pasa el enfriamiento
+
+        self.servidor.modo = 'lento'
+        self.servidor.demora = 0.4
+        solicitudes = self.servidor.solicitudes
+        resultado = {}
+        sonda = threading.Thread(target=lambda: resultado.setdefault("texto", cliente.generar("sonda")))
+        sonda.start()
+        self._esperar_solicitudes(solicitudes + 1)
+        self.assertEqual(cliente.breaker.estado, CircuitBreaker.SEMI_ABIERTO)
+
+        # Mientras la sonda está en curso, el resto se rechaza sin llegar al servidor
+        with self.assertRaises(LLMNoDisponible):
+            cliente.generar("segunda")
+        sonda.join(2)
+        self.assertEqual(self.servidor.solicitudes, solicitudes + 1)
+        self.assertEqual(resultado.get("texto"), self.servidor.texto)
+        self.assertEqual(cliente.breaker.estado, CircuitBreaker.CERRADO)
+
+    def test_sonda_fallida_vuelve_a_abrir(self):
+        self.servidor.modo = 'error'
+        cliente = self._cliente()
+        for _ in range(3):
+            with self.assertRaises(urllib.error.HTTPError):
+                cliente.generar("falla")
+        time.sleep(0.35)
+        with self.assertRaises(urllib.error.HTTPError):
+            cliente.generar("sonda")
+        self.assertEqual(cliente.breaker.estado, CircuitBreaker.ABIERTO)
+
+    def test_reporte_usa_interpretacion_naive_si_el_llm_falla(self):
+        from reportes import views as reportes_views
+
+        prompt = "productos samsung activos"
+        esperado = reportes_views._naive_interpret(prompt)
+        for modo in ('error', 'lento'):
+            self.servidor.modo = modo
+            self.servidor.demora = 1.0
+            cliente = self._cliente(timeout_segundos=0.2)
+            with mock.patch.object(reportes_views, 'GEMINI_CONFIGURED', True), \
+                    mock.patch.object(reportes_views, 'cliente_gemini', cliente):
+                interpretacion = reportes_views.GenerarReporteView()._call_gemini_api(prompt)
+            self.assertEqual(interpretacion, esperado, modo)
+            self.assertNotEqual(interpretacion.get("origen"), "llm")
+
+    def test_reporte_async_usa_gemini_o_cae_a_naive(self):
+        from reportes import views as reportes_views
+
+        prompt = "productos samsung activos"
+        vista = reportes_views.GenerarReporteView()
+        self.servidor.texto = '{"tipo_reporte": "productos", "filtros": {"marca__nombre__iexact": "Samsung"}}'
+        try:
+            cliente = self._cliente()
+            with mock.patch.object(reportes_views, 'GEMINI_CONFIGURED', True), \
+                    mock.patch.object(reportes_views, 'cliente_gemini', cliente):
+                interpretacion = asyncio.run(vista._call_gemini_api_async(prompt))
+            self.assertEqual(interpretacion["origen"], "llm")
+            self.assertEqual(interpretacion["tipo_reporte"], "productos")
+
+            self.servidor.modo = 'error'
+            with mock.patch.object(reportes_views, 'GEMINI_CONFIGURED', True), \
+                    mock.patch.object(reportes_views, 'cliente_gemini', self._cliente()):
+                interpretacion = asyncio.run(vista._call_gemini_api_async(prompt))
+            self.assertEqual(interpretacion, reportes_views._naive_interpret(prompt))
+        finally:
+            self.servidor.texto = '{"tipo_reporte": "productos"}'
+
+
+class AprenderInterpretacionTests(SimpleTestCase):
+    """Una interpretación de Gemini se guarda solo si su consulta se ejecutó sin errores."""
+
+    def _responder(self, serializar):
+        from reportes import views as reportes_views
+
+        vista = reportes_views.GenerarReporteView()
+        request = mock.Mock(user=None, META={})
+        interpretacion = {"tipo_reporte": "productos", "filtros": {}, "origen": "llm"}
+        with mock.patch.object(vista, '_build_queryset', return_value=([], False)), \
+                mock.patch.object(vista, '_serializar_datos', side_effect=serializar), \
+                mock.patch.object(reportes_views, 'registrar_accion'), \
+                mock.patch.object(reportes_views, 'aprender_interpretacion') as aprender:
+            respuesta = vista._responder(request, "productos con campo inventado", interpretacion)
+        return respuesta, aprender
+
+    def test_no_aprende_si_la_consulta_falla_al_ejecutarse(self):
+        def serializar(*args):
+            raise Exception("column producto.inventado does not exist")
+
+        respuesta, aprender = self._responder(serializar)
+        self.assertEqual(respuesta.status_code, 500)
+        aprender.assert_not_called()
+
+    def test_aprende_despues_de_serializar(self):
+        respuesta, aprender = self._responder(lambda *args: [{"id": 1}])
+        self.assertEqual(respuesta.status_code, 200)
+        aprender.assert_called_once()
@@ -1,6 +1,7 @@
 # reportes/urls.py
 from django.urls import path
 from . import views
+from . import views_async
 
 urlpatterns = [
     path('generar', views.GenerarReporteView.as_view(), name='generar_reporte'),
@@ -13,4 +14,8 @@ urlpatterns = [
     path('generar-reporte/', views.generar_reporte_cliente, name='generar-reporte-cliente'),
     path('generar-pdf-reporte/', views.generar_pdf_reporte, name='generar-pdf-reporte'),
     path('generar-pdf-consulta/', views.generar_pdf_consulta_ia, name='generar-pdf-consulta-ia'),
+    path('metricas-ia/', views.metricas_ia, name='metricas-ia'),
+    # GEMINI (async, pensado para correr bajo ASGI)
+    path('async/generar', views_async.generar_reporte_async, name='generar_reporte_async'),
+    path('async/consulta-ia/', views_async.consulta_ia_cliente_async, name='consulta-ia-cliente-async'),
 ]
\ No newline at end of file
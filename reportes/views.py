@@ -5,7 +5,7 @@ from rest_framework.response import Response
 from rest_framework import status, permissions
 from django.http import HttpResponse
 from django.conf import settings
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
 # endpoints_reportes_cliente.py
 from rest_framework.decorators import action
 from pydantic import BaseModel
@@ -22,7 +22,7 @@ import google.generativeai as genai
 
 # --- Django ORM ---
 from django.db import models
-from django.db.models import Sum, Count, Q, Avg, Max, Min
+from django.db.models import Sum, Count, Q, Avg, Max, Min, F
 from django.core.exceptions import FieldDoesNotExist
 from django.utils import timezone
 
@@ -34,7 +34,10 @@ from venta.models import CarritoModel, DetalleCarritoModel, PedidoModel, Detalle
 from .serializers import UsuarioReporteSerializer, CarritoReporteSerializer, PedidoReporteSerializer, DetallePedidoReporteSerializer, PagoReporteSerializer, PlanPagoReporteSerializer, ProductoReporteSerializer, CategoriaReporteSerializer, MarcaReporteSerializer,VentasAgrupadasSerializer, PedidoClienteSerializer, DetallePedidoClienteSerializer
 # from .permissions import IsAdminOrStaff
 from .generators import generar_reporte_pdf, generar_reporte_excel
+from .analitica_cliente import obtener_snapshot_cliente
+from .plantillas import interpretar_con_plantilla, obtener_interpretacion_aprendida, aprender_interpretacion
 from utils.encrypted_logger import registrar_accion
+from utils.llm_client import cliente_gemini, LLMNoDisponible, obtener_metricas
 
 # --- Configuración Gemini ---
 try:
@@ -58,7 +61,7 @@ VALID_TIPOS = {
 
 DJANGO_LOOKUP_OPERATORS = [
     'exact', 'iexact', 'contains', 'icontains', 'in', 'gt', 'gte', 'lt', 'lte',
-    'isnull', 'range', 'year', 'month', 'day', 'week_day', 'startswith',
+    'isnull', 'range', 'date', 'year', 'month', 'day', 'week_day', 'startswith',
     'istartswith', 'endswith', 'iendswith'
 ]
 
@@ -151,7 +154,7 @@ def _naive_interpret(user_prompt: str):
     if "inactivo" in p: 
         filtros["is_active"] = False
     if "stock bajo" in p: 
-        filtros["stock__lt"] = 5
+        filtros["stock__lte"] = "CAMPO:stock_minimo"
     if "sin stock" in p: 
         filtros["stock"] = 0
     if "pagado" in p: 
@@ -354,7 +357,16 @@ class ReporteBaseView(APIView):
                         value = [first_day, last_day]
                     elif value == "RELATIVE:LAST_30_DAYS":
                         value = [timezone.now() - timedelta(days=30), timezone.now()]
-                
+
+                # Comparación contra otro campo del registro: "CAMPO:stock_minimo" → F('stock_minimo')
+                if isinstance(value, str) and value.startswith("CAMPO:"):
+                    campo = value[len("CAMPO:"):]
+                    self._validate_and_convert_value(ModelClass, lookup, None)
+                    self._validate_and_convert_value(ModelClass, campo, None)
+                    q_filtros &= Q(**{lookup: F(campo)})
+                    print(f"   ✅ Filtro aplicado: {lookup} = F('{campo}')")
+                    continue
+
                 converted_value = self._validate_and_convert_value(ModelClass, lookup, value)
                 q_filtros &= Q(**{lookup: converted_value})
                 print(f"   ✅ Filtro aplicado: {lookup} = {converted_value}")
@@ -597,10 +609,8 @@ class ReporteBaseView(APIView):
 # ===================================================================
 class GenerarReporteView(ReporteBaseView):
 
-    def _call_gemini_api(self, user_prompt: str):
-        if not GEMINI_CONFIGURED:
-            return _naive_interpret(user_prompt)
-
+    def _prompt_gemini(self, user_prompt: str):
+        """Contenido y configuración de la llamada a Gemini (compartido por la vista sync y la async)"""
         now = timezone.now()
         current_date_str = now.strftime('%Y-%m-%d')
 
@@ -653,8 +663,9 @@ class GenerarReporteView(ReporteBaseView):
 
     D) PRODUCTOS CON BAJO STOCK:
     - tipo_reporte: "productos"
-    - filtros: {{"stock__lt": 10, "is_active": true}}
+    - filtros: {{"stock__lte": "CAMPO:stock_minimo", "is_active": true}}
     - orden: ["stock"]
+    (un valor "CAMPO:<campo>" compara contra otro campo del mismo registro)
 
     E) PEDIDOS RECIENTES CON DETALLES:
     - tipo_reporte: "pedidos"
@@ -747,54 +758,97 @@ Respuesta: {{
 
 IMPORTANTE: Para consultas de marca específica, usar SIEMPRE __iexact no __icontains.
 """
-        
-        try:
-            model = genai.GenerativeModel(GEMINI_MODEL_NAME)
-            generation_config = genai.types.GenerationConfig(
-                response_mime_type="application/json",
-                temperature=0.1  # Menos creatividad, más precisión
-            )
-            response = model.generate_content(
-                [system_instruction, schema_definition, user_prompt],
-                generation_config=generation_config
-            )
+        generation_config = genai.types.GenerationConfig(
+            response_mime_type="application/json",
+            temperature=0.1  # Menos creatividad, más precisión
+        )
+        return [system_instruction, schema_definition, user_prompt], generation_config
 
-            raw_response_text = (response.text or "").strip()
-            print(f"[Gemini] Raw JSON response:\n{raw_response_text}")
+    def _interpretar_respuesta_gemini(self, raw_response_text):
+        print(f"[Gemini] Raw JSON response:\n{raw_response_text}")
 
-            cleaned = raw_response_text.removeprefix("```json").removesuffix("```").strip()
-            if not (cleaned.startswith('{') and cleaned.endswith('}')):
-                i, j = cleaned.find('{'), cleaned.rfind('}')
-                if i != -1 and j != -1 and j > i:
-                    cleaned = cleaned[i:j+1]
-                else:
-                    raise json.JSONDecodeError("No JSON object found", cleaned, 0)
+        cleaned = raw_response_text.removeprefix("```json").removesuffix("```").strip()
+        if not (cleaned.startswith('{') and cleaned.endswith('}')):
+            i, j = cleaned.find('{'), cleaned.rfind('}')
+            if i != -1 and j != -1 and j > i:
+                cleaned = cleaned[i:j+1]
+            else:
+                raise json.JSONDecodeError("No JSON object found", cleaned, 0)
 
-            parsed = json.loads(cleaned)
-            interp = _normalize_interpretacion(parsed, default_tipo="productos")
-            
-            # Agregar límite si viene en la respuesta
-            if 'limite' in parsed and isinstance(parsed['limite'], int):
-                interp['limite'] = parsed['limite']
+        parsed = json.loads(cleaned)
+        interp = _normalize_interpretacion(parsed, default_tipo="productos")
 
-            if parsed.get("error") and interp["tipo_reporte"] in VALID_TIPOS:
-                print(f"[Gemini] Warning from LLM: {parsed.get('error')}. Using tolerant mode.")
-                interp["error"] = None
-            
-            return interp
+        # Agregar límite si viene en la respuesta
+        if 'limite' in parsed and isinstance(parsed['limite'], int):
+            interp['limite'] = parsed['limite']
+
+        if parsed.get("error") and interp["tipo_reporte"] in VALID_TIPOS:
+            print(f"[Gemini] Warning from LLM: {parsed.get('error')}. Using tolerant mode.")
+            interp["error"] = None
+
+        interp["origen"] = "llm"
+        return interp
 
+    def _call_gemini_api(self, user_prompt: str):
+        if not GEMINI_CONFIGURED:
+            return _naive_interpret(user_prompt)
+        try:
+            contenido, generation_config = self._prompt_gemini(user_prompt)
+            raw_response_text = cliente_gemini.generar(
+                contenido, modelo=GEMINI_MODEL_NAME, generation_config=generation_config
+            )
+            return self._interpretar_respuesta_gemini(raw_response_text)
+        except LLMNoDisponible as e:
+            print(f"[WARN] Gemini no disponible -> falling back to naive. Reason: {e}")
+            return _naive_interpret(user_prompt)
+        except Exception as e:
+            print(f"[ERROR] Gemini failed -> falling back to naive. Reason: {e}")
+            traceback.print_exc()
+            return _naive_interpret(user_prompt)
+
+    async def _call_gemini_api_async(self, user_prompt: str):
+        """Igual que _call_gemini_api, sin bloquear el event loop mientras responde Gemini"""
+        if not GEMINI_CONFIGURED:
+            return _naive_interpret(user_prompt)
+        try:
+            contenido, generation_config = self._prompt_gemini(user_prompt)
+            raw_response_text = await cliente_gemini.generar_async(
+                contenido, modelo=GEMINI_MODEL_NAME, generation_config=generation_config
+            )
+            return self._interpretar_respuesta_gemini(raw_response_text)
+        except LLMNoDisponible as e:
+            print(f"[WARN] Gemini no disponible -> falling back to naive. Reason: {e}")
+            return _naive_interpret(user_prompt)
         except Exception as e:
             print(f"[ERROR] Gemini failed -> falling back to naive. Reason: {e}")
             traceback.print_exc()
             return _naive_interpret(user_prompt)
 
+    @staticmethod
+    def _interpretar_sin_llm(prompt):
+        """Plantillas de prompts frecuentes o interpretaciones ya aprendidas; None si hace falta Gemini"""
+        if not prompt:
+            return _naive_interpret(prompt)
+        interpretacion = interpretar_con_plantilla(prompt)
+        if interpretacion is not None:
+            interpretacion["origen"] = "plantilla"
+            return interpretacion
+        interpretacion = obtener_interpretacion_aprendida(prompt)
+        if interpretacion is not None:
+            interpretacion["origen"] = "cache"
+        return interpretacion
+
     def post(self, request, *args, **kwargs):
         prompt = (request.data.get('prompt') or "").strip()
-        if not prompt:
-            interpretacion = _naive_interpret(prompt)
-        else:
+        # 1️⃣ Plantillas de prompts frecuentes, 2️⃣ interpretaciones ya aprendidas, 3️⃣ Gemini
+        interpretacion = self._interpretar_sin_llm(prompt)
+        if interpretacion is None:
             interpretacion = self._call_gemini_api(prompt)
+        return self._responder(request, prompt, interpretacion)
 
+    def _responder(self, request, prompt, interpretacion):
+        """Arma el reporte a partir de la interpretación (solo ORM; la vista async lo llama en sync_to_async)"""
+        print(f"[INFO] Interpretación de '{prompt}' obtenida por: {interpretacion.get('origen', 'naive')}")
         interpretacion["error"] = None
         interpretacion["prompt"] = prompt
 
@@ -816,14 +870,18 @@ IMPORTANTE: Para consultas de marca específica, usar SIEMPRE __iexact no __icon
             data_para_reporte = self._serializar_datos(queryset, tipo_reporte, hubo_agrupacion)
 
             json_output = json.dumps(data_para_reporte, default=_json_converter)
-            registrar_accion(request.user, f"Genero reporte de {tipo_reporte}", request.META.get('REMOTE_ADDR'))
-            return HttpResponse(json_output, content_type='application/json', status=status.HTTP_200_OK)
-
         except Exception as e:
             print(f"[ERROR] Exception during data preparation: {e}")
             traceback.print_exc()
             return Response({"error": "Error al preparar los datos del reporte."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+        # Solo se aprende una interpretación de Gemini cuya consulta ya se ejecutó y serializó sin errores
+        # (el queryset es perezoso: _build_queryset no garantiza que la consulta funcione)
+        if interpretacion.get("origen") == "llm":
+            aprender_interpretacion(prompt, interpretacion)
+        registrar_accion(request.user, f"Genero reporte de {tipo_reporte}", request.META.get('REMOTE_ADDR'))
+        return HttpResponse(json_output, content_type='application/json', status=status.HTTP_200_OK)
+
 # ===================================================================
 # VISTA #2: ReporteDirectoView (SIN IA)
 # ===================================================================
@@ -858,9 +916,6 @@ class ReporteDirectoView(ReporteBaseView):
             data_para_reporte = self._serializar_datos(queryset, tipo_reporte, hubo_agrupacion)
 
             json_output = json.dumps(data_para_reporte, default=_json_converter)
-            registrar_accion(request.user, f"Genero reporte de {tipo_reporte}", request.META.get('REMOTE_ADDR'))
-            return HttpResponse(json_output, content_type='application/json', status=status.HTTP_200_OK)
-
         except Exception as e:
             print(f"[ERROR] Exception during data preparation: {e}")
             traceback.print_exc()
@@ -1045,72 +1100,15 @@ def _convertir_tipos_numericos(datos):
     return datos
 
 def _obtener_datos_cliente(cliente):
-    """Obtiene datos estructurados del cliente para IA"""
+    """Obtiene datos estructurados del cliente para IA (snapshot precalculado y cacheado)"""
     try:
-        pedidos_cliente = PedidoModel.objects.filter(usuario=cliente)
-        total_pedidos = pedidos_cliente.count()
-        total_gastado = pedidos_cliente.aggregate(total=Sum('total'))['total'] or 0
-
-        productos_frecuentes = DetallePedidoModel.objects.filter(
-            pedido__usuario=cliente
-        ).values(
-            'producto__nombre', 
-            'producto__marca__nombre'
-        ).annotate(
-            veces_comprado=Count('id'),
-            total_unidades=Sum('cantidad'),
-            total_gastado=Sum('subtotal')
-        ).order_by('-veces_comprado')[:3]
-
-        productos_frecuentes_limpios = []
-        for producto in productos_frecuentes:
-            producto_limpio = {}
-            for key, value in producto.items():
-                if isinstance(value, Decimal):
-                    producto_limpio[key] = float(value)
-                else:
-                    producto_limpio[key] = value
-            productos_frecuentes_limpios.append(producto_limpio)
-
-        ultimo_pedido = pedidos_cliente.order_by('-fecha').first()
-        ultimo_pedido_data = {}
-        if ultimo_pedido:
-            ultimo_pedido_data = {
-                "fecha": ultimo_pedido.fecha.strftime('%Y-%m-%d'),
-                "total": float(ultimo_pedido.total),
-                "estado": ultimo_pedido.estado
-            }
-
-        pedidos_por_estado = list(pedidos_cliente.values('estado').annotate(
-            total=Count('id')
-        ))
-
-        seis_meses_atras = timezone.now() - timedelta(days=180)
-        tendencia_mensual = list(pedidos_cliente.filter(
-            fecha__gte=seis_meses_atras
-        ).extra(
-            {'mes': "DATE_TRUNC('month', fecha)"}
-        ).values('mes').annotate(
-            total_mes=Sum('total'),
-            pedidos_mes=Count('id')
-        ).order_by('mes'))
-
-        for item in tendencia_mensual:
-            if 'total_mes' in item and isinstance(item['total_mes'], Decimal):
-                item['total_mes'] = float(item['total_mes'])
-
-        return {
+        datos = dict(obtener_snapshot_cliente(cliente.id))
+        datos.update({
             "nombre_cliente": cliente.get_full_name() or cliente.username,
-            "total_pedidos": total_pedidos,
-            "total_gastado": float(total_gastado),
-            "promedio_por_pedido": float(total_gastado / total_pedidos) if total_pedidos > 0 else 0,
-            "productos_frecuentes": productos_frecuentes_limpios,
-            "ultimo_pedido": ultimo_pedido_data,
-            "pedidos_por_estado": pedidos_por_estado,
-            "tendencia_mensual": tendencia_mensual,
             "miembro_desde": cliente.date_joined.strftime('%Y-%m-%d'),
             "meses_como_cliente": (timezone.now().date() - cliente.date_joined.date()).days // 30
-        }
+        })
+        return datos
 
     except Exception as e:
         print(f"[ERROR] Obteniendo datos cliente: {e}")
@@ -1225,11 +1223,8 @@ def _serializar_datos(queryset, tipo_reporte, hubo_agrupacion):
 
 # En tu views.py - FUNCIONES CORREGIDAS
 
-def _call_gemini_cliente(user_prompt: str, datos_cliente: dict):
-    """Gemini especializado para consultas del cliente - CORREGIDO para tus modelos"""
-    if not GEMINI_CONFIGURED:
-        return _naive_interpret_cliente(user_prompt, datos_cliente)
-
+def _prompt_gemini_cliente(user_prompt: str, datos_cliente: dict):
+    """Contenido y configuración de la llamada a Gemini para consultas del cliente"""
     now = timezone.now()
     current_date_str = now.strftime('%Y-%m-%d')
 
@@ -1340,38 +1335,56 @@ Respuesta: {{
 IMPORTANTE: Si el usuario pregunta sobre productos, compras frecuentes, o qué compra más, usar "ventas".
 Si pregunta sobre pedidos, órdenes, compras, usar "pedidos".
 """
+    generation_config = genai.types.GenerationConfig(
+        response_mime_type="application/json",
+        temperature=0.1
+    )
+    return [system_instruction, schema_cliente, user_prompt], generation_config
 
-    try:
-        model = genai.GenerativeModel(GEMINI_MODEL_NAME)
-        generation_config = genai.types.GenerationConfig(
-            response_mime_type="application/json",
-            temperature=0.1
-        )
 
-        response = model.generate_content(
-            [system_instruction, schema_cliente, user_prompt],
-            generation_config=generation_config
-        )
+def _interpretar_respuesta_cliente(raw_response_text, datos_cliente):
+    print(f"[Gemini Cliente] Raw JSON response:\n{raw_response_text}")
 
-        raw_response_text = (response.text or "").strip()
-        print(f"[Gemini Cliente] Raw JSON response:\n{raw_response_text}")
+    cleaned = raw_response_text.removeprefix("```json").removesuffix("```").strip()
+    if not (cleaned.startswith('{') and cleaned.endswith('}')):
+        i, j = cleaned.find('{'), cleaned.rfind('}')
+        if i != -1 and j != -1 and j > i:
+            cleaned = cleaned[i:j+1]
+        else:
+            raise json.JSONDecodeError("No JSON object found", cleaned, 0)
 
-        cleaned = raw_response_text.removeprefix("```json").removesuffix("```").strip()
-        if not (cleaned.startswith('{') and cleaned.endswith('}')):
-            i, j = cleaned.find('{'), cleaned.rfind('}')
-            if i != -1 and j != -1 and j > i:
-                cleaned = cleaned[i:j+1]
-            else:
-                raise json.JSONDecodeError("No JSON object found", cleaned, 0)
+    parsed = json.loads(cleaned)
+    interp = _normalize_interpretacion(parsed, default_tipo="pedidos")
 
-        parsed = json.loads(cleaned)
-        interp = _normalize_interpretacion(parsed, default_tipo="pedidos")
+    # CORRECCIÓN AUTOMÁTICA DE FILTROS
+    return _corregir_filtros_automaticamente(interp, datos_cliente)
 
-        # CORRECCIÓN AUTOMÁTICA DE FILTROS
-        interp = _corregir_filtros_automaticamente(interp, datos_cliente)
 
-        return interp
+def _call_gemini_cliente(user_prompt: str, datos_cliente: dict):
+    """Gemini especializado para consultas del cliente - CORREGIDO para tus modelos"""
+    if not GEMINI_CONFIGURED:
+        return _naive_interpret_cliente(user_prompt, datos_cliente)
+    try:
+        contenido, generation_config = _prompt_gemini_cliente(user_prompt, datos_cliente)
+        raw_response_text = cliente_gemini.generar(
+            contenido, modelo=GEMINI_MODEL_NAME, generation_config=generation_config
+        )
+        return _interpretar_respuesta_cliente(raw_response_text, datos_cliente)
+    except Exception as e:
+        print(f"[ERROR] Gemini cliente failed -> falling back to naive. Reason: {e}")
+        return _naive_interpret_cliente(user_prompt, datos_cliente)
+
 
+async def _call_gemini_cliente_async(user_prompt: str, datos_cliente: dict):
+    """Igual que _call_gemini_cliente, sin bloquear el event loop mientras responde Gemini"""
+    if not GEMINI_CONFIGURED:
+        return _naive_interpret_cliente(user_prompt, datos_cliente)
+    try:
+        contenido, generation_config = _prompt_gemini_cliente(user_prompt, datos_cliente)
+        raw_response_text = await cliente_gemini.generar_async(
+            contenido, modelo=GEMINI_MODEL_NAME, generation_config=generation_config
+        )
+        return _interpretar_respuesta_cliente(raw_response_text, datos_cliente)
     except Exception as e:
         print(f"[ERROR] Gemini cliente failed -> falling back to naive. Reason: {e}")
         return _naive_interpret_cliente(user_prompt, datos_cliente)
@@ -1556,6 +1569,51 @@ def _generar_respuesta_amigable(pregunta, datos, datos_cliente, tipo_reporte):
 # ENDPOINTS CON @api_view
 # ===================================================================
 
+_RESPUESTA_ERROR_CONSULTA = {
+    "respuesta": "Lo siento, hubo un error al procesar tu consulta. Por favor intenta con preguntas más específicas sobre tus pedidos.",
+    "sugerencias": [
+        "¿Cuál fue mi último pedido?",
+        "¿Cuánto he gastado en total?",
+        "¿Cuáles son mis productos más comprados?",
+        "¿Tengo pedidos pendientes?"
+    ]
+}
+
+
+def _responder_consulta_cliente(pregunta, datos_cliente, interpretacion):
+    """Ejecuta la consulta interpretada y arma la respuesta (solo ORM; la vista async lo llama en sync_to_async)"""
+    interpretacion["prompt"] = pregunta
+    interpretacion["error"] = None
+
+    print(f"🎯 Consulta cliente: {pregunta}")
+    print(f"🔐 Interpretación con seguridad: {interpretacion}")
+
+    queryset, hubo_agrupacion = _build_queryset(interpretacion)
+
+    tipo_reporte = interpretacion.get("tipo_reporte")
+    data_para_reporte = _serializar_datos(queryset, tipo_reporte, hubo_agrupacion)
+
+    data_convertida = _convertir_tipos_numericos(data_para_reporte)
+    data_limpia = _limpiar_datos_para_json(data_convertida)
+    datos_cliente_limpios = _limpiar_datos_para_json(datos_cliente)
+
+    respuesta_amigable = _generar_respuesta_amigable(
+        pregunta, data_limpia, datos_cliente_limpios, tipo_reporte
+    )
+
+    return {
+        "respuesta": respuesta_amigable,
+        "datos": data_limpia,
+        "tipo_consulta": interpretacion["tipo_reporte"],
+        "total_resultados": len(data_limpia),
+        "datos_cliente": {
+            "total_pedidos": datos_cliente_limpios.get("total_pedidos", 0),
+            "total_gastado": datos_cliente_limpios.get("total_gastado", 0),
+            "producto_mas_comprado": datos_cliente_limpios.get("productos_frecuentes", [{}])[0] if datos_cliente_limpios.get("productos_frecuentes") else {}
+        }
+    }
+
+
 @api_view(['POST'])
 def consulta_ia_cliente(request):
     """Consulta con IA sobre los pedidos del cliente"""
@@ -1579,49 +1637,12 @@ def consulta_ia_cliente(request):
         datos_cliente['id'] = cliente.id
 
         interpretacion = _call_gemini_cliente(pregunta, datos_cliente)
-        interpretacion["prompt"] = pregunta
-        interpretacion["error"] = None
-
-        print(f"🎯 Consulta cliente: {pregunta}")
-        print(f"🔐 Interpretación con seguridad: {interpretacion}")
-
-        queryset, hubo_agrupacion = _build_queryset(interpretacion)
-
-        tipo_reporte = interpretacion.get("tipo_reporte")
-        data_para_reporte = _serializar_datos(queryset, tipo_reporte, hubo_agrupacion)
-
-        data_convertida = _convertir_tipos_numericos(data_para_reporte)
-        data_limpia = _limpiar_datos_para_json(data_convertida)
-        datos_cliente_limpios = _limpiar_datos_para_json(datos_cliente)
-
-        respuesta_amigable = _generar_respuesta_amigable(
-            pregunta, data_limpia, datos_cliente_limpios, tipo_reporte
-        )
-
-        return Response({
-            "respuesta": respuesta_amigable,
-            "datos": data_limpia,
-            "tipo_consulta": interpretacion["tipo_reporte"],
-            "total_resultados": len(data_limpia),
-            "datos_cliente": {
-                "total_pedidos": datos_cliente_limpios.get("total_pedidos", 0),
-                "total_gastado": datos_cliente_limpios.get("total_gastado", 0),
-                "producto_mas_comprado": datos_cliente_limpios.get("productos_frecuentes", [{}])[0] if datos_cliente_limpios.get("productos_frecuentes") else {}
-            }
-        })
+        return Response(_responder_consulta_cliente(pregunta, datos_cliente, interpretacion))
 
     except Exception as e:
         print(f"[ERROR] Consulta IA cliente: {e}")
         traceback.print_exc()
-        return Response({
-            "respuesta": "Lo siento, hubo un error al procesar tu consulta. Por favor intenta con preguntas más específicas sobre tus pedidos.",
-            "sugerencias": [
-                "¿Cuál fue mi último pedido?",
-                "¿Cuánto he gastado en total?",
-                "¿Cuáles son mis productos más comprados?",
-                "¿Tengo pedidos pendientes?"
-            ]
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(_RESPUESTA_ERROR_CONSULTA, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
 def estadisticas_cliente(request):
@@ -1922,4 +1943,14 @@ def generar_pdf_consulta_ia(request):
         return Response(
             {"error": f"Error al generar el PDF: {str(e)}"}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
+        )
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def metricas_ia(request):
+    """Estado del circuito y histograma de latencias del cliente LLM compartido"""
+    return Response({
+        "status": 1,
+        "error": 0,
+        "message": "Métricas del cliente de IA",
+        "values": obtener_metricas()
+    })
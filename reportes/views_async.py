@@ -0,0 +1,74 @@
+# reportes/views_async.py
+"""
+Versiones async de los endpoints de reportes que llaman a Gemini, para el modo ASGI.
+
+La espera a Gemini (`cliente_gemini.generar_async`, con el mismo plazo, semáforo y
+circuit breaker que la versión sync) no ocupa el worker. Plantillas, caché de
+interpretaciones, consultas y serialización siguen siendo sync y van en
+`sync_to_async`. La respuesta tiene el mismo formato que la vista DRF equivalente.
+
+Pendiente (fuera de este cambio): las subidas a Cloudinary y los envíos FCM siguen
+siendo llamadas sync dentro de sus vistas DRF.
+"""
+import json
+import traceback
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from utils.async_views import requiere_jwt_async, respuesta_drf_a_json
+from .views import (
+    GenerarReporteView, _RESPUESTA_ERROR_CONSULTA, _call_gemini_cliente_async,
+    _obtener_datos_cliente, _responder_consulta_cliente,
+)
+
+
+def _leer_json(request):
+    try:
+        return json.loads(request.body or b"{}")
+    except json.JSONDecodeError:
+        return {}
+
+
+@csrf_exempt
+@require_POST
+@requiere_jwt_async
+async def generar_reporte_async(request):
+    """Reporte a partir de un prompt en lenguaje natural (async)"""
+    prompt = (_leer_json(request).get('prompt') or "").strip()
+    vista = GenerarReporteView()
+    # 1️⃣ Plantillas de prompts frecuentes, 2️⃣ interpretaciones ya aprendidas, 3️⃣ Gemini
+    interpretacion = await sync_to_async(vista._interpretar_sin_llm)(prompt)
+    if interpretacion is None:
+        interpretacion = await vista._call_gemini_api_async(prompt)
+    respuesta = await sync_to_async(vista._responder)(request, prompt, interpretacion)
+    return respuesta_drf_a_json(respuesta)
+
+
+@csrf_exempt
+@require_POST
+@requiere_jwt_async
+async def consulta_ia_cliente_async(request):
+    """Consulta con IA sobre los pedidos del cliente (async)"""
+    cliente = request.user
+    pregunta = (_leer_json(request).get('pregunta') or '').strip()
+    if not pregunta:
+        return JsonResponse({"error": "Se requiere una pregunta"}, status=400)
+
+    try:
+        datos_cliente = await sync_to_async(_obtener_datos_cliente)(cliente)
+        if not datos_cliente:
+            return JsonResponse({"error": "No se pudieron obtener los datos del cliente"}, status=500)
+
+        datos_cliente['id'] = cliente.id
+
+        interpretacion = await _call_gemini_cliente_async(pregunta, datos_cliente)
+        datos = await sync_to_async(_responder_consulta_cliente)(pregunta, datos_cliente, interpretacion)
+        return JsonResponse(datos)
+
+    except Exception as e:
+        print(f"[ERROR] Consulta IA cliente: {e}")
+        traceback.print_exc()
+        return JsonResponse(_RESPUESTA_ERROR_CONSULTA, status=500)
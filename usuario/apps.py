@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class UsuarioConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'usuario'
+
+    def ready(self):
+        from . import authentication  # noqa: F401  (señales que invalidan la caché de estado)
+        from . import signals  # noqa: F401
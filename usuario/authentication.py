@@ -0,0 +1,134 @@
+# usuario/authentication.py
+"""
+Autenticación JWT basada en claims.
+
+`ClaimsJWTAuthentication` no lee la fila del usuario en cada request: arma el
+usuario con los claims del token (username, nombres, email) y con un estado
+mínimo (is_active, is_staff, is_superuser, grupo, token_version) que se guarda en
+una caché en memoria del proceso durante AUTH_ESTADO_USUARIO_TTL segundos.
+
+- Los cambios hechos en este proceso (guardar usuario o grupo) invalidan la caché
+  al momento; en otros workers se ven como máximo tras el TTL.
+- `revocar_tokens_usuario` incrementa `token_version`; los tokens emitidos antes
+  dejan de ser válidos (en cuanto expira la caché en los demás workers).
+- Si una vista lee un campo que no viene en el token (ci, telefono, ...), se cargan
+  todos los campos restantes con una sola consulta.
+- Guardar ese usuario no escribe los campos del token que la vista no cambió (ver
+  UsuarioToken.save); aun así, las vistas que modifican al usuario trabajan sobre la
+  fila leída de la BD.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import router
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import Usuario, UsuarioToken, Grupo
+
+TTL_ESTADO = getattr(settings, 'AUTH_ESTADO_USUARIO_TTL', 30)
+MAX_ENTRADAS = getattr(settings, 'AUTH_ESTADO_USUARIO_MAX', 10000)
+
+CAMPOS_ESTADO = ('is_active', 'is_staff', 'is_superuser', 'grupo_id', 'token_version')
+CAMPOS_CLAIMS = ('username', 'first_name', 'last_name', 'email')
+
+
+# --------------------------
+# Caché de estado por proceso
+# --------------------------
+_estados = {}
+_lock = threading.Lock()
+
+
+def obtener_estado_usuario(usuario_id):
+    """Estado mínimo del usuario (o None si no existe), con una consulta solo si no está en caché."""
+    ahora = time.monotonic()
+    with _lock:
+        entrada = _estados.get(usuario_id)
+    if entrada and entrada[0] > ahora:
+        return entrada[1]
+
+    estado = (
+        Usuario.objects.filter(pk=usuario_id)
+        .values(*CAMPOS_ESTADO, 'grupo__nombre', 'grupo__is_active')
+        .first()
+    )
+    with _lock:
+        if len(_estados) >= MAX_ENTRADAS:
+            _estados.clear()
+        _estados[usuario_id] = (ahora + TTL_ESTADO, estado)
+    return estado
+
+
+def invalidar_estado_usuario(usuario_id=None):
+    """Olvida el estado de un usuario (o de todos si no se indica)."""
+    with _lock:
+        if usuario_id is None:
+            _estados.clear()
+        else:
+            _estados.pop(usuario_id, None)
+
+
+def revocar_tokens_usuario(usuario_id):
+    """Invalida todos los tokens emitidos hasta ahora para el usuario."""
+    Usuario.objects.filter(pk=usuario_id).update(token_version=F('token_version') + 1)
+    invalidar_estado_usuario(usuario_id)
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def _usuario_cambiado(sender, instance, **kwargs):
+    invalidar_estado_usuario(instance.pk)
+
+
+@receiver(post_save, sender=Grupo)
+@receiver(post_delete, sender=Grupo)
+def _grupo_cambiado(sender, instance, **kwargs):
+    invalidar_estado_usuario()
+
+
+# --------------------------
+# Usuario armado desde el token
+# --------------------------
+def usuario_desde_claims(token, estado):
+    usuario_id = token[api_settings.USER_ID_CLAIM]
+    db = router.db_for_read(Usuario)
+    nombres = ['id', *CAMPOS_CLAIMS, *CAMPOS_ESTADO]
+    valores = [usuario_id, *[token.get(campo) or '' for campo in CAMPOS_CLAIMS], *[estado[c] for c in CAMPOS_ESTADO]]
+    usuario = UsuarioToken.from_db(db, nombres, valores)
+    usuario.valores_token(zip(nombres[1:], valores[1:]))
+
+    if estado['grupo_id']:
+        usuario.grupo = Grupo.from_db(
+            db, ['id', 'nombre', 'is_active'],
+            [estado['grupo_id'], estado['grupo__nombre'], estado['grupo__is_active']],
+        )
+    else:
+        usuario.grupo = None
+    return usuario
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication sin consulta a la tabla usuario mientras su estado esté en caché."""
+
+    def get_user(self, validated_token):
+        try:
+            usuario_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        estado = obtener_estado_usuario(usuario_id)
+        if estado is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not estado['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if validated_token.get('token_version', 0) != estado['token_version']:
+            raise AuthenticationFailed("Token revocado, inicie sesión nuevamente", code="token_revoked")
+
+        return usuario_desde_claims(validated_token, estado)
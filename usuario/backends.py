@@ -0,0 +1,36 @@
+# usuario/backends.py
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+
+class UsuarioBackend(ModelBackend):
+    """
+    ModelBackend que trae el grupo en la misma consulta del usuario, para que el login
+    (token, datos de respuesta y bitácora) no vuelva a consultar la tabla grupo.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            usuario = UserModel._default_manager.select_related('grupo').get(
+                **{UserModel.USERNAME_FIELD: username}
+            )
+        except UserModel.DoesNotExist:
+            # Igual que ModelBackend: hashear de todos modos para no revelar qué usuarios existen
+            UserModel().set_password(password)
+            return None
+        if usuario.check_password(password) and self.user_can_authenticate(usuario):
+            return usuario
+        return None
+
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        try:
+            usuario = UserModel._default_manager.select_related('grupo').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return usuario if self.user_can_authenticate(usuario) else None
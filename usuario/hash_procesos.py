@@ -0,0 +1,20 @@
+# usuario/hash_procesos.py
+"""
+Funciones que corren en los workers del pool de hash de contraseñas (usuario.importacion).
+
+Los workers se crean con 'spawn': importan este módulo antes de que Django esté
+configurado, así que aquí no se importa ningún modelo (ni módulos que los importen).
+`django.contrib.auth.hashers` se importa recién después de `django.setup()`.
+"""
+import os
+
+
+def inicializar_worker():
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'comercio.settings')
+    django.setup()
+
+
+def hashear(contrasena):
+    from django.contrib.auth.hashers import make_password
+    return make_password(contrasena)
@@ -0,0 +1,13 @@
+# usuario/hashers.py
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class PBKDF2IteracionesHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 con las iteraciones de settings.PASSWORD_PBKDF2_ITERACIONES.
+    Mantiene el algoritmo "pbkdf2_sha256", así que los hashes existentes siguen siendo
+    válidos y se re-hashean con el nuevo costo la próxima vez que el usuario inicia sesión.
+    Medir el costo con: python manage.py benchmark_login --iteraciones ...
+    """
+    iterations = getattr(settings, 'PASSWORD_PBKDF2_ITERACIONES', PBKDF2PasswordHasher.iterations)
@@ -0,0 +1,230 @@
+# usuario/importacion.py
+"""
+Importación masiva de usuarios (clientes).
+
+- La unicidad de username y email se comprueba para todo el lote con dos consultas IN
+  (más los repetidos dentro del mismo lote).
+- Las contraseñas se hashean en un pool de procesos (el hash PBKDF2 es CPU puro y el
+  GIL impide paralelizarlo con hilos); los lotes pequeños se hashean en el mismo proceso.
+  El pool es uno por proceso, se crea en el primer lote grande y lo reutilizan todas
+  las importaciones siguientes (requests o comando): las que llegan a la vez comparten
+  sus PROCESOS_HASH workers en lugar de lanzar procesos nuevos. Lo que corre en los
+  workers está en usuario/hash_procesos.py, que no importa modelos.
+- Los usuarios válidos se insertan con bulk_create por bloques; si un bloque choca con
+  un registro creado mientras tanto, ese bloque se reintenta fila por fila.
+
+Devuelve los creados y los errores por fila con el mismo formato que bulk_register.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from .hash_procesos import hashear, inicializar_worker
+from .models import Usuario, Grupo
+
+TAMANO_BLOQUE = 1000
+GRUPO_POR_DEFECTO = 2  # cliente
+MIN_PARA_POOL = getattr(settings, 'USUARIOS_IMPORTACION_MIN_POOL', 200)
+PROCESOS_HASH = getattr(settings, 'USUARIOS_IMPORTACION_PROCESOS', None) or os.cpu_count() or 2
+
+CAMPOS = ['username', 'first_name', 'last_name', 'email', 'ci', 'telefono', 'is_active', 'is_staff']
+REQUERIDOS = ['username', 'password', 'first_name', 'last_name', 'email']
+
+
+# --------------------------
+# Hash de contraseñas en procesos
+# --------------------------
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _obtener_pool(procesos):
+    """Pool compartido del proceso; se crea una sola vez con `procesos` workers."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            contexto = multiprocessing.get_context('spawn')
+            _pool = ProcessPoolExecutor(max_workers=procesos, mp_context=contexto, initializer=inicializar_worker)
+        return _pool
+
+
+def _descartar_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def hashear_contrasenas(contrasenas, procesos=PROCESOS_HASH):
+    """Devuelve los hashes en el mismo orden; usa el pool de procesos si el lote lo justifica."""
+    if len(contrasenas) < MIN_PARA_POOL or procesos <= 1:
+        return [make_password(contrasena) for contrasena in contrasenas]
+
+    pool = _obtener_pool(procesos)
+    try:
+        return list(pool.map(hashear, contrasenas, chunksize=max(len(contrasenas) // (procesos * 4), 1)))
+    except BrokenProcessPool:
+        # Un worker murió: el próximo lote crea un pool nuevo y este se hashea aquí
+        _descartar_pool(pool)
+        return [make_password(contrasena) for contrasena in contrasenas]
+
+
+# --------------------------
+# Validación
+# --------------------------
+def _limpiar_fila(fila, grupos_validos):
+    """Devuelve (datos, contraseña, errores) con las reglas de UserSerializer."""
+    if not isinstance(fila, dict):
+        return None, None, {"fila": ["Se esperaba un objeto"]}
+
+    errores = {}
+    for campo in REQUERIDOS:
+        if fila.get(campo) in (None, ''):
+            errores[campo] = ["Este campo es requerido."]
+
+    datos = {}
+    for campo in CAMPOS:
+        valor = fila.get(campo)
+        if valor in (None, ''):
+            continue
+        try:
+            datos[campo] = Usuario._meta.get_field(campo).clean(valor, None)
+        except ValidationError as e:
+            errores[campo] = list(e.messages)
+
+    # Misma normalización que create_user
+    if datos.get('username'):
+        datos['username'] = Usuario.normalize_username(datos['username'])
+    if datos.get('email'):
+        datos['email'] = Usuario.objects.normalize_email(datos['email'])
+
+    grupo_id = fila.get('grupo', GRUPO_POR_DEFECTO)
+    try:
+        grupo_id = int(grupo_id) if grupo_id not in (None, '') else None
+    except (TypeError, ValueError):
+        grupo_id = -1
+    if grupo_id is not None and grupo_id not in grupos_validos:
+        errores['grupo'] = [f'Clave primaria "{fila.get("grupo")}" inválida - objeto no existe.']
+    datos['grupo_id'] = grupo_id
+
+    contrasena = fila.get('password')
+    if contrasena and 'password2' in fila and fila.get('password2') != contrasena:
+        errores['password'] = ["Las contraseñas no coinciden."]
+    elif contrasena and 'password' not in errores:
+        try:
+            validate_password(contrasena, user=Usuario(**{k: v for k, v in datos.items() if k != 'grupo_id'}))
+        except ValidationError as e:
+            errores['password'] = list(e.messages)
+
+    return datos, contrasena, errores
+
+
+def _datos_creado(usuario, grupos):
+    return {
+        "id": usuario.id,
+        "username": usuario.username,
+        "first_name": usuario.first_name,
+        "last_name": usuario.last_name,
+        "email": usuario.email,
+        "ci": usuario.ci,
+        "telefono": usuario.telefono,
+        "grupo_id": usuario.grupo_id,
+        "grupo_nombre": grupos.get(usuario.grupo_id),
+    }
+
+
+# --------------------------
+# Escritura
+# --------------------------
+def _insertar_bloque(bloque, resultado, grupos):
+    """bloque: [(index, Usuario)]."""
+    try:
+        with transaction.atomic():
+            creados = Usuario.objects.bulk_create([usuario for _, usuario in bloque])
+        resultado['usuarios_creados'].extend(_datos_creado(u, grupos) for u in creados)
+        return
+    except IntegrityError:
+        pass
+
+    # Alguien creó un username/email del bloque mientras tanto: fila por fila para aislarlo
+    for index, usuario in bloque:
+        try:
+            with transaction.atomic():
+                usuario.save(force_insert=True)
+            resultado['usuarios_creados'].append(_datos_creado(usuario, grupos))
+        except IntegrityError as e:
+            resultado['errores'].append({
+                "index": index,
+                "username": usuario.username,
+                "errores": _errores_integridad(usuario, e),
+            })
+
+
+def _errores_integridad(usuario, error):
+    """Qué restricción rompió la fila: se vuelve a consultar username y email."""
+    errores = {}
+    if Usuario.objects.filter(username=usuario.username).exists():
+        errores['username'] = ["Este nombre de usuario ya está en uso."]
+    if usuario.email and Usuario.objects.filter(email=usuario.email).exists():
+        errores['email'] = ["Este correo electrónico ya está en uso."]
+    return errores or {"fila": [f"No se pudo guardar: {error}"]}
+
+
+def importar_usuarios(filas, tamano_bloque=TAMANO_BLOQUE, procesos=PROCESOS_HASH):
+    """
+    filas: lista de dicts con los campos de UserSerializer (password2 opcional, grupo por defecto 2).
+    Devuelve {"usuarios_creados", "errores", "duracion_segundos"}.
+    """
+    inicio = time.perf_counter()
+    grupos = dict(Grupo.objects.values_list('id', 'nombre'))
+    resultado = {"usuarios_creados": [], "errores": []}
+
+    limpias = []
+    for index, fila in enumerate(filas, start=1):
+        datos, contrasena, errores = _limpiar_fila(fila, grupos)
+        limpias.append((index, fila, datos, contrasena, errores))
+
+    # Unicidad: dos consultas IN para todo el lote
+    usernames = {d['username'] for _, _, d, _, _ in limpias if d and d.get('username')}
+    emails = {d['email'] for _, _, d, _, _ in limpias if d and d.get('email')}
+    usernames_existentes = set(Usuario.objects.filter(username__in=usernames).values_list('username', flat=True))
+    emails_existentes = set(Usuario.objects.filter(email__in=emails).values_list('email', flat=True))
+
+    validas = []
+    vistos_username, vistos_email = set(), set()
+    for index, fila, datos, contrasena, errores in limpias:
+        if datos:
+            username, email = datos.get('username'), datos.get('email')
+            if username and (username in usernames_existentes or username in vistos_username):
+                errores.setdefault('username', []).append("Este nombre de usuario ya está en uso.")
+            if email and (email in emails_existentes or email in vistos_email):
+                errores.setdefault('email', []).append("Este correo electrónico ya está en uso.")
+            vistos_username.add(username)
+            vistos_email.add(email)
+        if errores:
+            nombre = fila.get("username", "desconocido") if isinstance(fila, dict) else "desconocido"
+            resultado['errores'].append({"index": index, "username": nombre, "errores": errores})
+            continue
+        validas.append((index, datos, contrasena))
+
+    hashes = hashear_contrasenas([contrasena for _, _, contrasena in validas], procesos=procesos)
+    usuarios = [
+        (index, Usuario(password=hash_, **datos))
+        for (index, datos, _), hash_ in zip(validas, hashes)
+    ]
+    for i in range(0, len(usuarios), tamano_bloque):
+        _insertar_bloque(usuarios[i:i + tamano_bloque], resultado, grupos)
+
+    resultado['errores'].sort(key=lambda error: error['index'])
+    resultado['duracion_segundos'] = round(time.perf_counter() - inicio, 3)
+    return resultado
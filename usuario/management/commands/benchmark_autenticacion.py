@@ -0,0 +1,61 @@
+# management/commands/benchmark_autenticacion.py
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from usuario.authentication import ClaimsJWTAuthentication, invalidar_estado_usuario
+from usuario.models import Usuario
+from usuario.serializers import MyTokenObtainPairSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara consultas y latencia por request entre JWTAuthentication (lee el usuario y su grupo) '
+        'y ClaimsJWTAuthentication (arma el usuario desde los claims)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Requests simulados por modo')
+        parser.add_argument('--usuario', help='Username a usar (por defecto el primer usuario activo con grupo)')
+
+    def handle(self, *args, **options):
+        usuarios = Usuario.objects.filter(is_active=True).select_related('grupo')
+        if options['usuario']:
+            usuario = usuarios.filter(username=options['usuario']).first()
+        else:
+            usuario = usuarios.filter(grupo__isnull=False).first() or usuarios.first()
+        if not usuario:
+            raise CommandError('No hay un usuario activo para generar el token')
+
+        token = str(MyTokenObtainPairSerializer.get_token(usuario).access_token)
+        factory = RequestFactory()
+        self.stdout.write(self.style.SUCCESS(
+            f"Benchmark de autenticación: {options['requests']} requests como '{usuario.username}'"
+        ))
+
+        for nombre, clase in (('simplejwt', JWTAuthentication), ('claims', ClaimsJWTAuthentication)):
+            invalidar_estado_usuario()
+            autenticador = clase()
+            tiempos, consultas = [], []
+            for _ in range(options['requests']):
+                request = factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+                with CaptureQueriesContext(connection) as capturadas:
+                    inicio = time.perf_counter()
+                    user, _token = autenticador.authenticate(request)
+                    # Lo mismo que lee has_permission antes de consultar privilegios
+                    _ = user.grupo.nombre if user.grupo else None
+                    _ = (user.is_active, user.is_staff, user.is_superuser)
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                consultas.append(len(capturadas))
+
+            tiempos.sort()
+            p95 = tiempos[int(len(tiempos) * 0.95) - 1]
+            self.stdout.write(
+                f'  {nombre:<10} media {statistics.mean(tiempos):7.3f} ms | p95 {p95:7.3f} ms | '
+                f'consultas/request {statistics.mean(consultas):.2f} (total {sum(consultas)})'
+            )
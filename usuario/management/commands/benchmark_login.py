@@ -0,0 +1,77 @@
+# management/commands/benchmark_login.py
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from rest_framework.test import APIRequestFactory
+
+from usuario.models import Usuario, Grupo
+from usuario.views import MyTokenObtainPairView
+
+CONTRASENA = "Benchmark#Login2025"
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide latencia y logins/segundo del endpoint de login para distintos costos del hasher '
+        '(PBKDF2), para elegir PASSWORD_PBKDF2_ITERACIONES según el presupuesto de latencia'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=50, help='Logins por configuración')
+        parser.add_argument('--hilos', type=int, default=1, help='Logins concurrentes')
+        parser.add_argument('--iteraciones', type=int, nargs='+',
+                            help='Iteraciones PBKDF2 a comparar (por defecto solo la configurada)')
+        parser.add_argument('--presupuesto-ms', type=float, default=300, help='Latencia p95 aceptable por login')
+
+    def handle(self, *args, **options):
+        hasher = get_hasher('default')
+        iteraciones_originales = getattr(hasher, 'iterations', None)
+        lista_iteraciones = options['iteraciones'] or [iteraciones_originales]
+
+        usuario = Usuario.objects.create(
+            username=f"bench_login_{uuid.uuid4().hex[:8]}",
+            grupo=Grupo.objects.filter(is_active=True).first(),
+        )
+        vista = MyTokenObtainPairView.as_view()
+        factory = APIRequestFactory()
+
+        def login(_):
+            request = factory.post('/login/', {"username": usuario.username, "password": CONTRASENA}, format='json')
+            inicio = time.perf_counter()
+            respuesta = vista(request)
+            duracion = (time.perf_counter() - inicio) * 1000
+            close_old_connections()
+            return duracion, respuesta.status_code
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Benchmark de login ({hasher.algorithm}): {options['logins']} logins x {options['hilos']} hilo(s)"
+        ))
+        try:
+            for iteraciones in lista_iteraciones:
+                if iteraciones is not None:
+                    hasher.iterations = iteraciones
+                usuario.set_password(CONTRASENA)
+                usuario.save(update_fields=['password'])
+
+                inicio = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=options['hilos']) as pool:
+                    resultados = list(pool.map(login, range(options['logins'])))
+                total = time.perf_counter() - inicio
+
+                tiempos = sorted(duracion for duracion, _ in resultados)
+                fallidos = sum(1 for _, codigo in resultados if codigo != 200)
+                p95 = tiempos[max(int(len(tiempos) * 0.95) - 1, 0)]
+                estilo = self.style.SUCCESS if p95 <= options['presupuesto_ms'] else self.style.WARNING
+                self.stdout.write(estilo(
+                    f"  iteraciones {iteraciones:>9,} | media {statistics.mean(tiempos):7.1f} ms | "
+                    f"p95 {p95:7.1f} ms | {options['logins'] / total:6.1f} logins/s | fallidos {fallidos}"
+                ))
+        finally:
+            if iteraciones_originales is not None:
+                hasher.iterations = iteraciones_originales
+            usuario.delete()
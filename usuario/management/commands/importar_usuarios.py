@@ -0,0 +1,67 @@
+# management/commands/importar_usuarios.py
+import csv
+import json
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+from usuario.importacion import importar_usuarios, TAMANO_BLOQUE, PROCESOS_HASH
+from usuario.models import Usuario
+
+PREFIJO_BENCHMARK = "bench_imp_"
+
+
+class Command(BaseCommand):
+    help = 'Importa usuarios desde CSV o JSON lines, o mide usuarios/segundo con datos sintéticos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', nargs='?', help='Ruta del archivo (.csv o .jsonl)')
+        parser.add_argument('--bloque', type=int, default=TAMANO_BLOQUE, help='Usuarios por bulk_create')
+        parser.add_argument('--procesos', type=int, default=PROCESOS_HASH, help='Procesos para hashear contraseñas')
+        parser.add_argument('--benchmark', type=int, default=0,
+                            help='Importa N usuarios sintéticos, muestra usuarios/s y los elimina')
+
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            return self._benchmark(options['benchmark'], options['bloque'], options['procesos'])
+        if not options['archivo']:
+            raise CommandError('Indica el archivo a importar o usa --benchmark N')
+
+        with open(options['archivo'], encoding='utf-8-sig') as archivo:
+            if options['archivo'].lower().endswith('.csv'):
+                filas = list(csv.DictReader(archivo))
+            else:
+                filas = [json.loads(linea) for linea in archivo if linea.strip()]
+
+        resultado = importar_usuarios(filas, tamano_bloque=options['bloque'], procesos=options['procesos'])
+        self._imprimir(len(filas), resultado)
+        for error in resultado['errores'][:50]:
+            self.stdout.write(self.style.WARNING(f"  fila {error['index']} ({error['username']}): {error['errores']}"))
+
+    def _imprimir(self, total, resultado):
+        duracion = resultado['duracion_segundos']
+        por_segundo = len(resultado['usuarios_creados']) / duracion if duracion else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} filas en {duracion}s ({por_segundo:,.0f} usuarios/s) | "
+            f"creados {len(resultado['usuarios_creados'])} | errores {len(resultado['errores'])}"
+        ))
+
+    def _benchmark(self, cantidad, bloque, procesos):
+        lote = uuid.uuid4().hex[:6]
+        filas = [
+            {
+                "username": f"{PREFIJO_BENCHMARK}{lote}_{i}",
+                "password": f"Clave#{lote}{i}x",
+                "first_name": "Cliente",
+                "last_name": f"Benchmark {i}",
+                "email": f"{PREFIJO_BENCHMARK}{lote}_{i}@ejemplo.com",
+            }
+            for i in range(cantidad)
+        ]
+        try:
+            resultado = importar_usuarios(filas, tamano_bloque=bloque, procesos=procesos)
+            self.stdout.write(f"Procesos de hash: {procesos}")
+            self._imprimir(cantidad, resultado)
+        finally:
+            eliminados, _ = Usuario.objects.filter(username__startswith=f"{PREFIJO_BENCHMARK}{lote}_").delete()
+            self.stdout.write(f"Limpieza: {eliminados} filas eliminadas")
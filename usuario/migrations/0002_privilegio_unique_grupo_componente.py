@@ -0,0 +1,32 @@
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+def eliminar_duplicados(apps, schema_editor):
+    """Deja un solo privilegio por (grupo, componente): el más reciente (id mayor)."""
+    Privilegio = apps.get_model('usuario', 'Privilegio')
+    repetidos = (
+        Privilegio.objects.values('grupo_id', 'componente_id')
+        .annotate(ultimo=Max('id'), cantidad=Count('id'))
+        .filter(cantidad__gt=1)
+        .order_by()
+    )
+    for fila in repetidos.iterator():
+        Privilegio.objects.filter(
+            grupo_id=fila['grupo_id'], componente_id=fila['componente_id'], id__lt=fila['ultimo']
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuario', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(eliminar_duplicados, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='privilegio',
+            unique_together={('grupo', 'componente')},
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.contrib.postgres.indexes import OpClass
+from django.db.models.functions import Upper
 
 from django.contrib.auth.models import AbstractUser
 # Create your models here.
@@ -30,6 +32,8 @@ class Usuario(AbstractUser):
     # Flags mínimos
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)  # Para poder entrar al admin si quieres
+    # Se incrementa para invalidar todos los tokens emitidos (usuario/authentication.py)
+    token_version = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         if self.first_name and self.last_name:
@@ -38,6 +42,54 @@ class Usuario(AbstractUser):
             return self.username
     class Meta:
         db_table = "usuario"
+        indexes = [
+            # Búsqueda por prefijo del directorio de usuarios (istartswith -> UPPER(col) LIKE 'X%')
+            models.Index(OpClass(Upper('username'), name='text_pattern_ops'), name='usuario_username_prefijo_idx'),
+            models.Index(OpClass(Upper('email'), name='text_pattern_ops'), name='usuario_email_prefijo_idx'),
+            models.Index(fields=['ci'], name='usuario_ci_prefijo_idx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['telefono'], name='usuario_telefono_prefijo_idx', opclasses=['varchar_pattern_ops']),
+        ]
+
+# --------------------------
+# Usuario armado desde los claims del token (sin tabla propia)
+# --------------------------
+class UsuarioToken(Usuario):
+    """
+    Es una instancia de Usuario (sirve para filtros y claves foráneas); el primer
+    acceso a un campo que no vino en el token carga todos los que faltan en una sola consulta.
+    """
+
+    class Meta:
+        proxy = True
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        diferidos = self.get_deferred_fields()
+        if fields and diferidos and set(fields) <= diferidos:
+            fields = list(diferidos)
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+
+    def valores_token(self, valores):
+        """Registra los valores que vinieron del token / caché de estado (no leídos de la BD)."""
+        self._valores_token = dict(valores)
+
+    def save(self, *args, **kwargs):
+        """
+        Los campos del token pueden estar desactualizados (otro dispositivo cambió el email,
+        el estado en caché tiene hasta AUTH_ESTADO_USUARIO_TTL segundos): solo se escriben si
+        la vista los cambió. Los campos cargados de la BD se escriben como siempre.
+        """
+        valores = getattr(self, '_valores_token', None)
+        if valores and self.pk and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            sin_cambios = {campo for campo, valor in valores.items() if getattr(self, campo) == valor}
+            diferidos = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                campo.attname for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.attname not in diferidos and campo.attname not in sin_cambios
+            ]
+        super().save(*args, **kwargs)
+        if valores:
+            # Lo que se acaba de escribir ya es el valor de la BD
+            self._valores_token = {campo: getattr(self, campo) for campo in valores}
 
 # --------------------------
 # Modelo de Componente
@@ -64,13 +116,11 @@ class Privilegio(models.Model):
     puede_eliminar = models.BooleanField(default=False)
     puede_activar = models.BooleanField(default=False)
 
-    class Meta:
-        unique_together = ("grupo", "componente")
-
     def __str__(self):
         return f"{self.grupo.nombre} -> {self.componente.nombre}"
     class Meta:
         db_table = "privilegio"
+        unique_together = ("grupo", "componente")
 
 ## AGREGANDO MODELO PARA LAS NOTIFICACIONES PUSH
 
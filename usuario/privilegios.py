@@ -0,0 +1,86 @@
+# usuario/privilegios.py
+"""
+Operaciones en bloque sobre la matriz de privilegios (grupo x componente).
+
+La matriz pedida se compara con la existente (una consulta); solo las filas nuevas
+o con cambios se escriben, con un único upsert
+(bulk_create(update_conflicts=True) sobre la restricción grupo/componente),
+y la caché de privilegios del grupo se invalida una sola vez al confirmar.
+"""
+from django.db import transaction
+
+from comercio.permissions import invalidar_privilegios_grupo
+from .models import Privilegio, Componente
+
+PERMISOS = ['puede_leer', 'puede_crear', 'puede_actualizar', 'puede_eliminar', 'puede_activar']
+
+
+def _valores_pedidos(fila, existente):
+    # Igual que antes: los permisos no enviados quedan en False; puede_activar, si no se envía, se conserva
+    valores = {permiso: bool(fila.get(permiso, False)) for permiso in PERMISOS if permiso != 'puede_activar'}
+    if 'puede_activar' in fila:
+        valores['puede_activar'] = bool(fila['puede_activar'])
+    else:
+        valores['puede_activar'] = existente.puede_activar if existente else False
+    return valores
+
+
+def aplicar_matriz_privilegios(grupo, filas, reemplazar=False):
+    """
+    filas: [{"componente_id": 1, "puede_leer": True, ...}].
+    Con reemplazar=True se eliminan los privilegios del grupo que no estén en la matriz.
+    Devuelve {"creados", "actualizados", "sin_cambios", "eliminados", "omitidos", "privilegios"}.
+    """
+    pedidas = {}
+    omitidos = []
+    for fila in filas:
+        try:
+            pedidas[int(fila.get('componente_id'))] = fila
+        except (TypeError, ValueError, AttributeError):
+            omitidos.append(fila.get('componente_id') if isinstance(fila, dict) else fila)
+
+    validos = set(Componente.objects.filter(id__in=pedidas).values_list('id', flat=True))
+    omitidos += [componente_id for componente_id in pedidas if componente_id not in validos]
+    pedidas = {componente_id: fila for componente_id, fila in pedidas.items() if componente_id in validos}
+
+    resumen = {"creados": 0, "actualizados": 0, "sin_cambios": 0, "eliminados": 0, "omitidos": omitidos}
+    with transaction.atomic():
+        existentes = {p.componente_id: p for p in Privilegio.objects.filter(grupo=grupo)}
+
+        a_escribir = []
+        for componente_id, fila in pedidas.items():
+            existente = existentes.get(componente_id)
+            valores = _valores_pedidos(fila, existente)
+            if existente and all(getattr(existente, permiso) == valor for permiso, valor in valores.items()):
+                resumen["sin_cambios"] += 1
+                continue
+            resumen["actualizados" if existente else "creados"] += 1
+            a_escribir.append(Privilegio(grupo=grupo, componente_id=componente_id, **valores))
+
+        if a_escribir:
+            Privilegio.objects.bulk_create(
+                a_escribir,
+                update_conflicts=True,
+                unique_fields=['grupo', 'componente'],
+                update_fields=PERMISOS,
+            )
+        if reemplazar:
+            sobrantes = [componente_id for componente_id in existentes if componente_id not in pedidas]
+            if sobrantes:
+                resumen["eliminados"], _ = Privilegio.objects.filter(
+                    grupo=grupo, componente_id__in=sobrantes
+                ).delete()
+
+        if a_escribir or resumen["eliminados"]:
+            transaction.on_commit(lambda: invalidar_privilegios_grupo(grupo.id))
+
+    resumen["privilegios"] = list(
+        Privilegio.objects.filter(grupo=grupo).select_related('grupo', 'componente').order_by('componente_id')
+    )
+    return resumen
+
+
+def clonar_privilegios(grupo_origen, grupo_destino):
+    """Deja al grupo destino exactamente con la matriz del grupo origen."""
+    filas = list(Privilegio.objects.filter(grupo=grupo_origen).values('componente_id', *PERMISOS))
+    return aplicar_matriz_privilegios(grupo_destino, filas, reemplazar=True)
@@ -50,14 +50,25 @@ class UserSerializer(serializers.ModelSerializer):
         validated_data.pop('password2')
         password = validated_data.pop('password')
         
-        user = Usuario.objects.create_user(
-            **validated_data
-        )
-        user.set_password(password)
-        user.save()
+        # Un solo hash y un solo INSERT
+        user = Usuario.objects.create_user(password=password, **validated_data)
         
         return user
 
+# --------------------------
+# Serializer para el directorio de usuarios (solo lectura)
+# --------------------------
+class UsuarioDirectorioSerializer(serializers.ModelSerializer):
+    grupo_nombre = serializers.CharField(source='grupo.nombre', read_only=True, default=None)
+
+    class Meta:
+        model = Usuario
+        fields = [
+            'id', 'username', 'first_name', 'last_name', 'email', 'ci', 'telefono',
+            'grupo', 'grupo_nombre', 'is_active', 'is_staff', 'date_joined'
+        ]
+        read_only_fields = fields
+
 # --------------------------
 # Serializer para Actualizar Usuario
 # --------------------------
@@ -104,6 +115,8 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
         token['is_staff'] = user.is_staff
         token['grupo_id'] = user.grupo.id if user.grupo else None  # ← AÑADIDO
         token['grupo_nombre'] = user.grupo.nombre if user.grupo else None
+        token['is_superuser'] = user.is_superuser
+        token['token_version'] = user.token_version  # revocación (usuario/authentication.py)
 
         return token
 
@@ -0,0 +1,20 @@
+# usuario/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from comercio.permissions import invalidar_privilegios_grupo
+from .models import Privilegio, Componente
+
+
+# --------------------------
+# Invalidación de la matriz de privilegios en caché
+# (las operaciones en bloque de usuario/privilegios.py invalidan explícitamente)
+# --------------------------
+@receiver([post_save, post_delete], sender=Privilegio)
+def invalidar_por_privilegio(sender, instance, **kwargs):
+    invalidar_privilegios_grupo(instance.grupo_id)
+
+
+@receiver([post_save, post_delete], sender=Componente)
+def invalidar_por_componente(sender, instance, **kwargs):
+    invalidar_privilegios_grupo()
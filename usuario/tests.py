@@ -1,3 +1,31 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import check_password
+from django.test import SimpleTestCase
+
+from usuario import importacion
+
+
+# --------------------------
+# Hash de contraseñas en el pool de procesos
+# --------------------------
+class HashearContrasenasTests(SimpleTestCase):
+    def setUp(self):
+        parche = mock.patch.object(importacion, 'MIN_PARA_POOL', 2)
+        parche.start()
+        self.addCleanup(parche.stop)
+        self.addCleanup(self._cerrar_pool)
+
+    def _cerrar_pool(self):
+        if importacion._pool is not None:
+            importacion._descartar_pool(importacion._pool)
+
+    def test_hashea_en_los_workers_del_pool(self):
+        contrasenas = ["Clave#uno1", "Clave#dos2", "Clave#tres3"]
+        # Si el pool falla y se hashea en este proceso (la vuelta a serie), la prueba falla
+        with mock.patch.object(importacion, 'make_password', side_effect=AssertionError("se usó el hash en serie")):
+            hashes = importacion.hashear_contrasenas(contrasenas, procesos=2)
+
+        self.assertEqual(len(hashes), len(contrasenas))
+        for contrasena, hash_ in zip(contrasenas, hashes):
+            self.assertTrue(check_password(contrasena, hash_))
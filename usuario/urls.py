@@ -12,6 +12,8 @@ urlpatterns = [
     path('register/bulk/', views.bulk_register, name='bulk_register'),
     # Gestión de usuarios (CRUD)
     path('users/', views.UserListView.as_view(), name='user-list'),           # Listar todos
+    path('users/directorio/', views.DirectorioUsuariosView.as_view(), name='user-directorio'),  # Paginado y con búsqueda
+    path('users/directorio/exportar/', views.exportar_usuarios_csv, name='user-directorio-exportar'),
     path('profile/update/', views.UserUpdateView.as_view(), name='user-update'), # Actualizar perfil
     path('users/<int:pk>/delete/', views.UserDeleteView.as_view(), name='user-delete'), # Eliminar
     path('users/update/<int:id>', views.EditarUsuarioView.as_view(), name='user-update'), # Actualizar
@@ -24,6 +26,7 @@ urlpatterns = [
     path('eliminar_privilegio/<int:privilegio_id>', views.eliminar_privilegio, name='eliminar_privilegio'), 
     path('listar_privilegios', views.listar_privilegios, name='listar_privilegios'), 
     path('asignar_privilegios_grupo', views.asignar_privilegios_grupo, name='asignar_privilegios_grupo'),
+    path('clonar_privilegios_grupo', views.clonar_privilegios_grupo, name='clonar_privilegios_grupo'),
     
     # --------------------------
     # GRUPO
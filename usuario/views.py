@@ -1,22 +1,29 @@
+import csv
 from django.shortcuts import get_object_or_404, render
+from django.http import StreamingHttpResponse
+from django.db.models import Q
+from rest_framework.pagination import CursorPagination
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import AccessToken
-from django.contrib.auth import authenticate
 from rest_framework.exceptions import AuthenticationFailed
 from django.db import transaction
 from rest_framework.decorators import api_view, permission_classes 
 from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
 from .models import Usuario, Grupo, Dispositivo
 from . import models
 from . import serializers
-from .serializers import UserSerializer, MyTokenObtainPairSerializer, UserProfileSerializer, UserUpdateSerializer, ComponenteSerializer, PrivilegioSerializer, GrupoSerializer
+from .serializers import UserSerializer, MyTokenObtainPairSerializer, UserProfileSerializer, UserUpdateSerializer, ComponenteSerializer, PrivilegioSerializer, GrupoSerializer, UsuarioDirectorioSerializer
 from rest_framework import serializers
 from comercio.permissions import PuedeActualizar, PuedeEliminar, PuedeLeer, PuedeCrear,requiere_permiso
 from utils.encrypted_logger import registrar_accion, leer_logs
+from .authentication import revocar_tokens_usuario
+from .importacion import importar_usuarios
+from .privilegios import aplicar_matriz_privilegios, clonar_privilegios
 # --------------------------
 # Registro de usuario
 # --------------------------
@@ -107,53 +114,19 @@ class MyTokenObtainPairView(TokenObtainPairView):
                 "message": error_msg
             }, status=status.HTTP_401_UNAUTHORIZED)
 
-        # Si pasó la validación, autenticar usuario
-        username = request.data.get('username')
-        password = request.data.get('password')
-        user = authenticate(username=username, password=password)
-        
-        if user:
-            # Verificar si el usuario está activo
-            if not user.is_active:
-                return Response({
-                    "status": 2,
-                    "error": 1,
-                    "message": "La cuenta está desactivada"
-                }, status=status.HTTP_401_UNAUTHORIZED)
-                
-            
-            # Datos adicionales del usuario para la respuesta
-            user_data = {
-                "id": user.id,
-                "username": user.username,
-                "first_name": user.first_name,
-                "last_name": user.last_name,
-                "email": user.email,
-                "grupo_id": user.grupo.id if user.grupo else None,  
-                "grupo_nombre": user.grupo.nombre if user.grupo else None,  
-                "ci": user.ci,
-                "telefono": user.telefono,
-                "is_staff": user.is_staff,  
-                "is_active": user.is_active  
-            }
-            
-            response_data = serializer.validated_data
-            response_data['user'] = user_data
+        # El serializer ya autenticó (un solo hash) y armó token y datos del usuario
+        # a partir de una sola consulta con select_related('grupo') (usuario/backends.py)
+        user = serializer.user
+        response_data = serializer.validated_data
+
+        registrar_accion(user, "Inicio de sesión", request.META.get('REMOTE_ADDR'), diferido=True)
 
-            registrar_accion(user, "Inicio de sesión", request.META.get('REMOTE_ADDR'))
-            
-            return Response({
-                "status": 1,
-                "error": 0,
-                "message": "Se inició sesión correctamente",
-                "values": response_data
-            })
-        
         return Response({
-            "status": 2,
-            "error": 1,
-            "message": "Error de autenticación"
-        }, status=status.HTTP_401_UNAUTHORIZED)
+            "status": 1,
+            "error": 0,
+            "message": "Se inició sesión correctamente",
+            "values": response_data
+        })
 
 # --------------------------
 # Logout
@@ -172,6 +145,17 @@ class LogoutView(APIView):
                 }, status=status.HTTP_400_BAD_REQUEST)
 
             token_str = auth_header.split(" ")[1]  # "Bearer <token>"
+
+            # Cerrar sesión en todos los dispositivos: invalida todos los tokens emitidos
+            if request.data.get('todas'):
+                revocar_tokens_usuario(request.user.id)
+                registrar_accion(request.user, "Cerro sesion en todos sus dispositivos", request.META.get('REMOTE_ADDR'))
+                return Response({
+                    "status": 1,
+                    "error": 0,
+                    "message": "Se cerraron todas las sesiones correctamente",
+                })
+
             token = AccessToken(token_str)
 
             if hasattr(token, 'blacklist'):
@@ -228,7 +212,8 @@ class UserProfileView(APIView):
         })
 
     def put(self, request):
-        user = request.user
+        # La fila completa de la BD, no el usuario armado desde el token
+        user = Usuario.objects.get(pk=request.user.pk)
         serializer = UserSerializer(user, data=request.data, partial=True)
         
         if serializer.is_valid():
@@ -257,9 +242,101 @@ class UserListView(generics.ListAPIView):
     def get_queryset(self):
         # Solo staff puede ver todos los usuarios
         if self.request.user.is_staff:
-            return Usuario.objects.all()
+            return Usuario.objects.select_related('grupo')
         # Usuarios normales solo ven su perfil
-        return Usuario.objects.filter(id=self.request.user.id)
+        return Usuario.objects.select_related('grupo').filter(id=self.request.user.id)
+
+# --------------------------
+# Directorio de usuarios (panel de administración)
+# --------------------------
+CAMPOS_DIRECTORIO = [
+    'id', 'username', 'first_name', 'last_name', 'email', 'ci', 'telefono',
+    'grupo_id', 'grupo__nombre', 'is_active', 'is_staff', 'date_joined'
+]
+
+
+def filtrar_directorio(request):
+    """
+    Usuarios visibles para quien consulta, filtrados por los query params:
+    q (prefijo de username, email, CI o teléfono), grupo (id) e is_active (true/false).
+    """
+    queryset = Usuario.objects.select_related('grupo')
+    if not request.user.is_staff:
+        return queryset.filter(id=request.user.id)
+
+    q = (request.query_params.get('q') or '').strip()
+    if q:
+        # Todas son búsquedas por prefijo para poder usar los índices de usuario/models.py
+        queryset = queryset.filter(
+            Q(username__istartswith=q) | Q(email__istartswith=q) |
+            Q(ci__startswith=q) | Q(telefono__startswith=q)
+        )
+    grupo = request.query_params.get('grupo')
+    if grupo:
+        queryset = queryset.filter(grupo_id=grupo)
+    is_active = request.query_params.get('is_active')
+    if is_active in ('true', 'false'):
+        queryset = queryset.filter(is_active=(is_active == 'true'))
+    return queryset
+
+
+class DirectorioCursorPagination(CursorPagination):
+    # El cursor no usa OFFSET: cada página cuesta lo mismo aunque haya cientos de miles de usuarios
+    ordering = '-id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def get_paginated_response(self, data):
+        return Response({
+            "status": 1,
+            "error": 0,
+            "message": "Usuarios obtenidos correctamente",
+            "values": {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        })
+
+
+class DirectorioUsuariosView(generics.ListAPIView):
+    """
+    GET /usuario/users/directorio/?q=jua&grupo=2&is_active=true&page_size=50
+    Para seguir paginando usar el enlace "next" (cursor).
+    """
+    permission_classes = [PuedeLeer("Usuario")]
+    serializer_class = UsuarioDirectorioSerializer
+    pagination_class = DirectorioCursorPagination
+
+    def get_queryset(self):
+        return filtrar_directorio(self.request).only(*[c for c in CAMPOS_DIRECTORIO if c != 'grupo_id'])
+
+
+class _Eco:
+    """Buffer mínimo para que csv.writer devuelva cada fila en lugar de guardarla."""
+    def write(self, valor):
+        return valor
+
+
+@api_view(['GET'])
+@requiere_permiso("Usuario", "leer")
+def exportar_usuarios_csv(request):
+    """
+    GET /usuario/users/directorio/exportar/?q=...&grupo=...
+    Descarga el directorio filtrado en CSV, generado por partes (no se arma en memoria).
+    """
+    filas = filtrar_directorio(request).order_by('id').values_list(*CAMPOS_DIRECTORIO).iterator(chunk_size=2000)
+    escritor = csv.writer(_Eco())
+
+    def generar():
+        yield escritor.writerow(CAMPOS_DIRECTORIO)
+        for fila in filas:
+            yield escritor.writerow(fila)
+
+    respuesta = StreamingHttpResponse(generar(), content_type='text/csv; charset=utf-8')
+    respuesta['Content-Disposition'] = 'attachment; filename="usuarios.csv"'
+    return respuesta
 # --------------------------
 # Actualizar usuario específico
 # --------------------------
@@ -271,7 +348,8 @@ class UserUpdateView(generics.UpdateAPIView):
         return Usuario.objects.filter(id=self.request.user.id)
 
     def get_object(self):
-        return self.request.user
+        # La fila completa de la BD, no el usuario armado desde el token
+        return Usuario.objects.get(pk=self.request.user.pk)
 
     def update(self, request, *args, **kwargs):
         try:
@@ -583,31 +661,85 @@ def asignar_privilegios_grupo(request):
             "values": None
         })
 
-    resultados = []
-    for priv in privilegios:
-        try:
-            componente_id = priv.get('componente_id')
-            componente = get_object_or_404(models.Componente, id=componente_id)
-
-            obj, created = models.Privilegio.objects.update_or_create(
-                grupo=grupo,
-                componente=componente,
-                defaults={
-                    "puede_leer": priv.get("puede_leer", False),
-                    "puede_crear": priv.get("puede_crear", False),
-                    "puede_actualizar": priv.get("puede_actualizar", False),
-                    "puede_eliminar": priv.get("puede_eliminar", False),
-                }
-            )
-            resultados.append(PrivilegioSerializer(obj).data)
-        except:
-            continue  # ignorar componentes inválidos
+    if not isinstance(privilegios, list):
+        return Response({
+            "status": 0,
+            "error": 1,
+            "message": "PRIVILEGIOS debe ser una lista",
+            "values": None
+        })
+
+    # Diferencia contra la matriz actual y un solo upsert (usuario/privilegios.py)
+    resumen = aplicar_matriz_privilegios(grupo, privilegios, reemplazar=bool(request.data.get('reemplazar', False)))
+    registrar_accion(request.user, "ASIGNAR PRIVILEGIOS A GRUPO", request.META.get('REMOTE_ADDR'))
 
     return Response({
         "status": 1,
         "error": 0,
         "message": f"Privilegios asignados al grupo '{grupo.nombre}'",
-        "values": {"privilegios": resultados}
+        "values": {
+            "privilegios": PrivilegioSerializer(resumen.pop("privilegios"), many=True).data,
+            "resumen": resumen,
+        }
+    })
+
+# --------------------------
+# CLONAR PRIVILEGIOS DE UN GRUPO A OTRO
+# --------------------------
+@swagger_auto_schema(
+    method="post",
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        required=['grupo_origen_id', 'grupo_destino_id'],
+        properties={
+            'grupo_origen_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+            'grupo_destino_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+        }
+    ),
+    responses={200: PrivilegioSerializer(many=True)}
+)
+@api_view(['POST'])
+@requiere_permiso("Privilegio","actualizar")
+def clonar_privilegios_grupo(request):
+    origen_id = request.data.get('grupo_origen_id')
+    destino_id = request.data.get('grupo_destino_id')
+
+    if not origen_id or not destino_id:
+        return Response({
+            "status": 0,
+            "error": 1,
+            "message": "GRUPO_ORIGEN_ID y GRUPO_DESTINO_ID son requeridos",
+            "values": None
+        })
+    if str(origen_id) == str(destino_id):
+        return Response({
+            "status": 0,
+            "error": 1,
+            "message": "EL GRUPO ORIGEN Y DESTINO DEBEN SER DISTINTOS",
+            "values": None
+        })
+
+    origen = Grupo.objects.filter(id=origen_id).first()
+    destino = Grupo.objects.filter(id=destino_id).first()
+    if not origen or not destino:
+        return Response({
+            "status": 0,
+            "error": 1,
+            "message": "GRUPO NO ENCONTRADO",
+            "values": None
+        })
+
+    resumen = clonar_privilegios(origen, destino)
+    registrar_accion(request.user, f"CLONAR PRIVILEGIOS {origen.nombre} -> {destino.nombre}", request.META.get('REMOTE_ADDR'))
+
+    return Response({
+        "status": 1,
+        "error": 0,
+        "message": f"Privilegios de '{origen.nombre}' copiados al grupo '{destino.nombre}'",
+        "values": {
+            "privilegios": PrivilegioSerializer(resumen.pop("privilegios"), many=True).data,
+            "resumen": resumen,
+        }
     })
 
 # --------------------------
@@ -832,7 +964,6 @@ def registrar_token(request):
     })
 
 @api_view(['POST'])
-@transaction.atomic
 def bulk_register(request):
     try:
         data = request.data.get("usuarios", None)
@@ -845,44 +976,18 @@ def bulk_register(request):
                 "values": {}
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        usuarios_creados = []
-        errores = []
-
-        for i, user_data in enumerate(data, start=1):
-            # Asegurar grupo por defecto
-            if "grupo" not in user_data:
-                user_data["grupo"] = 2
-
-            serializer = UserSerializer(data=user_data)
-
-            if serializer.is_valid():
-                user = serializer.save()
-
-                usuarios_creados.append({
-                    "id": user.id,
-                    "username": user.username,
-                    "first_name": user.first_name,
-                    "last_name": user.last_name,
-                    "email": user.email,
-                    "ci": user.ci,
-                    "telefono": user.telefono,
-                    "grupo_id": user.grupo.id if user.grupo else None,
-                    "grupo_nombre": user.grupo.nombre if user.grupo else None,
-                })
-            else:
-                errores.append({
-                    "index": i,
-                    "username": user_data.get("username", "desconocido"),
-                    "errores": serializer.errors
-                })
+        # Validación, unicidad y hash por lote; inserción con bulk_create (usuario/importacion.py)
+        resultado = importar_usuarios(data)
+        errores = resultado["errores"]
 
         return Response({
             "status": 1 if not errores else 2,
             "error": 0 if not errores else 1,
             "message": "Usuarios registrados correctamente" if not errores else "Algunos usuarios no pudieron registrarse",
             "values": {
-                "usuarios_creados": usuarios_creados,
-                "errores": errores
+                "usuarios_creados": resultado["usuarios_creados"],
+                "errores": errores,
+                "duracion_segundos": resultado["duracion_segundos"],
             }
         }, status=status.HTTP_201_CREATED if not errores else status.HTTP_207_MULTI_STATUS)
 
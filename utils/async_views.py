@@ -0,0 +1,57 @@
+# utils/async_views.py
+"""
+Utilidades para vistas async (modo ASGI).
+
+DRF no soporta vistas async, así que los endpoints dominados por I/O externo
+(Stripe, Gemini) se exponen como vistas async de Django. Aquí se resuelve la
+autenticación JWT con las mismas clases configuradas en REST_FRAMEWORK y se
+arma la respuesta con el formato habitual {status, error, message, values}.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+def respuesta_json(status, message, values=None, http_status=200):
+    return JsonResponse({
+        "status": status,
+        "error": 0 if status else 1,
+        "message": message,
+        "values": values if values is not None else {}
+    }, status=http_status)
+
+
+def autenticar_request(request):
+    drf_request = Request(request)
+    for clase in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        resultado = clase().authenticate(drf_request)
+        if resultado is not None:
+            return resultado[0]
+    return None
+
+
+def requiere_jwt_async(vista):
+    """Autentica el request (el acceso a BD va en sync_to_async) y deja el usuario en request.user"""
+    @wraps(vista)
+    async def envoltura(request, *args, **kwargs):
+        try:
+            usuario = await sync_to_async(autenticar_request)(request)
+        except AuthenticationFailed as e:
+            return respuesta_json(0, str(e.detail), http_status=401)
+        if usuario is None:
+            return respuesta_json(0, "Autenticación requerida", http_status=401)
+        request.user = usuario
+        return await vista(request, *args, **kwargs)
+    return envoltura
+
+
+def respuesta_drf_a_json(respuesta):
+    """Convierte un Response de DRF (que una vista async de Django no renderiza) en JsonResponse"""
+    if isinstance(respuesta, Response):
+        return JsonResponse(respuesta.data, status=respuesta.status_code, safe=False)
+    return respuesta
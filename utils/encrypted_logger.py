@@ -1,8 +1,13 @@
+import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from cryptography.fernet import Fernet
 from dotenv import load_dotenv
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 # Cargar variables desde .env
 load_dotenv()
 
@@ -14,16 +19,39 @@ def get_fernet():
         raise ValueError("❌ No se encontró la variable LOG_DEV_KEY en el entorno.")
     return Fernet(key.encode())
 
-def registrar_accion(usuario, accion, ip):
-    fernet = get_fernet()
-    ahora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+# Un solo hilo escritor: las líneas diferidas se escriben en orden y sin pisarse
+_escritor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bitacora")
+_lock_archivo = threading.Lock()
+
+
+def _escribir_linea(log_line):
+    encrypted_log = get_fernet().encrypt(log_line.encode())
+    with _lock_archivo:
+        os.makedirs(os.path.dirname(LOG_FILE_PATH), exist_ok=True)
+        with open(LOG_FILE_PATH, "ab") as f:
+            f.write(encrypted_log + b"\n")
 
-    log_line = f"[{ahora}] Usuario ID: {usuario.id} | Nombre de Usuario: {usuario.username} | Grupo del usuario: {usuario.grupo.nombre}  | IP: {ip} | Acción: {accion}\n"
-    encrypted_log = fernet.encrypt(log_line.encode())
 
-    os.makedirs(os.path.dirname(LOG_FILE_PATH), exist_ok=True)
-    with open(LOG_FILE_PATH, "ab") as f:
-        f.write(encrypted_log + b"\n")
+def _escribir_linea_segura(log_line):
+    try:
+        _escribir_linea(log_line)
+    except Exception as e:
+        logger.error("No se pudo escribir en la bitácora: %s", e)
+
+
+def registrar_accion(usuario, accion, ip, diferido=False):
+    """
+    Escribe una línea cifrada en la bitácora. Con diferido=True la línea se arma ahora
+    (sin tocar la BD después) y el cifrado/escritura se hace en segundo plano.
+    """
+    ahora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    grupo = usuario.grupo.nombre if usuario.grupo else None
+
+    log_line = f"[{ahora}] Usuario ID: {usuario.id} | Nombre de Usuario: {usuario.username} | Grupo del usuario: {grupo}  | IP: {ip} | Acción: {accion}\n"
+    if diferido:
+        _escritor.submit(_escribir_linea_segura, log_line)
+    else:
+        _escribir_linea(log_line)
 
 def leer_logs(llave_ingresada):
     print(llave_ingresada)
@@ -0,0 +1,248 @@
+# utils/llm_client.py
+"""
+Cliente compartido para las llamadas a Gemini.
+
+Todas las llamadas `generate_content` del proyecto pasan por aquí para tener:
+  - un plazo máximo por llamada (el worker no queda bloqueado por un LLM lento),
+  - un semáforo que limita cuántas llamadas concurrentes salen del proceso,
+  - un circuit breaker que, ante una racha de errores, rechaza de inmediato
+    para que el llamador use su fallback (`_naive_interpret`, etc.),
+  - histogramas de latencia por cliente (ver `obtener_metricas`).
+
+Si el cliente no puede responder lanza `LLMNoDisponible`; cada llamador
+decide su respuesta alternativa.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+from django.conf import settings
+
+import google.generativeai as genai
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL_NAME = getattr(settings, 'GEMINI_MODEL_NAME', 'gemini-2.5-flash')
+
+# Límites superiores (en ms) de los buckets del histograma de latencia
+BUCKETS_LATENCIA_MS = (100, 250, 500, 1000, 2000, 4000, 8000, 15000)
+
+
+class LLMNoDisponible(Exception):
+    """El LLM no respondió a tiempo, está saturado o el circuito está abierto."""
+
+
+# --------------------------
+# Circuit breaker
+# --------------------------
+class CircuitBreaker:
+    CERRADO = "cerrado"
+    ABIERTO = "abierto"
+    SEMI_ABIERTO = "semi_abierto"
+
+    def __init__(self, umbral_error=0.5, minimo_llamadas=10, ventana_segundos=60, enfriamiento_segundos=30):
+        self.umbral_error = umbral_error
+        self.minimo_llamadas = minimo_llamadas
+        self.ventana_segundos = ventana_segundos
+        self.enfriamiento_segundos = enfriamiento_segundos
+        self.estado = self.CERRADO
+        self._resultados = deque()  # (timestamp, exito)
+        self._abierto_hasta = 0.0
+        self._sonda_en_curso = False
+        self._lock = threading.Lock()
+
+    def _purgar(self, ahora):
+        limite = ahora - self.ventana_segundos
+        while self._resultados and self._resultados[0][0] < limite:
+            self._resultados.popleft()
+
+    def permitir(self):
+        """Indica si se puede intentar una llamada en este momento."""
+        with self._lock:
+            if self.estado == self.CERRADO:
+                return True
+            if self.estado == self.ABIERTO and time.monotonic() >= self._abierto_hasta:
+                self.estado = self.SEMI_ABIERTO
+                self._sonda_en_curso = False
+            if self.estado == self.SEMI_ABIERTO and not self._sonda_en_curso:
+                # Solo una llamada de prueba mientras el circuito está semiabierto
+                self._sonda_en_curso = True
+                return True
+            return False
+
+    def liberar_sonda(self):
+        """La llamada autorizada no llegó a salir (p. ej. sin cupo en el semáforo)."""
+        with self._lock:
+            self._sonda_en_curso = False
+
+    def registrar(self, exito):
+        with self._lock:
+            ahora = time.monotonic()
+            if self.estado == self.SEMI_ABIERTO:
+                self._sonda_en_curso = False
+                if exito:
+                    self.estado = self.CERRADO
+                    self._resultados.clear()
+                else:
+                    self._abrir(ahora)
+                return
+
+            self._resultados.append((ahora, exito))
+            self._purgar(ahora)
+            total = len(self._resultados)
+            if total >= self.minimo_llamadas:
+                errores = sum(1 for _, ok in self._resultados if not ok)
+                if errores / total >= self.umbral_error:
+                    self._abrir(ahora)
+
+    def _abrir(self, ahora):
+        self.estado = self.ABIERTO
+        self._abierto_hasta = ahora + self.enfriamiento_segundos
+        self._resultados.clear()
+        logger.warning("Circuito LLM abierto durante %ss", self.enfriamiento_segundos)
+
+
+# --------------------------
+# Histograma de latencias
+# --------------------------
+class HistogramaLatencia:
+    def __init__(self, buckets=BUCKETS_LATENCIA_MS):
+        self.buckets = tuple(buckets)
+        self._conteos = [0] * (len(self.buckets) + 1)  # el último es "+inf"
+        self._total = 0
+        self._suma_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observar(self, ms):
+        with self._lock:
+            indice = len(self.buckets)
+            for i, limite in enumerate(self.buckets):
+                if ms <= limite:
+                    indice = i
+                    break
+            self._conteos[indice] += 1
+            self._total += 1
+            self._suma_ms += ms
+
+    def resumen(self):
+        with self._lock:
+            etiquetas = [f"<={b}ms" for b in self.buckets] + ["+inf"]
+            return {
+                "total": self._total,
+                "promedio_ms": round(self._suma_ms / self._total, 1) if self._total else 0,
+                "buckets": dict(zip(etiquetas, self._conteos)),
+            }
+
+
+# --------------------------
+# Cliente
+# --------------------------
+def _llamar_gemini(contenido, modelo, generation_config, timeout):
+    model = genai.GenerativeModel(modelo)
+    response = model.generate_content(
+        contenido,
+        generation_config=generation_config,
+        request_options={"timeout": timeout},
+    )
+    return (response.text or "").strip()
+
+
+class ClienteLLM:
+    def __init__(self, nombre, max_concurrencia=4, timeout_segundos=15, espera_cola_segundos=2,
+                 breaker=None, llamada=None):
+        self.nombre = nombre
+        # llamada(contenido, modelo, generation_config, timeout) -> texto; por defecto Gemini
+        self._llamada = llamada or _llamar_gemini
+        self.timeout_segundos = timeout_segundos
+        self.espera_cola_segundos = espera_cola_segundos
+        self.breaker = breaker or CircuitBreaker()
+        self._semaforo = threading.BoundedSemaphore(max_concurrencia)
+        # Un hilo por slot del semáforo: nunca hay más llamadas vivas que slots
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrencia, thread_name_prefix=f"llm-{nombre}")
+        self.latencias = HistogramaLatencia()
+        self._contadores = {"ok": 0, "error": 0, "timeout": 0, "rechazadas": 0}
+        self._lock = threading.Lock()
+
+    def _contar(self, clave):
+        with self._lock:
+            self._contadores[clave] += 1
+
+    def generar(self, contenido, modelo=None, generation_config=None, timeout=None):
+        """
+        Ejecuta `generate_content` con plazo y devuelve el texto de la respuesta.
+        Lanza LLMNoDisponible si el circuito está abierto, no hay cupo o se agota el plazo.
+        """
+        timeout = timeout or self.timeout_segundos
+
+        if not self.breaker.permitir():
+            self._contar("rechazadas")
+            raise LLMNoDisponible(f"Circuito {self.nombre} abierto")
+
+        if not self._semaforo.acquire(timeout=self.espera_cola_segundos):
+            self.breaker.liberar_sonda()
+            self._contar("rechazadas")
+            raise LLMNoDisponible(f"Demasiadas llamadas concurrentes a {self.nombre}")
+
+        inicio = time.monotonic()
+        try:
+            futuro = self._executor.submit(
+                self._llamada, contenido, modelo or GEMINI_MODEL_NAME, generation_config, timeout
+            )
+        except Exception:
+            self._semaforo.release()
+            self.breaker.liberar_sonda()
+            raise
+        # El cupo se libera cuando la llamada termina de verdad, no cuando vence el plazo
+        futuro.add_done_callback(lambda _: self._semaforo.release())
+
+        try:
+            texto = futuro.result(timeout=timeout)
+        except FuturesTimeout:
+            self._registrar(inicio, "timeout", exito=False)
+            raise LLMNoDisponible(f"{self.nombre} no respondió en {timeout}s")
+        except Exception:
+            self._registrar(inicio, "error", exito=False)
+            raise
+
+        self._registrar(inicio, "ok", exito=True)
+        return texto
+
+    async def generar_async(self, contenido, modelo=None, generation_config=None, timeout=None):
+        """Versión para vistas async: la llamada bloqueante corre en un hilo aparte."""
+        return await asyncio.to_thread(self.generar, contenido, modelo, generation_config, timeout)
+
+    def _registrar(self, inicio, resultado, exito):
+        self.latencias.observar((time.monotonic() - inicio) * 1000)
+        self._contar(resultado)
+        self.breaker.registrar(exito)
+
+    def metricas(self):
+        with self._lock:
+            contadores = dict(self._contadores)
+        return {
+            "cliente": self.nombre,
+            "circuito": self.breaker.estado,
+            "llamadas": contadores,
+            "latencia": self.latencias.resumen(),
+        }
+
+
+cliente_gemini = ClienteLLM(
+    "gemini",
+    max_concurrencia=getattr(settings, 'LLM_MAX_CONCURRENCIA', 4),
+    timeout_segundos=getattr(settings, 'LLM_TIMEOUT_SEGUNDOS', 15),
+    espera_cola_segundos=getattr(settings, 'LLM_ESPERA_COLA_SEGUNDOS', 2),
+    breaker=CircuitBreaker(
+        umbral_error=getattr(settings, 'LLM_CIRCUITO_UMBRAL_ERROR', 0.5),
+        minimo_llamadas=getattr(settings, 'LLM_CIRCUITO_MINIMO_LLAMADAS', 10),
+        ventana_segundos=getattr(settings, 'LLM_CIRCUITO_VENTANA_SEGUNDOS', 60),
+        enfriamiento_segundos=getattr(settings, 'LLM_CIRCUITO_ENFRIAMIENTO_SEGUNDOS', 30),
+    ),
+)
+
+
+def obtener_metricas():
+    return cliente_gemini.metricas()
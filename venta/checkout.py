@@ -0,0 +1,183 @@
+# venta/checkout.py
+"""
+Conversión de un carrito en pedido.
+
+Lo usan `generar_pedido` (el cliente confirma desde el frontend) y el worker de
+eventos de Stripe (venta/eventos_stripe.py). El carrito se bloquea mientras se
+crea el pedido y un carrito solo puede convertirse una vez, así que las dos vías
+pueden llegar en cualquier orden sin duplicar pedidos.
+"""
+import datetime
+
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+
+from utils.encrypted_logger import registrar_accion
+from .models import CarritoModel, PedidoModel, DetallePedidoModel, PlanPagoModel
+from producto.models import ProductoModel
+from .reservas import bloquear_productos, stock_disponible, convertir_reservas
+from .venta_flash import ventas_activas, tomar_unidades, devolver_unidades, registrar_vendidas, UnidadesAgotadas
+from .cuotas import calcular_plan, planes_pago
+
+FORMAS_PAGO_TARJETA = ["tarjeta de débito", "tarjeta de crédito", "tarjeta"]
+
+
+class ErrorCheckout(Exception):
+    """El carrito no se puede convertir en pedido (stock, precios, ...); se responde con 400."""
+
+
+class CarritoYaConvertido(ErrorCheckout):
+    def __init__(self, pedido):
+        super().__init__(f"El carrito ya generó el pedido {pedido.id}")
+        self.pedido = pedido
+
+
+def _verificar_carrito(carrito, forma_pago, productos, disponible):
+    """Verifica stock y precios y devuelve (productos verificados, total).
+    `productos` viene bloqueado y `disponible` ya descuenta las reservas de otros carritos."""
+    total_pedido = 0
+    productos_verificados = []
+    for detalle in carrito.carrito_detalles.all():
+        producto = productos[detalle.producto_id]
+
+        # Verificar stock
+        if detalle.cantidad > disponible[producto.id]:
+            raise ErrorCheckout(
+                f"Stock insuficiente para '{producto.nombre}'. Disponible: {disponible[producto.id]}, solicitado: {detalle.cantidad}"
+            )
+
+        # Verificar que el producto esté activo
+        if not producto.is_active:
+            raise ErrorCheckout(f"El producto '{producto.nombre}' no está disponible")
+
+        # Determinar precio según forma de pago
+        if forma_pago.nombre.lower() == "credito":
+            precio_unitario = producto.precio_cuota
+            if not precio_unitario or precio_unitario <= 0:
+                raise ErrorCheckout(f"El producto '{producto.nombre}' no tiene precio a crédito configurado")
+        else:
+            precio_unitario = producto.precio_contado
+            if not precio_unitario or precio_unitario <= 0:
+                raise ErrorCheckout(f"El producto '{producto.nombre}' no tiene precio contado configurado")
+
+        subtotal = precio_unitario * detalle.cantidad
+        total_pedido += subtotal
+
+        productos_verificados.append({
+            'producto': producto,
+            'detalle': detalle,
+            'precio_unitario': precio_unitario,
+            'subtotal': subtotal
+        })
+    return productos_verificados, total_pedido
+
+
+def crear_pedido_desde_carrito(usuario, carrito, forma_pago, meses_credito=None, ip=None, stripe_session_id=None):
+    """
+    Crea el pedido, sus detalles y su plan de pagos, convierte las reservas del carrito en
+    descuento de stock y desactiva el carrito. Devuelve (pedido, mensaje).
+    Lanza CarritoYaConvertido si el carrito ya tiene pedido y ErrorCheckout si no se puede convertir.
+    """
+    tomadas = {}
+    try:
+        with transaction.atomic():
+            # Bloquear el carrito: el webhook de Stripe y el cliente pueden llegar a la vez
+            carrito = CarritoModel.objects.select_for_update().get(pk=carrito.pk)
+            existente = PedidoModel.objects.filter(carrito=carrito).first()
+            if existente:
+                raise CarritoYaConvertido(existente)
+
+            fecha_actual = datetime.datetime.now()
+            # Bloquear los productos: lo reservado por este carrito se descuenta del stock ahora
+            cantidades = {}
+            for producto_id, cantidad in carrito.carrito_detalles.values_list('producto_id', 'cantidad'):
+                cantidades[producto_id] = cantidades.get(producto_id, 0) + cantidad
+            # Productos en venta flash: las unidades salen del contador de la caché, sin bloquear la fila
+            activas = ventas_activas()
+            cantidades_flash = {pid: c for pid, c in cantidades.items() if pid in activas}
+            if cantidades_flash:
+                cantidades = {pid: c for pid, c in cantidades.items() if pid not in activas}
+                try:
+                    tomadas.update(tomar_unidades(cantidades_flash, activas))
+                except UnidadesAgotadas as e:
+                    raise ErrorCheckout(str(e))
+                transaction.on_commit(lambda: registrar_vendidas(tomadas))
+
+            productos = bloquear_productos(list(cantidades))
+            disponible = stock_disponible(productos.values(), carrito.id)
+            if cantidades_flash:
+                productos.update({p.id: p for p in ProductoModel.objects.filter(id__in=cantidades_flash)})
+                disponible.update(cantidades_flash)
+            productos_verificados, total_pedido = _verificar_carrito(carrito, forma_pago, productos, disponible)
+
+            # Determinar estado del pedido según forma de pago
+            if forma_pago.nombre.lower() in FORMAS_PAGO_TARJETA:
+                estado_pedido = 'confirmado'  # Pagos con tarjeta se confirman inmediatamente
+            else:
+                estado_pedido = 'pendiente'   # Crédito requiere aprobación; otros métodos pendientes de pago
+
+            # Crear el pedido
+            pedido = PedidoModel.objects.create(
+                usuario=usuario,
+                carrito=carrito,
+                forma_pago=forma_pago,
+                total=total_pedido,
+                estado=estado_pedido,
+                stripe_session_id=stripe_session_id,
+            )
+
+            # Crear detalles del pedido
+            DetallePedidoModel.objects.bulk_create([
+                DetallePedidoModel(
+                    pedido=pedido,
+                    producto=item['producto'],
+                    cantidad=item['detalle'].cantidad,
+                    precio_unitario=item['precio_unitario'],
+                    subtotal=item['subtotal']
+                )
+                for item in productos_verificados
+            ])
+
+            # Las reservas del carrito pasan a descuento de stock (cualquier forma de pago:
+            # un pedido pendiente o a crédito también compromete las unidades)
+            convertir_reservas(carrito, cantidades, productos, f"pedido:{pedido.id}", usuario)
+
+            # Crear plan de pagos según forma de pago (un solo INSERT)
+            if forma_pago.nombre.lower() == "credito":
+                cuotas = calcular_plan(total_pedido, meses_credito, fecha_actual.date())
+                PlanPagoModel.objects.bulk_create(planes_pago(pedido, cuotas))
+                registrar_accion(usuario, "Pedido a crédito creado", ip)
+                mensaje = f"Pedido a crédito creado exitosamente. {meses_credito} cuotas de {cuotas[0]['monto']:.2f} Bs"
+
+            elif forma_pago.nombre.lower() in FORMAS_PAGO_TARJETA:
+                # Para tarjetas, crear un solo pago inmediato
+                PlanPagoModel.objects.create(
+                    pedido=pedido,
+                    numero_cuota=1,
+                    monto=total_pedido,
+                    fecha_vencimiento=fecha_actual + relativedelta(days=1),
+                    estado='pagado'  # Asumimos pago inmediato con tarjeta
+                )
+                registrar_accion(usuario, "Pedido con tarjeta procesado", ip)
+                mensaje = "Pedido con tarjeta procesado exitosamente"
+
+            else:
+                # Para otros métodos, crear pago pendiente
+                PlanPagoModel.objects.create(
+                    pedido=pedido,
+                    numero_cuota=1,
+                    monto=total_pedido,
+                    fecha_vencimiento=fecha_actual + relativedelta(days=3),  # 3 días para pagar
+                    estado='pendiente'
+                )
+                mensaje = "Pedido creado exitosamente. Complete el pago en 3 días"
+
+            # Desactivar carrito
+            carrito.is_active = False
+            carrito.save()
+    except Exception:
+        # El pedido no se creó: las unidades de venta flash vuelven al contador
+        devolver_unidades(tomadas)
+        raise
+
+    return pedido, mensaje
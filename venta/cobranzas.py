@@ -0,0 +1,153 @@
+# venta/cobranzas.py
+"""
+Cuotas vencidas, recordatorios de pago y antigüedad de la cartera (PlanPagoModel).
+
+Todas las consultas parten de estado + fecha_vencimiento, que es el índice
+plan_pago_estado_venc_idx:
+
+- `marcar_vencidas` pasa a 'vencido' las cuotas pendientes con vencimiento anterior a
+  hoy, por lotes: cada lote toma ids con SELECT ... FOR UPDATE SKIP LOCKED y los
+  actualiza con un solo UPDATE.
+- `enviar_recordatorios` agrupa por cliente las cuotas impagas que vencen en los
+  próximos días (o ya vencieron) y envía una notificación por cliente, por tandas de
+  clientes. fecha_recordatorio evita recordar la misma cuota dos veces el mismo día.
+- `antiguedad_cartera` resume lo impago por tramos de atraso en una sola consulta.
+
+Lo corre el comando procesar_cuotas_vencidas (cron diario o --continuo).
+"""
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Min, Q, Sum
+from django.utils import timezone
+
+from comercio.utils import NotificacionService
+from .models import PlanPagoModel
+
+logger = logging.getLogger(__name__)
+
+# El default del modelo es "Pendiente": se aceptan las dos formas
+ESTADOS_PENDIENTES = ['pendiente', 'Pendiente']
+ESTADOS_IMPAGOS = ESTADOS_PENDIENTES + ['vencido']
+
+# (clave, desde días de atraso, hasta días de atraso); None = sin límite
+TRAMOS_ATRASO = [
+    ("1_30", 1, 30),
+    ("31_60", 31, 60),
+    ("61_90", 61, 90),
+    ("mas_90", 91, None),
+]
+
+
+def _impagas():
+    return PlanPagoModel.objects.filter(estado__in=ESTADOS_IMPAGOS, is_active=True)
+
+
+def marcar_vencidas(hoy=None, tamano_lote=5000):
+    """Marca 'vencido' las cuotas pendientes con vencimiento anterior a `hoy`. Devuelve cuántas."""
+    hoy = hoy or timezone.localdate()
+    total = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                PlanPagoModel.objects.select_for_update(skip_locked=True)
+                .filter(estado__in=ESTADOS_PENDIENTES, fecha_vencimiento__lt=hoy, is_active=True)
+                .values_list('id', flat=True)[:tamano_lote]
+            )
+            if not ids:
+                return total
+            PlanPagoModel.objects.filter(id__in=ids).update(estado='vencido')
+        total += len(ids)
+
+
+def _mensaje_recordatorio(resumen):
+    monto = f"{resumen['monto']:.2f} Bs"
+    if resumen['vencidas']:
+        return ("Tienes cuotas vencidas",
+                f"{resumen['vencidas']} de {resumen['cuotas']} cuotas ya vencieron. Total a pagar: {monto}")
+    return ("Recordatorio de pago",
+            f"Tu próxima cuota vence el {resumen['proximo_vencimiento']:%d/%m/%Y}. Total a pagar: {monto}")
+
+
+def enviar_recordatorios(hoy=None, dias_aviso=3, tamano_lote=500):
+    """
+    Una notificación por cliente con sus cuotas impagas que vencen hasta `hoy + dias_aviso`.
+    Recorre los clientes por id en tandas de `tamano_lote`. Devuelve cuántos clientes se avisaron.
+    """
+    hoy = hoy or timezone.localdate()
+    candidatas = _impagas().filter(fecha_vencimiento__lte=hoy + timedelta(days=dias_aviso)).filter(
+        Q(fecha_recordatorio__isnull=True) | Q(fecha_recordatorio__lt=hoy)
+    )
+    avisados = 0
+    ultimo_usuario = 0
+    while True:
+        resumenes = list(
+            candidatas.filter(pedido__usuario_id__gt=ultimo_usuario)
+            .values('pedido__usuario_id')
+            .annotate(
+                cuotas=Count('id'),
+                vencidas=Count('id', filter=Q(fecha_vencimiento__lt=hoy)),
+                monto=Sum('monto'),
+                proximo_vencimiento=Min('fecha_vencimiento'),
+            )
+            .order_by('pedido__usuario_id')[:tamano_lote]
+        )
+        if not resumenes:
+            return avisados
+        for resumen in resumenes:
+            titulo, mensaje = _mensaje_recordatorio(resumen)
+            try:
+                if NotificacionService.enviar_a_usuario(resumen['pedido__usuario_id'], titulo, mensaje, {
+                    "tipo": "recordatorio_cuotas",
+                    "cuotas": str(resumen['cuotas']),
+                }):
+                    avisados += 1
+            except Exception as e:
+                logger.error("Error enviando recordatorio al usuario %s: %s", resumen['pedido__usuario_id'], e)
+        usuario_ids = [r['pedido__usuario_id'] for r in resumenes]
+        candidatas.filter(pedido__usuario_id__in=usuario_ids).update(fecha_recordatorio=hoy)
+        ultimo_usuario = usuario_ids[-1]
+
+
+def antiguedad_cartera(hoy=None, limite_clientes=10):
+    """Saldo impago por tramo de atraso (una consulta) y los clientes con más deuda vencida."""
+    hoy = hoy or timezone.localdate()
+    filtros = {"por_vencer": Q(fecha_vencimiento__gte=hoy)}
+    for clave, desde, hasta in TRAMOS_ATRASO:
+        filtro = Q(fecha_vencimiento__lte=hoy - timedelta(days=desde))
+        if hasta is not None:
+            filtro &= Q(fecha_vencimiento__gte=hoy - timedelta(days=hasta))
+        filtros[clave] = filtro
+
+    agregados = {}
+    for clave, filtro in filtros.items():
+        agregados[f"{clave}__monto"] = Sum('monto', filter=filtro)
+        agregados[f"{clave}__cuotas"] = Count('id', filter=filtro)
+    fila = _impagas().aggregate(**agregados)
+
+    tramos = {
+        clave: {"monto": float(fila[f"{clave}__monto"] or 0), "cuotas": fila[f"{clave}__cuotas"]}
+        for clave in filtros
+    }
+    clientes = list(
+        _impagas().filter(fecha_vencimiento__lt=hoy)
+        .values('pedido__usuario_id', 'pedido__usuario__username')
+        .annotate(monto_vencido=Sum('monto'), cuotas_vencidas=Count('id'), vencimiento_mas_antiguo=Min('fecha_vencimiento'))
+        .order_by('-monto_vencido')[:limite_clientes]
+    )
+    return {
+        "fecha": hoy,
+        "total_impago": round(sum(t["monto"] for t in tramos.values()), 2),
+        "tramos": tramos,
+        "clientes_mayor_deuda": [
+            {
+                "usuario_id": c['pedido__usuario_id'],
+                "username": c['pedido__usuario__username'],
+                "monto_vencido": float(c['monto_vencido']),
+                "cuotas_vencidas": c['cuotas_vencidas'],
+                "dias_atraso": (hoy - c['vencimiento_mas_antiguo']).days,
+            }
+            for c in clientes
+        ],
+    }
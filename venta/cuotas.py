@@ -0,0 +1,77 @@
+# venta/cuotas.py
+"""
+Planes de cuotas para pedidos a crédito.
+
+Los montos se calculan en Decimal a 2 decimales: cada cuota es total / meses truncado
+al centavo y la última se lleva el resto, así la suma de las cuotas es exactamente el
+total del pedido (con float o con un solo redondeo se perdían o sobraban centavos).
+
+`simular` arma los planes de todos los plazos a la vez: las fechas de vencimiento se
+calculan una sola vez para el plazo más largo y cada plazo toma su tramo. `planes_pago`
+devuelve las filas de PlanPagoModel listas para un solo bulk_create.
+"""
+import datetime
+from decimal import Decimal, ROUND_DOWN
+
+from dateutil.relativedelta import relativedelta
+
+from .models import PlanPagoModel
+
+MESES_CREDITO_VALIDOS = [6, 12, 18, 24]
+CENTAVO = Decimal("0.01")
+
+
+def _a_decimal(monto):
+    return monto if isinstance(monto, Decimal) else Decimal(str(monto))
+
+
+def fechas_vencimiento(meses, desde=None):
+    """Vencimientos mensuales a partir del mes siguiente a `desde` (hoy si no se indica)."""
+    desde = desde or datetime.date.today()
+    return [desde + relativedelta(months=i + 1) for i in range(meses)]
+
+
+def montos_cuotas(total, meses):
+    """Montos de las `meses` cuotas; la última absorbe el resto del redondeo."""
+    total = _a_decimal(total).quantize(CENTAVO)
+    cuota = (total / meses).quantize(CENTAVO, rounding=ROUND_DOWN)
+    return [cuota] * (meses - 1) + [total - cuota * (meses - 1)]
+
+
+def calcular_plan(total, meses, desde=None, fechas=None):
+    """[{"numero_cuota", "monto", "fecha_vencimiento"}] de un plazo."""
+    fechas = fechas or fechas_vencimiento(meses, desde)
+    return [
+        {"numero_cuota": i + 1, "monto": monto, "fecha_vencimiento": fechas[i]}
+        for i, monto in enumerate(montos_cuotas(total, meses))
+    ]
+
+
+def simular(total, plazos=None, desde=None):
+    """{meses: {"cuota", "ultima_cuota", "total", "cuotas"}} para cada plazo permitido."""
+    plazos = sorted(plazos or MESES_CREDITO_VALIDOS)
+    fechas = fechas_vencimiento(plazos[-1], desde)
+    resultado = {}
+    for meses in plazos:
+        cuotas = calcular_plan(total, meses, fechas=fechas[:meses])
+        resultado[meses] = {
+            "cuota": cuotas[0]["monto"],
+            "ultima_cuota": cuotas[-1]["monto"],
+            "total": sum(c["monto"] for c in cuotas),
+            "cuotas": cuotas,
+        }
+    return resultado
+
+
+def planes_pago(pedido, cuotas, estado='pendiente'):
+    """Instancias de PlanPagoModel (sin guardar) para PlanPagoModel.objects.bulk_create."""
+    return [
+        PlanPagoModel(
+            pedido=pedido,
+            numero_cuota=cuota["numero_cuota"],
+            monto=cuota["monto"],
+            fecha_vencimiento=cuota["fecha_vencimiento"],
+            estado=estado,
+        )
+        for cuota in cuotas
+    ]
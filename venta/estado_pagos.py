@@ -0,0 +1,166 @@
+# venta/estado_pagos.py
+"""
+Estado local de las sesiones de Stripe Checkout (caché de Django).
+
+El frontend consulta verificar_pago_stripe varias veces después de la redirección.
+El estado se guarda cuando llega el webhook o con el primer `Session.retrieve`, y
+desde ahí se responde localmente:
+
+- un estado final (pagado o expirado) no se vuelve a pedir a Stripe;
+- uno abierto se refresca como mucho cada STRIPE_ESTADO_PAGO_TTL segundos, y solo
+  un request a la vez lo hace (los demás usan la copia guardada);
+- con long-poll (`esperar`) el request espera hasta que cambie la versión del estado
+  o se acabe el tiempo, revisando solo la caché. La espera es para la vista async
+  (ASGI); la sync ocupa un worker WSGI (o el hilo de las vistas sync en ASGI)
+  mientras duerme, así que por defecto no espera y responde el estado actual.
+
+Cada cambio real (payment_status, status o pedido) sube `version`; el cliente
+envía la última versión que vio.
+"""
+import asyncio
+import time
+
+import stripe
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+TTL_ABIERTO = getattr(settings, 'STRIPE_ESTADO_PAGO_TTL', 10)
+TTL_GUARDADO = 60 * 60 * 6
+ESPERA_MAXIMA = getattr(settings, 'STRIPE_ESTADO_PAGO_ESPERA_MAXIMA', 25)
+# Tope del long-poll en la vista sync (0 = sin espera)
+ESPERA_MAXIMA_SYNC = getattr(settings, 'STRIPE_ESTADO_PAGO_ESPERA_MAXIMA_SYNC', 0)
+INTERVALO_ESPERA = 0.5
+
+
+def _clave(session_id):
+    return f"stripe_sesion:{session_id}"
+
+
+def _leer(objeto, campo):
+    if objeto is None:
+        return None
+    if isinstance(objeto, dict):
+        return objeto.get(campo)
+    return getattr(objeto, campo, None)
+
+
+def _es_final(estado):
+    return estado['payment_status'] in ('paid', 'no_payment_required') or estado['status'] == 'expired'
+
+
+def _huella(estado):
+    return (estado['payment_status'], estado['status'], estado.get('pedido_id'))
+
+
+def guardar_sesion(sesion, pedido_id=None):
+    """Guarda el estado de una sesión (objeto de Stripe o dict del webhook). Devuelve el estado."""
+    session_id = _leer(sesion, 'id')
+    anterior = cache.get(_clave(session_id))
+    monto = _leer(sesion, 'amount_total')
+    estado = {
+        "session_id": session_id,
+        "payment_status": _leer(sesion, 'payment_status'),
+        "status": _leer(sesion, 'status'),
+        "customer_email": _leer(_leer(sesion, 'customer_details'), 'email'),
+        "amount_total": monto / 100 if monto is not None else None,  # Convertir a Bs
+        "metadata": dict(_leer(sesion, 'metadata') or {}),
+        "pedido_id": pedido_id or (anterior or {}).get('pedido_id'),
+        "actualizado": time.time(),
+    }
+    if anterior and _es_final(anterior) and not _es_final(estado):
+        # Un evento viejo que llega tarde no deshace un estado final
+        return anterior
+    estado["version"] = anterior["version"] if anterior and _huella(anterior) == _huella(estado) else int(time.time() * 1000)
+    cache.set(_clave(session_id), estado, TTL_GUARDADO)
+    return estado
+
+
+def marcar_pedido(session_id, pedido_id):
+    """El worker de eventos avisa que la sesión ya tiene pedido."""
+    estado = cache.get(_clave(session_id))
+    if estado and estado.get('pedido_id') != pedido_id:
+        estado.update(pedido_id=pedido_id, version=int(time.time() * 1000))
+        cache.set(_clave(session_id), estado, TTL_GUARDADO)
+
+
+def _vigente(estado):
+    return _es_final(estado) or time.time() - estado['actualizado'] < TTL_ABIERTO
+
+
+def _debe_refrescar(session_id, estado):
+    # cache.add es atómico: un solo request por sesión y TTL consulta a Stripe
+    return estado is None or (not _vigente(estado) and cache.add(f"{_clave(session_id)}:refrescando", 1, TTL_ABIERTO))
+
+
+def obtener_estado(session_id):
+    """Devuelve (estado, origen). Solo llama a Stripe si no hay copia o está vencida. Lanza stripe.error.StripeError."""
+    estado = cache.get(_clave(session_id))
+    if not _debe_refrescar(session_id, estado):
+        return estado, "local"
+    return guardar_sesion(stripe.checkout.Session.retrieve(session_id)), "stripe"
+
+
+async def _debe_refrescar_async(session_id, estado):
+    return estado is None or (not _vigente(estado) and await cache.aadd(f"{_clave(session_id)}:refrescando", 1, TTL_ABIERTO))
+
+
+async def obtener_estado_async(session_id):
+    """Igual que obtener_estado, con la API async de la caché (no bloquea el event loop)."""
+    estado = await cache.aget(_clave(session_id))
+    if not await _debe_refrescar_async(session_id, estado):
+        return estado, "local"
+    sesion = await stripe.checkout.Session.retrieve_async(session_id)
+    return await sync_to_async(guardar_sesion)(sesion), "stripe"
+
+
+def _segundos_espera(esperar, maximo=ESPERA_MAXIMA):
+    try:
+        return max(0.0, min(float(esperar or 0), maximo))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _version(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def esperar_estado(session_id, version=None, esperar=0):
+    """
+    Long-poll: devuelve en cuanto la versión difiere de `version` (o al vencer `esperar`).
+    La espera se limita a ESPERA_MAXIMA_SYNC: sin configurarla responde de inmediato.
+    """
+    estado, origen = obtener_estado(session_id)
+    version = _version(version)
+    limite = time.monotonic() + _segundos_espera(esperar, ESPERA_MAXIMA_SYNC)
+    while version is not None and estado['version'] == version and time.monotonic() < limite:
+        time.sleep(INTERVALO_ESPERA)
+        estado, origen = obtener_estado(session_id)
+    return estado, origen
+
+
+async def esperar_estado_async(session_id, version=None, esperar=0):
+    estado, origen = await obtener_estado_async(session_id)
+    version = _version(version)
+    limite = time.monotonic() + _segundos_espera(esperar)
+    while version is not None and estado['version'] == version and time.monotonic() < limite:
+        await asyncio.sleep(INTERVALO_ESPERA)
+        estado, origen = await obtener_estado_async(session_id)
+    return estado, origen
+
+
+def respuesta(estado, origen):
+    """Campos que devuelve verificar_pago_stripe (los de siempre más pedido y versión)."""
+    return {
+        "payment_status": estado['payment_status'],
+        "status": estado['status'],
+        "customer_email": estado['customer_email'],
+        "amount_total": estado['amount_total'],
+        "metadata": estado['metadata'],
+        "pedido_id": estado.get('pedido_id'),
+        "version": estado['version'],
+        "origen": origen,
+    }
@@ -0,0 +1,181 @@
+# venta/eventos_stripe.py
+"""
+Procesamiento de los eventos de Stripe guardados por el webhook (EventoStripeModel).
+
+- `registrar_evento` guarda el evento verificado una sola vez por `event.id`
+  (las reentregas de Stripe se descartan en el INSERT).
+- `procesar_pendientes` toma eventos de a uno con SELECT ... FOR UPDATE SKIP LOCKED,
+  así que varios workers (o el hilo del propio webhook) pueden correr a la vez.
+- `checkout.session.completed` con pago confirmado genera el pedido a partir de la
+  metadata de la sesión (carrito_id, usuario_id, forma_pago_id) con la misma lógica
+  que generar_pedido; si el carrito ya tiene pedido, solo se enlaza la sesión.
+- Un evento que falla se reintenta con espera exponencial; al agotar los intentos
+  queda 'descartado' (dead-letter) y se avisa a los administradores.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from comercio.utils import NotificacionService
+from usuario.models import Usuario
+from .estado_pagos import marcar_pedido
+from .checkout import crear_pedido_desde_carrito, CarritoYaConvertido
+from .models import EventoStripeModel, CarritoModel, FormaPagoModel, PedidoModel
+
+logger = logging.getLogger(__name__)
+
+MAX_INTENTOS = getattr(settings, 'STRIPE_EVENTOS_MAX_INTENTOS', 8)
+ESPERA_BASE_SEGUNDOS = getattr(settings, 'STRIPE_EVENTOS_ESPERA_BASE', 30)
+ESPERA_MAXIMA_SEGUNDOS = getattr(settings, 'STRIPE_EVENTOS_ESPERA_MAXIMA', 60 * 60)
+PROCESAR_AL_RECIBIR = getattr(settings, 'STRIPE_EVENTOS_PROCESAR_AL_RECIBIR', True)
+
+TIPOS_PEDIDO = ('checkout.session.completed', 'checkout.session.async_payment_succeeded')
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="eventos-stripe")
+
+
+class EventoInvalido(Exception):
+    """El evento no trae los datos necesarios; reintentar no lo arreglará."""
+
+
+# --------------------------
+# Recepción
+# --------------------------
+def registrar_evento(evento):
+    """Guarda el evento (dict de Stripe) si no se había recibido antes. Devuelve True si es nuevo."""
+    # get_or_create resuelve la carrera de dos entregas simultáneas con la restricción única
+    _, nuevo = EventoStripeModel.objects.get_or_create(
+        stripe_event_id=evento['id'],
+        defaults={'tipo': evento['type'], 'payload': evento},
+    )
+    if nuevo and PROCESAR_AL_RECIBIR:
+        # Procesa en segundo plano después de responder; el worker cubre lo que quede pendiente
+        transaction.on_commit(lambda: _executor.submit(_procesar_en_hilo))
+    return nuevo
+
+
+def _procesar_en_hilo():
+    try:
+        procesar_pendientes(limite=10)
+    except Exception as e:
+        logger.error("Error procesando eventos de Stripe: %s", e)
+    finally:
+        close_old_connections()
+
+
+# --------------------------
+# Procesamiento
+# --------------------------
+def _materializar_pedido(sesion):
+    """Genera (o encuentra) el pedido de una sesión de checkout pagada. Devuelve el pedido."""
+    sesion_id = sesion.get('id')
+    existente = PedidoModel.objects.filter(stripe_session_id=sesion_id).first()
+    if existente:
+        return existente
+
+    metadata = sesion.get('metadata') or {}
+    try:
+        carrito_id = int(metadata['carrito_id'])
+        usuario_id = int(metadata['usuario_id'])
+        forma_pago_id = int(metadata['forma_pago_id'])
+    except (KeyError, TypeError, ValueError):
+        raise EventoInvalido(f"Metadata incompleta en la sesión {sesion_id}: {metadata}")
+
+    usuario = Usuario.objects.select_related('grupo').filter(id=usuario_id).first()
+    carrito = CarritoModel.objects.filter(id=carrito_id, usuario_id=usuario_id).first()
+    forma_pago = FormaPagoModel.objects.filter(id=forma_pago_id).first()
+    if not usuario or not carrito or not forma_pago:
+        raise EventoInvalido(f"Usuario, carrito o forma de pago inexistente en la sesión {sesion_id}")
+
+    try:
+        pedido, _ = crear_pedido_desde_carrito(usuario, carrito, forma_pago, stripe_session_id=sesion_id)
+    except CarritoYaConvertido as e:
+        # El cliente ya confirmó el pedido desde el frontend: solo se enlaza la sesión
+        pedido = e.pedido
+        if not pedido.stripe_session_id:
+            PedidoModel.objects.filter(pk=pedido.pk, stripe_session_id__isnull=True).update(stripe_session_id=sesion_id)
+    return pedido
+
+
+def procesar_evento(evento):
+    """Devuelve (estado final, pedido o None)."""
+    datos = evento.payload.get('data', {}).get('object', {})
+    if evento.tipo in TIPOS_PEDIDO:
+        if evento.tipo == 'checkout.session.completed' and datos.get('payment_status') not in ('paid', 'no_payment_required'):
+            # Pago asíncrono aún no confirmado: llegará checkout.session.async_payment_succeeded
+            return 'ignorado', None
+        pedido = _materializar_pedido(datos)
+        transaction.on_commit(lambda: marcar_pedido(datos.get('id'), pedido.id))
+        return 'procesado', pedido
+    if evento.tipo == 'checkout.session.expired':
+        print("❌ Sesión expirada:", datos.get('id'))
+    return 'ignorado', None
+
+
+def _espera(intentos):
+    return timedelta(seconds=min(ESPERA_BASE_SEGUNDOS * 2 ** (intentos - 1), ESPERA_MAXIMA_SEGUNDOS))
+
+
+def _tomar_y_procesar_uno():
+    """Procesa el siguiente evento disponible. Devuelve el evento o None si no hay."""
+    with transaction.atomic():
+        evento = (
+            EventoStripeModel.objects.select_for_update(skip_locked=True)
+            .filter(estado__in=['pendiente', 'error'], proximo_intento__lte=timezone.now())
+            .order_by('proximo_intento', 'id')
+            .first()
+        )
+        if evento is None:
+            return None
+
+        evento.intentos += 1
+        try:
+            with transaction.atomic():
+                evento.estado, evento.pedido = procesar_evento(evento)
+            evento.ultimo_error = None
+            evento.fecha_procesado = timezone.now()
+        except Exception as e:
+            evento.ultimo_error = f"{type(e).__name__}: {e}"
+            if isinstance(e, EventoInvalido) or evento.intentos >= MAX_INTENTOS:
+                evento.estado = 'descartado'
+                transaction.on_commit(lambda ev=evento: _avisar_descartado(ev))
+            else:
+                evento.estado = 'error'
+                evento.proximo_intento = timezone.now() + _espera(evento.intentos)
+            logger.warning("Evento Stripe %s falló (intento %s): %s", evento.stripe_event_id, evento.intentos, e)
+        evento.save()
+    return evento
+
+
+def procesar_pendientes(limite=100):
+    """Procesa hasta `limite` eventos. Devuelve {estado: cantidad}."""
+    conteo = {}
+    for _ in range(limite):
+        evento = _tomar_y_procesar_uno()
+        if evento is None:
+            break
+        conteo[evento.estado] = conteo.get(evento.estado, 0) + 1
+    return conteo
+
+
+def _avisar_descartado(evento):
+    try:
+        NotificacionService.enviar_a_administradores(
+            "Pago de Stripe sin procesar",
+            f"El evento {evento.stripe_event_id} ({evento.tipo}) no se pudo procesar: {evento.ultimo_error}",
+            {"tipo": "evento_stripe_descartado", "evento_id": str(evento.id)},
+        )
+    except Exception as e:
+        logger.error("No se pudo notificar el evento descartado %s: %s", evento.stripe_event_id, e)
+
+
+def reintentar_descartados(ids=None):
+    """Vuelve a encolar eventos descartados (todos o los indicados). Devuelve cuántos."""
+    eventos = EventoStripeModel.objects.filter(estado='descartado')
+    if ids:
+        eventos = eventos.filter(id__in=ids)
+    return eventos.update(estado='pendiente', intentos=0, proximo_intento=timezone.now())
@@ -0,0 +1,172 @@
+# venta/idempotencia.py
+"""
+Middleware de idempotencia para los endpoints de checkout y pagos (cabecera Idempotency-Key).
+
+Solo actúa en los POST de las rutas de IDEMPOTENCIA_RUTAS que traen la cabecera.
+La clave es única por usuario (ClaveIdempotenciaModel):
+
+- primera vez: se registra 'en_curso', se ejecuta la vista y se guarda la respuesta;
+- reintento con la clave completada: se devuelve la respuesta guardada sin ejecutar nada
+  (cabecera Idempotent-Replayed: true);
+- reintento mientras la primera sigue en curso: 409 con Retry-After;
+- la misma clave con otro cuerpo u otra ruta: 422.
+
+Si la vista responde 5xx la clave se libera para que el reintento vuelva a ejecutarla.
+La vista recibe `request.clave_idempotencia`, que se envía a Stripe como
+idempotency_key: si la respuesta se perdió después de crear la sesión o el
+PaymentIntent, Stripe devuelve el mismo objeto en lugar de crear otro.
+"""
+import hashlib
+from datetime import timedelta
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+
+from utils.async_views import autenticar_request
+from .models import ClaveIdempotenciaModel
+
+CABECERA = 'HTTP_IDEMPOTENCY_KEY'
+RUTAS = set(getattr(settings, 'IDEMPOTENCIA_RUTAS', []))
+# Una ejecución 'en_curso' más vieja que esto se considera abandonada (el proceso murió)
+SEGUNDOS_EN_CURSO = getattr(settings, 'IDEMPOTENCIA_SEGUNDOS_EN_CURSO', 60)
+HORAS_VIGENCIA = getattr(settings, 'IDEMPOTENCIA_HORAS_VIGENCIA', 24)
+
+
+def _error(mensaje, http_status, **cabeceras):
+    respuesta = JsonResponse({"status": 0, "error": 1, "message": mensaje, "values": {}}, status=http_status)
+    for nombre, valor in cabeceras.items():
+        respuesta[nombre] = valor
+    return respuesta
+
+
+def _ruta(request):
+    if request.method != 'POST' or not request.META.get(CABECERA):
+        return None
+    try:
+        nombre = resolve(request.path_info).url_name
+    except Resolver404:
+        return None
+    return nombre if nombre in RUTAS else None
+
+
+def _iniciar(request, ruta):
+    """Devuelve (registro a completar, None) o (None, respuesta a devolver sin ejecutar la vista)."""
+    try:
+        usuario = autenticar_request(request)
+    except AuthenticationFailed:
+        usuario = None
+    if usuario is None:
+        return None, None  # la vista responderá 401
+
+    clave = request.META[CABECERA][:255]
+    huella = hashlib.sha256(ruta.encode() + b"\n" + request.body).hexdigest()
+    ahora = timezone.now()
+
+    try:
+        with transaction.atomic():
+            registro, creado = ClaveIdempotenciaModel.objects.get_or_create(
+                usuario=usuario, clave=clave,
+                defaults={'ruta': ruta, 'huella': huella, 'fecha_actualizacion': ahora},
+            )
+    except IntegrityError:
+        registro, creado = ClaveIdempotenciaModel.objects.get(usuario=usuario, clave=clave), False
+
+    if not creado:
+        if registro.fecha_creacion < ahora - timedelta(hours=HORAS_VIGENCIA):
+            # Clave vencida: se reutiliza como nueva
+            retomado = ClaveIdempotenciaModel.objects.filter(pk=registro.pk, fecha_creacion=registro.fecha_creacion).update(
+                ruta=ruta, huella=huella, estado='en_curso', codigo_respuesta=None,
+                tipo_contenido=None, cuerpo_respuesta=None, fecha_creacion=ahora, fecha_actualizacion=ahora,
+            )
+            if not retomado:
+                return None, _error("Hay una solicitud con esta Idempotency-Key en curso", 409, **{"Retry-After": "1"})
+        elif registro.huella != huella:
+            return None, _error("La Idempotency-Key ya se usó con otra solicitud", 422)
+        elif registro.estado == 'completado':
+            respuesta = HttpResponse(registro.cuerpo_respuesta, status=registro.codigo_respuesta,
+                                     content_type=registro.tipo_contenido)
+            respuesta['Idempotent-Replayed'] = 'true'
+            return None, respuesta
+        else:
+            # Sigue en curso: solo se retoma si quedó abandonada
+            retomado = ClaveIdempotenciaModel.objects.filter(
+                pk=registro.pk, estado='en_curso',
+                fecha_actualizacion__lt=ahora - timedelta(seconds=SEGUNDOS_EN_CURSO),
+            ).update(fecha_actualizacion=ahora)
+            if not retomado:
+                return None, _error("Hay una solicitud con esta Idempotency-Key en curso", 409, **{"Retry-After": "1"})
+
+    # Clave para Stripe: distinta por usuario y ruta para no chocar con las de otros clientes
+    request.clave_idempotencia = f"{ruta}:{usuario.id}:{clave}"
+    return registro, None
+
+
+def _terminar(registro, respuesta):
+    if respuesta.status_code >= 500 or getattr(respuesta, 'streaming', False):
+        registro.delete()
+        return
+    ClaveIdempotenciaModel.objects.filter(pk=registro.pk).update(
+        estado='completado',
+        codigo_respuesta=respuesta.status_code,
+        tipo_contenido=respuesta.get('Content-Type'),
+        cuerpo_respuesta=respuesta.content.decode('utf-8', errors='replace'),
+        fecha_actualizacion=timezone.now(),
+    )
+
+
+class IdempotenciaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.es_async:
+            return self.__acall__(request)
+        ruta = _ruta(request)
+        if ruta is None:
+            return self.get_response(request)
+        registro, respuesta = _iniciar(request, ruta)
+        if respuesta is not None:
+            return respuesta
+        try:
+            respuesta = self.get_response(request)
+        except Exception:
+            if registro is not None:
+                registro.delete()
+            raise
+        if registro is not None:
+            _terminar(registro, respuesta)
+        return respuesta
+
+    async def __acall__(self, request):
+        ruta = _ruta(request)
+        if ruta is None:
+            return await self.get_response(request)
+        registro, respuesta = await sync_to_async(_iniciar)(request, ruta)
+        if respuesta is not None:
+            return respuesta
+        try:
+            respuesta = await self.get_response(request)
+        except Exception:
+            if registro is not None:
+                await sync_to_async(registro.delete)()
+            raise
+        if registro is not None:
+            await sync_to_async(_terminar)(registro, respuesta)
+        return respuesta
+
+
+def opciones_stripe(request):
+    """kwargs para las llamadas a Stripe: idempotency_key si el request trae Idempotency-Key."""
+    clave = getattr(request, 'clave_idempotencia', None)
+    return {'idempotency_key': clave} if clave else {}
@@ -0,0 +1,109 @@
+# management/commands/conciliar_pagos.py
+import datetime
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from producto.importacion import leer_filas
+from usuario.models import Usuario
+from venta.conciliacion import conciliar_pagos, TAMANO_LOTE
+from venta.models import CarritoModel, FormaPagoModel, MetodoPagoModel, PedidoModel, PlanPagoModel
+
+CUOTAS_BENCHMARK = 6
+MONTO_CUOTA_BENCHMARK = Decimal('100.00')
+PREFIJO_BENCHMARK = "bench_conc_"
+
+
+class Command(BaseCommand):
+    help = 'Concilia un extracto de pagos (CSV o JSON lines) con las cuotas pendientes o mide el rendimiento con datos sintéticos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', nargs='?', help='Ruta del extracto (.csv o .jsonl)')
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], help='Formato del archivo')
+        parser.add_argument('--metodo-pago', help='Id o nombre del método de pago para las filas que no lo traen')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Filas por lote/transacción')
+        parser.add_argument('--benchmark', type=int, default=0,
+                            help='Genera N cuotas sintéticas, concilia un extracto de N filas (5%% sin coincidencia) y las elimina')
+
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            return self._benchmark(options['benchmark'], options['lote'])
+
+        if not options['archivo']:
+            raise CommandError('Indica el archivo a conciliar o usa --benchmark N')
+
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                resultado = conciliar_pagos(
+                    leer_filas(archivo, options['formato']),
+                    metodo_pago=options['metodo_pago'], tamano_lote=options['lote'],
+                )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self._imprimir(resultado)
+        for fila in resultado['no_conciliados'][:50]:
+            self.stdout.write(self.style.WARNING(f"  fila {fila['index']} (pedido {fila.get('pedido_id')}): {fila['motivo']}"))
+
+    def _imprimir(self, resultado, titulo='Conciliación'):
+        filas_seg = resultado['procesadas'] / resultado['duracion_segundos'] if resultado['duracion_segundos'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{titulo}: {resultado['procesadas']} filas en {resultado['duracion_segundos']}s "
+            f"({filas_seg:,.0f} filas/s) | conciliadas {resultado['conciliados']} | "
+            f"pedidos actualizados {resultado['pedidos_actualizados']} | "
+            f"sin conciliar {len(resultado['no_conciliados'])}"
+        ))
+
+    def _benchmark(self, cantidad, lote):
+        forma_pago = FormaPagoModel.objects.first()
+        metodo_pago = MetodoPagoModel.objects.filter(is_active=True).first()
+        if not forma_pago or not metodo_pago:
+            raise CommandError('Se necesita al menos una forma de pago y un método de pago activo')
+
+        inicio = time.perf_counter()
+        # Cliente sintético e inactivo: los pedidos del benchmark no se mezclan con los de un cliente real
+        # y al borrarlo se van en cascada carrito, pedidos, cuotas y pagos
+        usuario = Usuario.objects.create(
+            username=f"{PREFIJO_BENCHMARK}{uuid.uuid4().hex[:8]}", first_name="Cliente", last_name="Benchmark",
+            is_active=False,
+        )
+        usuario.set_unusable_password()
+        usuario.save(update_fields=['password'])
+        carrito = CarritoModel.objects.create(usuario=usuario, is_active=False)
+        try:
+            cantidad_pedidos = -(-cantidad // CUOTAS_BENCHMARK)
+            pedidos = PedidoModel.objects.bulk_create([
+                PedidoModel(usuario=usuario, carrito=carrito, forma_pago=forma_pago,
+                            total=MONTO_CUOTA_BENCHMARK * CUOTAS_BENCHMARK, estado='pendiente')
+                for _ in range(cantidad_pedidos)
+            ], batch_size=5000)
+            hoy = datetime.date.today()
+            PlanPagoModel.objects.bulk_create([
+                PlanPagoModel(pedido=pedido, numero_cuota=n + 1, monto=MONTO_CUOTA_BENCHMARK,
+                              fecha_vencimiento=hoy + datetime.timedelta(days=30 * (n + 1)), estado='pendiente')
+                for pedido in pedidos for n in range(CUOTAS_BENCHMARK)
+            ], batch_size=5000)
+            self.stdout.write(
+                f"Preparación: {cantidad_pedidos} pedidos y {cantidad_pedidos * CUOTAS_BENCHMARK} cuotas "
+                f"en {time.perf_counter() - inicio:.2f}s"
+            )
+
+            def filas():
+                for i in range(cantidad):
+                    pedido = pedidos[i // CUOTAS_BENCHMARK]
+                    # 1 de cada 20 filas trae un monto que no coincide con ninguna cuota
+                    monto = MONTO_CUOTA_BENCHMARK if i % 20 else MONTO_CUOTA_BENCHMARK + Decimal('0.50')
+                    yield {
+                        "pedido_id": pedido.id,
+                        "monto": str(monto),
+                        "comprobante": f"BENCH-{carrito.id}-{i:07d}",
+                        "fecha_pago": hoy.isoformat(),
+                        "metodo_pago_id": metodo_pago.id,
+                    }
+
+            self._imprimir(conciliar_pagos(filas(), tamano_lote=lote))
+        finally:
+            inicio = time.perf_counter()
+            eliminados, _ = usuario.delete()
+            self.stdout.write(f"Limpieza: {eliminados} filas eliminadas en {time.perf_counter() - inicio:.2f}s")
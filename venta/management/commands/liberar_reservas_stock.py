@@ -0,0 +1,24 @@
+# management/commands/liberar_reservas_stock.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from venta.reservas import liberar_vencidas
+
+
+class Command(BaseCommand):
+    help = "Marca como vencidas las reservas de stock cuyo plazo terminó (pensado para cron o --continuo)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--continuo', action='store_true', help='Repetir cada --intervalo segundos')
+        parser.add_argument('--intervalo', type=float, default=60.0)
+        parser.add_argument('--tamano-lote', type=int, default=5000)
+
+    def handle(self, *args, **opciones):
+        while True:
+            liberadas = liberar_vencidas(opciones['tamano_lote'])
+            if liberadas or not opciones['continuo']:
+                self.stdout.write(f"🧹 {liberadas} reservas de stock vencidas liberadas")
+            if not opciones['continuo']:
+                break
+            time.sleep(opciones['intervalo'])
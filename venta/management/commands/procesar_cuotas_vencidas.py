@@ -0,0 +1,33 @@
+# management/commands/procesar_cuotas_vencidas.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from venta.cobranzas import marcar_vencidas, enviar_recordatorios
+
+
+class Command(BaseCommand):
+    help = "Marca las cuotas vencidas y envía recordatorios de pago por cliente (pensado para cron diario o --continuo)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias-aviso', type=int, default=3,
+                            help='Recordar también las cuotas que vencen en los próximos N días')
+        parser.add_argument('--sin-recordatorios', action='store_true', help='Solo marcar las cuotas vencidas')
+        parser.add_argument('--tamano-lote', type=int, default=5000)
+        parser.add_argument('--continuo', action='store_true', help='Repetir cada --intervalo segundos')
+        parser.add_argument('--intervalo', type=float, default=3600.0)
+
+    def handle(self, *args, **opciones):
+        while True:
+            inicio = time.perf_counter()
+            vencidas = marcar_vencidas(tamano_lote=opciones['tamano_lote'])
+            avisados = 0
+            if not opciones['sin_recordatorios']:
+                avisados = enviar_recordatorios(dias_aviso=opciones['dias_aviso'])
+            self.stdout.write(
+                f"📅 {vencidas} cuotas marcadas como vencidas, {avisados} clientes notificados "
+                f"({time.perf_counter() - inicio:.2f}s)"
+            )
+            if not opciones['continuo']:
+                break
+            time.sleep(opciones['intervalo'])
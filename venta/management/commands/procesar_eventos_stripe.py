@@ -0,0 +1,29 @@
+# management/commands/procesar_eventos_stripe.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from venta import eventos_stripe
+
+
+class Command(BaseCommand):
+    help = "Procesa la bandeja de eventos de Stripe (reintentos y descartados)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limite', type=int, default=100, help='Eventos por pasada')
+        parser.add_argument('--continuo', action='store_true', help='Quedarse procesando (worker)')
+        parser.add_argument('--intervalo', type=float, default=5.0, help='Segundos entre pasadas con --continuo')
+        parser.add_argument('--reintentar', type=int, nargs='*', help='Volver a encolar descartados (todos o los IDs dados)')
+
+    def handle(self, *args, **opciones):
+        if opciones['reintentar'] is not None:
+            cantidad = eventos_stripe.reintentar_descartados(opciones['reintentar'])
+            self.stdout.write(f"🔁 {cantidad} eventos descartados vueltos a encolar")
+
+        while True:
+            conteo = eventos_stripe.procesar_pendientes(limite=opciones['limite'])
+            if conteo:
+                self.stdout.write(f"📦 Eventos procesados: {conteo}")
+            if not opciones['continuo']:
+                break
+            time.sleep(opciones['intervalo'])
@@ -0,0 +1,114 @@
+# management/commands/prueba_carga_async.py
+import asyncio
+import json
+import statistics
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from django.core.management.base import BaseCommand
+
+
+def _crear_stripe_falso(latencia):
+    """Servidor HTTP que imita a Stripe respondiendo después de `latencia` segundos."""
+    class StripeFalso(BaseHTTPRequestHandler):
+        def _responder(self):
+            time.sleep(latencia)
+            if '/payment_intents' in self.path:
+                cuerpo = {"id": f"pi_{uuid.uuid4().hex[:16]}", "object": "payment_intent",
+                          "client_secret": "pi_secret_falso", "status": "requires_payment_method"}
+            else:
+                cuerpo = {"id": f"cs_test_{uuid.uuid4().hex[:16]}", "object": "checkout.session",
+                          "payment_status": "unpaid", "status": "open", "amount_total": 10000,
+                          "customer_details": {"email": "cliente@example.com"}, "metadata": {}}
+            datos = json.dumps(cuerpo).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+
+        do_GET = _responder
+        do_POST = _responder
+
+        def log_message(self, *args):
+            pass
+
+    return StripeFalso
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga de los endpoints de Stripe contra uno o más servidores (WSGI y ASGI) '
+        'usando un Stripe simulado lento. Levanta los servidores con STRIPE_API_BASE=http://127.0.0.1:<puerto>.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', required=True,
+                            help='URL completa a probar (repetible), p. ej. http://127.0.0.1:8000/venta/stripe/crear-sesion')
+        parser.add_argument('--token', default='', help='JWT de acceso del usuario de prueba')
+        parser.add_argument('--forma-pago', type=int, default=1, help='forma_pago enviada en el body')
+        parser.add_argument('--peticiones', type=int, default=200)
+        parser.add_argument('--concurrencia', type=int, default=50)
+        parser.add_argument('--stripe-falso-puerto', type=int, default=0,
+                            help='Si se indica, levanta el Stripe simulado en este puerto durante la prueba')
+        parser.add_argument('--latencia', type=float, default=0.5, help='Latencia del Stripe simulado (s)')
+
+    def handle(self, *args, **options):
+        servidor = None
+        if options['stripe_falso_puerto']:
+            servidor = ThreadingHTTPServer(
+                ('127.0.0.1', options['stripe_falso_puerto']), _crear_stripe_falso(options['latencia'])
+            )
+            threading.Thread(target=servidor.serve_forever, daemon=True).start()
+            self.stdout.write(self.style.SUCCESS(
+                f"Stripe simulado en http://127.0.0.1:{options['stripe_falso_puerto']} "
+                f"(latencia {options['latencia']}s)"
+            ))
+
+        try:
+            for url in options['url']:
+                resultado = asyncio.run(self._cargar(url, options))
+                self._imprimir(url, resultado)
+        finally:
+            if servidor:
+                servidor.shutdown()
+
+    async def _cargar(self, url, options):
+        semaforo = asyncio.Semaphore(options['concurrencia'])
+        headers = {"Authorization": f"Bearer {options['token']}"} if options['token'] else {}
+        cuerpo = {"forma_pago": options['forma_pago']}
+        latencias, codigos = [], {}
+
+        async with httpx.AsyncClient(timeout=60, limits=httpx.Limits(max_connections=options['concurrencia'])) as cliente:
+            async def una_peticion():
+                async with semaforo:
+                    inicio = time.perf_counter()
+                    try:
+                        if '/verificar-pago/' in url:
+                            r = await cliente.get(url, headers=headers)
+                        else:
+                            r = await cliente.post(url, json=cuerpo, headers=headers)
+                        codigo = r.status_code
+                    except httpx.HTTPError as e:
+                        codigo = type(e).__name__
+                    latencias.append((time.perf_counter() - inicio) * 1000)
+                    codigos[codigo] = codigos.get(codigo, 0) + 1
+
+            inicio_total = time.perf_counter()
+            await asyncio.gather(*(una_peticion() for _ in range(options['peticiones'])))
+            duracion = time.perf_counter() - inicio_total
+
+        return latencias, codigos, duracion
+
+    def _imprimir(self, url, resultado):
+        latencias, codigos, duracion = resultado
+        latencias.sort()
+        p95 = latencias[max(int(len(latencias) * 0.95) - 1, 0)]
+        self.stdout.write(self.style.SUCCESS(f"\n{url}"))
+        self.stdout.write(
+            f"  {len(latencias)} peticiones en {duracion:.2f}s -> {len(latencias) / duracion:.1f} req/s | "
+            f"p50 {statistics.median(latencias):.0f} ms | p95 {p95:.0f} ms | códigos {codigos}"
+        )
@@ -0,0 +1,134 @@
+# management/commands/prueba_carga_venta_flash.py
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from producto.models import ProductoModel
+from venta import venta_flash
+from venta.models import VentaFlashModel
+
+
+class Command(BaseCommand):
+    help = ("Compara compras concurrentes de un producto con bloqueo de fila (SELECT ... FOR UPDATE) "
+            "contra el contador de venta flash en caché. Usa un producto temporal que borra al terminar; "
+            "solo corre con DEBUG.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--compras', type=int, default=500, help='Compras de 1 unidad por modo')
+        parser.add_argument('--hilos', type=int, default=32)
+        parser.add_argument('--unidades', type=int, default=300, help='Unidades en venta (menos que compras para ver rechazos)')
+        parser.add_argument('--trabajo-ms', type=float, default=5.0,
+                            help='Duración simulada del resto de la transacción del pedido')
+
+    def handle(self, *args, **opciones):
+        if not settings.DEBUG:
+            raise CommandError("Prueba de carga solo para desarrollo: requiere DEBUG=True")
+        unidades = opciones['unidades']
+        trabajo = opciones['trabajo_ms'] / 1000
+        # Producto temporal e inactivo: no aparece en el catálogo y no toca el stock real
+        producto = ProductoModel.objects.create(
+            nombre="Prueba de carga venta flash", precio_contado=1, stock=unidades, is_active=False,
+        )
+        try:
+            fila, flash = self._comparar(producto, unidades, trabajo, opciones)
+        finally:
+            producto.delete()
+
+        self.stdout.write(f"📊 {opciones['compras']} compras, {opciones['hilos']} hilos, {unidades} unidades, "
+                          f"{opciones['trabajo_ms']} ms de trabajo por pedido")
+        for nombre, r in (("Bloqueo de fila", fila), ("Venta flash", flash)):
+            correcto = r["stock_final"] == unidades - r["vendidas"] and r["vendidas"] <= unidades
+            self.stdout.write(
+                f"   {nombre}: {r['por_segundo']:.0f} compras/s, p95 {r['p95_ms']:.1f} ms, "
+                f"vendidas {r['vendidas']}, rechazadas {r['rechazadas']}, stock final {r['stock_final']} "
+                f"({'✅ consistente' if correcto else '❌ inconsistente'})"
+            )
+        self.stdout.write(f"   Reconciliación de la venta flash: {flash['reconciliacion_ms']:.1f} ms")
+        self.stdout.write("   Producto temporal eliminado")
+
+    def _comparar(self, producto, unidades, trabajo, opciones):
+        # --------------------------
+        # Modo fila: cada compra bloquea el producto durante su transacción
+        # --------------------------
+        ProductoModel.objects.filter(pk=producto.pk).update(stock=unidades)
+
+        def comprar_fila(_):
+            try:
+                with transaction.atomic():
+                    fila = ProductoModel.objects.select_for_update().only('stock').get(pk=producto.pk)
+                    if fila.stock < 1:
+                        return False
+                    time.sleep(trabajo)
+                    ProductoModel.objects.filter(pk=producto.pk).update(stock=F('stock') - 1)
+                    return True
+            finally:
+                close_old_connections()
+
+        fila = self._correr(comprar_fila, opciones)
+        fila["stock_final"] = ProductoModel.objects.get(pk=producto.pk).stock
+
+        # --------------------------
+        # Modo flash: DECR en caché, transacción sin bloqueo de fila, stock aplicado por lotes
+        # --------------------------
+        ProductoModel.objects.filter(pk=producto.pk).update(stock=unidades)
+        ahora = timezone.now()
+        venta = VentaFlashModel.objects.create(
+            producto=producto, unidades=unidades, inicio=ahora - timedelta(minutes=1), fin=ahora + timedelta(hours=1)
+        )
+        venta_flash.invalidar_activas()
+        activas = {producto.id: venta.id}
+
+        def comprar_flash(_):
+            try:
+                tomadas = venta_flash.tomar_unidades({producto.id: 1}, activas)
+            except venta_flash.UnidadesAgotadas:
+                return False
+            try:
+                with transaction.atomic():
+                    time.sleep(trabajo)
+                    transaction.on_commit(lambda: venta_flash.registrar_vendidas(tomadas))
+                return True
+            except Exception:
+                venta_flash.devolver_unidades(tomadas)
+                raise
+            finally:
+                close_old_connections()
+
+        try:
+            flash = self._correr(comprar_flash, opciones)
+            inicio = time.perf_counter()
+            venta_flash.finalizar(venta)
+            flash["reconciliacion_ms"] = (time.perf_counter() - inicio) * 1000
+            flash["stock_final"] = ProductoModel.objects.get(pk=producto.pk).stock
+        finally:
+            venta.delete()
+            venta_flash.invalidar_activas()
+        return fila, flash
+
+    def _correr(self, comprar, opciones):
+        tiempos = []
+
+        def medir(i):
+            inicio = time.perf_counter()
+            resultado = comprar(i)
+            tiempos.append(time.perf_counter() - inicio)
+            return resultado
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=opciones['hilos']) as ejecutor:
+            resultados = list(ejecutor.map(medir, range(opciones['compras'])))
+        total = time.perf_counter() - inicio
+        tiempos.sort()
+        vendidas = sum(resultados)
+        return {
+            "por_segundo": len(resultados) / total,
+            "p95_ms": tiempos[int(len(tiempos) * 0.95) - 1] * 1000,
+            "vendidas": vendidas,
+            "rechazadas": len(resultados) - vendidas,
+        }
@@ -0,0 +1,20 @@
+# management/commands/purgar_claves_idempotencia.py
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from venta.idempotencia import HORAS_VIGENCIA
+from venta.models import ClaveIdempotenciaModel
+
+
+class Command(BaseCommand):
+    help = "Elimina las claves de idempotencia vencidas (más viejas que IDEMPOTENCIA_HORAS_VIGENCIA)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horas', type=int, default=HORAS_VIGENCIA, help='Antigüedad mínima a eliminar')
+
+    def handle(self, *args, **opciones):
+        limite = timezone.now() - timedelta(hours=opciones['horas'])
+        eliminadas, _ = ClaveIdempotenciaModel.objects.filter(fecha_creacion__lt=limite).delete()
+        self.stdout.write(f"🧹 {eliminadas} claves de idempotencia eliminadas")
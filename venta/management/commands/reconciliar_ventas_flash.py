@@ -0,0 +1,28 @@
+# management/commands/reconciliar_ventas_flash.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from venta import venta_flash
+
+
+class Command(BaseCommand):
+    help = "Aplica a la BD las unidades de ventas flash vendidas en la caché (write-behind)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--continuo', action='store_true', help='Repetir cada --intervalo segundos')
+        parser.add_argument('--intervalo', type=float, default=2.0)
+        parser.add_argument('--resincronizar', type=int, nargs='+', metavar='VENTA_ID',
+                            help='Rearmar el contador de estas ventas desde la BD')
+
+    def handle(self, *args, **opciones):
+        for venta_id in opciones['resincronizar'] or []:
+            self.stdout.write(f"🔄 Venta flash {venta_id}: {venta_flash.resincronizar(venta_id)} unidades disponibles")
+
+        while True:
+            aplicadas = venta_flash.reconciliar()
+            if aplicadas or not opciones['continuo']:
+                self.stdout.write(f"📦 Unidades aplicadas por venta: {aplicadas}")
+            if not opciones['continuo']:
+                break
+            time.sleep(opciones['intervalo'])
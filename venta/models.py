@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from usuario.models import Usuario
 from producto.models import ProductoModel
 # Create your models here.
@@ -77,6 +78,8 @@ class PedidoModel(models.Model):
         ('cancelado', 'Cancelado'),
     ], default="Pendiente")
     is_active = models.BooleanField(default=True)
+    # Sesión de Stripe Checkout que originó el pedido (evita duplicarlo si el webhook llega más de una vez)
+    stripe_session_id = models.CharField(max_length=255, unique=True, blank=True, null=True)
 
     def __str__(self):
         return f"Pedido {self.id} - Usuario {self.usuario.username}"
@@ -106,15 +109,22 @@ class PlanPagoModel(models.Model):
     fecha_vencimiento = models.DateField()
     estado = models.CharField(max_length=50, choices=[
         ('pendiente', 'Pendiente'),
+        ('vencido', 'Vencido'),
         ('pagado', 'Pagado'),
     ], default="Pendiente")
     is_active = models.BooleanField(default=True)
+    # Último día en que se recordó la cuota al cliente (a lo sumo un recordatorio por día)
+    fecha_recordatorio = models.DateField(null=True, blank=True)
 
     def __str__(self):
         return f"Plan de Pago {self.id} - Pedido {self.pedido.id}"
 
     class Meta:
         db_table = "plan_pago"
+        indexes = [
+            # Barrido de cuotas por vencer/vencidas y reporte de planes de pago por estado y fecha
+            models.Index(fields=['estado', 'fecha_vencimiento'], name='plan_pago_estado_venc_idx'),
+        ]
 
 # MODELO METODO DE PAGO
 class MetodoPagoModel(models.Model):
@@ -141,4 +151,123 @@ class PagoModel(models.Model):
         return f"Pago {self.id} - Plan de Pago {self.plan_pago.id}"
 
     class Meta:
-        db_table = "pago"
\ No newline at end of file
+        db_table = "pago"
+        indexes = [
+            # Conciliación: detectar comprobantes ya cargados
+            models.Index(fields=['comprobante'], name='pago_comprobante_idx'),
+        ]
+
+# BANDEJA DE ENTRADA DE EVENTOS DE STRIPE (WEBHOOK)
+# El webhook solo guarda el evento verificado; venta/eventos_stripe.py lo procesa con reintentos
+class EventoStripeModel(models.Model):
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('procesado', 'Procesado'),
+        ('ignorado', 'Ignorado'),
+        ('error', 'Error (se reintentará)'),
+        ('descartado', 'Descartado (sin más reintentos)'),
+    ]
+    stripe_event_id = models.CharField(max_length=255, unique=True)
+    tipo = models.CharField(max_length=100)
+    payload = models.JSONField()
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    intentos = models.PositiveIntegerField(default=0)
+    ultimo_error = models.TextField(blank=True, null=True)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    fecha_recepcion = models.DateTimeField(auto_now_add=True)
+    fecha_procesado = models.DateTimeField(blank=True, null=True)
+    pedido = models.ForeignKey(PedidoModel, on_delete=models.SET_NULL, blank=True, null=True, related_name="eventos_stripe")
+
+    def __str__(self):
+        return f"Evento Stripe {self.stripe_event_id} ({self.tipo}) - {self.estado}"
+
+    class Meta:
+        db_table = "evento_stripe"
+        indexes = [
+            models.Index(fields=['estado', 'proximo_intento'], name='evento_stripe_cola_idx'),
+        ]
+
+# CLAVES DE IDEMPOTENCIA (cabecera Idempotency-Key en checkout y pagos)
+# venta/idempotencia.py guarda la respuesta de la primera ejecución y la repite a los reintentos
+class ClaveIdempotenciaModel(models.Model):
+    ESTADOS = [
+        ('en_curso', 'En curso'),
+        ('completado', 'Completado'),
+    ]
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name="claves_idempotencia")
+    clave = models.CharField(max_length=255)
+    ruta = models.CharField(max_length=100)
+    huella = models.CharField(max_length=64)  # sha256 del cuerpo: la misma clave con otro cuerpo se rechaza
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='en_curso')
+    codigo_respuesta = models.PositiveSmallIntegerField(blank=True, null=True)
+    tipo_contenido = models.CharField(max_length=100, blank=True, null=True)
+    cuerpo_respuesta = models.TextField(blank=True, null=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Clave {self.clave} - Usuario {self.usuario_id} - {self.estado}"
+
+    class Meta:
+        db_table = "clave_idempotencia"
+        unique_together = ('usuario', 'clave')
+        indexes = [
+            models.Index(fields=['fecha_creacion'], name='clave_idem_fecha_idx'),
+        ]
+
+# RESERVAS DE STOCK (carritos activos y sesiones de pago en curso)
+# Stock disponible = stock - reservas activas no vencidas (venta/reservas.py)
+class ReservaStockModel(models.Model):
+    ESTADOS = [
+        ('activa', 'Activa'),
+        ('convertida', 'Convertida en pedido'),
+        ('liberada', 'Liberada'),
+        ('vencida', 'Vencida'),
+    ]
+    producto = models.ForeignKey(ProductoModel, on_delete=models.CASCADE, related_name="reservas_stock")
+    carrito = models.ForeignKey(CarritoModel, on_delete=models.CASCADE, related_name="reservas_stock")
+    cantidad = models.PositiveIntegerField()
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='activa')
+    vence = models.DateTimeField()
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Reserva {self.id} - Producto {self.producto_id} x{self.cantidad} - {self.estado}"
+
+    class Meta:
+        db_table = "reserva_stock"
+        constraints = [
+            # Una sola reserva activa por producto en cada carrito
+            models.UniqueConstraint(
+                fields=['carrito', 'producto'], condition=models.Q(estado='activa'),
+                name='reserva_stock_activa_unica',
+            ),
+        ]
+        indexes = [
+            # Índice parcial: solo las reservas activas, que son las que se suman al calcular disponibilidad
+            models.Index(
+                fields=['producto', 'vence'], include=['cantidad', 'carrito'],
+                condition=models.Q(estado='activa'), name='reserva_stock_activa_idx',
+            ),
+        ]
+
+# VENTAS FLASH (unidades disponibles en un contador atómico de la caché)
+# venta/venta_flash.py descuenta en la caché y aplica las ventas a la BD por lotes
+class VentaFlashModel(models.Model):
+    producto = models.ForeignKey(ProductoModel, on_delete=models.CASCADE, related_name="ventas_flash")
+    unidades = models.PositiveIntegerField()  # unidades asignadas a la venta
+    unidades_aplicadas = models.PositiveIntegerField(default=0)  # vendidas y ya descontadas del stock en BD
+    inicio = models.DateTimeField()
+    fin = models.DateTimeField()
+    is_active = models.BooleanField(default=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Venta flash {self.id} - Producto {self.producto_id} ({self.unidades} u.)"
+
+    class Meta:
+        db_table = "venta_flash"
+        indexes = [
+            models.Index(fields=['is_active', 'fin'], name='venta_flash_activa_idx'),
+        ]
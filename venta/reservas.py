@@ -0,0 +1,185 @@
+# venta/reservas.py
+"""
+Reservas de stock con vencimiento (ReservaStockModel).
+
+- Agregar un producto al carrito reserva la cantidad de la línea por
+  RESERVA_STOCK_MINUTOS_CARRITO; iniciar el pago con Stripe renueva las reservas de
+  todo el carrito por RESERVA_STOCK_MINUTOS_PAGO (lo que dura la sesión de checkout).
+- Disponible = stock - reservas activas no vencidas de otros carritos. La suma sale de
+  una sola consulta agrupada sobre el índice parcial de reservas activas.
+- Reservar bloquea la fila del producto (SELECT ... FOR UPDATE), así dos carritos no
+  pueden tomar la misma última unidad.
+- Al crear el pedido las reservas del carrito se convierten en descuento de stock.
+- Los productos en venta flash no se reservan: su disponibilidad es el contador de
+  venta/venta_flash.py.
+- Una reserva vencida deja de contar sola; `liberar_vencidas` (comando
+  liberar_reservas_stock) solo las marca para mantener chico el índice.
+- Ventas y liberaciones quedan en el libro de inventario (producto/inventario.py).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from producto.models import ProductoModel
+from producto.inventario import movimiento, registrar_movimientos
+from .models import ReservaStockModel
+from .venta_flash import ventas_activas, disponibles
+
+MINUTOS_CARRITO = getattr(settings, 'RESERVA_STOCK_MINUTOS_CARRITO', 15)
+MINUTOS_PAGO = getattr(settings, 'RESERVA_STOCK_MINUTOS_PAGO', 30)
+
+
+class StockInsuficiente(Exception):
+    def __init__(self, producto, disponible, solicitado):
+        super().__init__(
+            f"Stock insuficiente para '{producto.nombre}'. Disponible: {disponible}, solicitado: {solicitado}"
+        )
+        self.producto = producto
+        self.disponible = disponible
+
+
+def _activas(ahora=None):
+    return ReservaStockModel.objects.filter(estado='activa', vence__gt=ahora or timezone.now())
+
+
+def reservado_por_otros(producto_ids, carrito_id=None):
+    """{producto_id: cantidad reservada} sin contar las reservas de `carrito_id`."""
+    reservas = _activas().filter(producto_id__in=producto_ids)
+    if carrito_id is not None:
+        reservas = reservas.exclude(carrito_id=carrito_id)
+    return dict(reservas.values('producto_id').annotate(total=Sum('cantidad')).values_list('producto_id', 'total'))
+
+
+def stock_disponible(productos, carrito_id=None):
+    """{producto_id: disponible} para una lista de productos ya cargados."""
+    reservado = reservado_por_otros([p.id for p in productos], carrito_id)
+    return {p.id: max(0, (p.stock or 0) - reservado.get(p.id, 0)) for p in productos}
+
+
+def bloquear_productos(producto_ids):
+    """Bloquea los productos (en orden de id, para no generar deadlocks) y los devuelve por id."""
+    return {
+        p.id: p for p in ProductoModel.objects.select_for_update().filter(id__in=producto_ids).order_by('id')
+    }
+
+
+def _guardar_reservas(carrito, cantidades, minutos):
+    """Deja la reserva activa de cada producto del carrito con la cantidad pedida (0 = liberar)."""
+    vence = timezone.now() + timedelta(minutes=minutos)
+    existentes = {r.producto_id: r for r in ReservaStockModel.objects.filter(
+        carrito=carrito, producto_id__in=cantidades, estado='activa'
+    )}
+    nuevas = []
+    for producto_id, cantidad in cantidades.items():
+        reserva = existentes.get(producto_id)
+        if cantidad <= 0:
+            if reserva:
+                ReservaStockModel.objects.filter(pk=reserva.pk).update(estado='liberada')
+        elif reserva:
+            ReservaStockModel.objects.filter(pk=reserva.pk).update(cantidad=cantidad, vence=vence)
+        else:
+            nuevas.append(ReservaStockModel(carrito=carrito, producto_id=producto_id, cantidad=cantidad, vence=vence))
+    if nuevas:
+        ReservaStockModel.objects.bulk_create(nuevas)
+
+
+def reservar(carrito, cantidades, minutos=MINUTOS_CARRITO):
+    """
+    cantidades: {producto_id: cantidad total de la línea en el carrito}.
+    Lanza StockInsuficiente (sin reservar nada) si algún producto no alcanza.
+    """
+    # Productos en venta flash: se mira el contador de la caché, sin bloquear la fila ni reservar
+    cantidades = dict(cantidades)
+    activas = ventas_activas()
+    for producto_id in [producto_id for producto_id in cantidades if producto_id in activas]:
+        cantidad = cantidades.pop(producto_id)
+        libres = disponibles(activas[producto_id])
+        if cantidad > libres:
+            raise StockInsuficiente(ProductoModel.objects.only('nombre').get(pk=producto_id), libres, cantidad)
+    if not cantidades:
+        return
+
+    with transaction.atomic():
+        productos = bloquear_productos(list(cantidades))
+        disponible = stock_disponible(productos.values(), carrito.id)
+        for producto_id, cantidad in cantidades.items():
+            producto = productos.get(producto_id)
+            if producto and cantidad > disponible[producto_id]:
+                raise StockInsuficiente(producto, disponible[producto_id], cantidad)
+        _guardar_reservas(carrito, cantidades, minutos)
+
+
+def reservar_carrito(carrito, minutos=MINUTOS_PAGO):
+    """Renueva las reservas de todas las líneas del carrito (al iniciar el pago)."""
+    cantidades = dict(carrito.carrito_detalles.values_list('producto_id', 'cantidad'))
+    reservar(carrito, cantidades, minutos)
+
+
+def ajustar_reserva(carrito, producto_id, cantidad, minutos=MINUTOS_CARRITO):
+    """Baja la reserva de una línea (0 = liberarla) sin volver a verificar stock."""
+    with transaction.atomic():
+        _guardar_reservas(carrito, {producto_id: cantidad}, minutos)
+
+
+def _registrar_liberaciones(filas, referencia):
+    """filas: [(producto_id, cantidad)] de reservas liberadas → un movimiento por producto."""
+    liberado = {}
+    for producto_id, cantidad in filas:
+        liberado[producto_id] = liberado.get(producto_id, 0) + cantidad
+    if not liberado:
+        return
+    stocks = dict(ProductoModel.objects.filter(id__in=liberado).values_list('id', 'stock'))
+    registrar_movimientos([
+        movimiento(producto_id, 'liberacion_reserva', cantidad, stocks.get(producto_id) or 0, referencia)
+        for producto_id, cantidad in liberado.items()
+    ])
+
+
+def liberar_carrito(carrito, producto_ids=None):
+    with transaction.atomic():
+        reservas = ReservaStockModel.objects.select_for_update().filter(carrito=carrito, estado='activa')
+        if producto_ids is not None:
+            reservas = reservas.filter(producto_id__in=producto_ids)
+        filas = list(reservas.values_list('id', 'producto_id', 'cantidad'))
+        ReservaStockModel.objects.filter(id__in=[fila[0] for fila in filas]).update(estado='liberada')
+        _registrar_liberaciones([fila[1:] for fila in filas], f"carrito:{carrito.id}")
+    return len(filas)
+
+
+def convertir_reservas(carrito, cantidades, productos, referencia=None, usuario=None):
+    """
+    Descuenta el stock del pedido, cierra las reservas del carrito y agrega los
+    movimientos de venta al libro de inventario (un solo INSERT).
+    Debe llamarse dentro de la transacción del pedido, con `productos` ya bloqueados
+    (bloquear_productos) y la disponibilidad verificada.
+    """
+    for producto_id, cantidad in cantidades.items():
+        ProductoModel.objects.filter(pk=producto_id).update(stock=F('stock') - cantidad)
+        productos[producto_id].stock -= cantidad
+    ReservaStockModel.objects.filter(carrito=carrito, estado='activa').update(estado='convertida')
+    registrar_movimientos([
+        movimiento(producto_id, 'venta', -cantidad, productos[producto_id].stock, referencia, usuario)
+        for producto_id, cantidad in cantidades.items()
+    ])
+
+
+def liberar_vencidas(tamano_lote=5000):
+    """Marca 'vencida' las reservas activas ya vencidas, por lotes. Devuelve cuántas."""
+    ahora = timezone.now()
+    total = 0
+    while True:
+        with transaction.atomic():
+            # skip_locked: una reserva que se está renovando en este momento queda para la próxima pasada
+            filas = list(
+                ReservaStockModel.objects.select_for_update(skip_locked=True)
+                .filter(estado='activa', vence__lte=ahora)
+                .values_list('id', 'producto_id', 'cantidad')[:tamano_lote]
+            )
+            if not filas:
+                return total
+            ReservaStockModel.objects.filter(id__in=[fila[0] for fila in filas]).update(estado='vencida')
+            _registrar_liberaciones([fila[1:] for fila in filas], "reservas_vencidas")
+        total += len(filas)
@@ -1,4 +1,4 @@
-from .models import CarritoModel, DetalleCarritoModel, FormaPagoModel, PedidoModel, DetallePedidoModel
+from .models import CarritoModel, DetalleCarritoModel, FormaPagoModel, PedidoModel, DetallePedidoModel, VentaFlashModel
 from rest_framework import serializers
 class CarritoSerializer(serializers.ModelSerializer):
     class Meta:
@@ -29,3 +29,20 @@ class DetallePedidoSerializer(serializers.ModelSerializer):
         model = DetallePedidoModel
         fields = ['id', 'pedido', 'producto', 'cantidad', 'precio_unitario']
         read_only_fields = ['id']
+
+class VentaFlashSerializer(serializers.ModelSerializer):
+    producto_nombre = serializers.CharField(source='producto.nombre', read_only=True)
+
+    class Meta:
+        model = VentaFlashModel
+        fields = ['id', 'producto', 'producto_nombre', 'unidades', 'unidades_aplicadas', 'inicio', 'fin', 'is_active']
+        read_only_fields = ['id', 'unidades_aplicadas', 'is_active']
+
+    def validate(self, data):
+        if data['fin'] <= data['inicio']:
+            raise serializers.ValidationError("La fecha de fin debe ser posterior a la de inicio")
+        if data['unidades'] > (data['producto'].stock or 0):
+            raise serializers.ValidationError("Las unidades de la venta flash superan el stock del producto")
+        if VentaFlashModel.objects.filter(producto=data['producto'], is_active=True).exists():
+            raise serializers.ValidationError("El producto ya tiene una venta flash activa")
+        return data
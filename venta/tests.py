@@ -1,3 +1,136 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import json
+import time
+import uuid
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.test import RequestFactory, TestCase, override_settings
+
+from producto.models import ProductoModel
+from usuario.models import Grupo, Usuario
+from venta import eventos_stripe
+from venta.checkout import crear_pedido_desde_carrito
+from venta.models import CarritoModel, DetalleCarritoModel, EventoStripeModel, FormaPagoModel, PedidoModel
+from venta.views_stripe import webhook_stripe
+
+SECRETO = "whsec_pruebas"
+
+
+def _firmar(payload, secreto):
+    """Cabecera Stripe-Signature (t=...,v1=...) igual a la que envía Stripe."""
+    marca = int(time.time())
+    firma = hmac.new(secreto.encode(), f"{marca}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return f"t={marca},v1={firma}"
+
+
+def _evento_checkout(metadata):
+    return {
+        "id": f"evt_test_{uuid.uuid4().hex[:20]}",
+        "object": "event",
+        "type": "checkout.session.completed",
+        "data": {"object": {
+            "id": f"cs_test_{uuid.uuid4().hex[:20]}",
+            "object": "checkout.session",
+            "payment_status": "paid",
+            "status": "complete",
+            "metadata": metadata,
+        }},
+    }
+
+
+# --------------------------
+# Webhook de Stripe + worker de eventos
+# --------------------------
+@override_settings(STRIPE_WEBHOOK_SECRET=SECRETO)
+class WebhookStripeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        grupo = Grupo.objects.create(nombre="cliente")
+        cls.usuario = Usuario.objects.create_user(
+            username="cliente_webhook", password="Clave#12345", email="cliente@ejemplo.com", grupo=grupo,
+        )
+        cls.forma_pago = FormaPagoModel.objects.create(nombre="Tarjeta de crédito")
+        cls.producto = ProductoModel.objects.create(
+            nombre="Heladera de prueba", precio_contado=Decimal('100.00'), precio_cuota=Decimal('120.00'), stock=10,
+        )
+
+    def setUp(self):
+        # El procesamiento se prueba llamando al worker, no en el hilo del webhook
+        parche = mock.patch.object(eventos_stripe, 'PROCESAR_AL_RECIBIR', False)
+        parche.start()
+        self.addCleanup(parche.stop)
+        # La bitácora cifrada necesita LOG_DEV_KEY y escribe en secure_logs/
+        parche = mock.patch('venta.checkout.registrar_accion')
+        self.registrar_accion = parche.start()
+        self.addCleanup(parche.stop)
+
+        self.carrito = CarritoModel.objects.create(usuario=self.usuario)
+        DetalleCarritoModel.objects.create(
+            carrito=self.carrito, producto=self.producto, cantidad=2,
+            precio_unitario=Decimal('100.00'), subtotal=Decimal('200.00'),
+        )
+        self.fabrica = RequestFactory()
+
+    def _metadata(self):
+        return {
+            'carrito_id': str(self.carrito.id),
+            'usuario_id': str(self.usuario.id),
+            'forma_pago_id': str(self.forma_pago.id),
+        }
+
+    def _entregar(self, evento, secreto=SECRETO):
+        payload = json.dumps(evento)
+        request = self.fabrica.post(
+            '/venta/stripe/webhook', data=payload, content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=_firmar(payload, secreto),
+        )
+        return webhook_stripe(request)
+
+    def test_entrega_duplicada_genera_un_solo_pedido(self):
+        evento = _evento_checkout(self._metadata())
+        # Stripe reentrega el evento cuando no recibe respuesta a tiempo
+        self.assertEqual(self._entregar(evento).status_code, 200)
+        self.assertEqual(self._entregar(evento).status_code, 200)
+        self.assertEqual(EventoStripeModel.objects.filter(stripe_event_id=evento['id']).count(), 1)
+
+        self.assertEqual(eventos_stripe.procesar_pendientes(), {'procesado': 1})
+        self.assertEqual(eventos_stripe.procesar_pendientes(), {})
+
+        sesion_id = evento['data']['object']['id']
+        pedido = PedidoModel.objects.get(carrito=self.carrito)
+        self.assertEqual(pedido.stripe_session_id, sesion_id)
+        self.assertEqual(pedido.total, Decimal('200.00'))
+        self.carrito.refresh_from_db()
+        self.assertFalse(self.carrito.is_active)
+
+    def test_firma_invalida_se_rechaza(self):
+        evento = _evento_checkout(self._metadata())
+        self.assertEqual(self._entregar(evento, secreto="otro_secreto").status_code, 400)
+        self.assertFalse(EventoStripeModel.objects.filter(stripe_event_id=evento['id']).exists())
+
+    def test_metadata_faltante_queda_descartado(self):
+        evento = _evento_checkout({})
+        self.assertEqual(self._entregar(evento).status_code, 200)
+
+        self.assertEqual(eventos_stripe.procesar_pendientes(), {'descartado': 1})
+        guardado = EventoStripeModel.objects.get(stripe_event_id=evento['id'])
+        self.assertEqual(guardado.estado, 'descartado')
+        self.assertIn("Metadata incompleta", guardado.ultimo_error)
+        self.assertFalse(PedidoModel.objects.filter(carrito=self.carrito).exists())
+
+    def test_carrito_ya_convertido_solo_enlaza_la_sesion(self):
+        # El cliente confirmó el pedido desde el frontend antes de que llegara el webhook
+        pedido, _ = crear_pedido_desde_carrito(self.usuario, self.carrito, self.forma_pago)
+        self.assertIsNone(pedido.stripe_session_id)
+
+        evento = _evento_checkout(self._metadata())
+        self.assertEqual(self._entregar(evento).status_code, 200)
+        self.assertEqual(eventos_stripe.procesar_pendientes(), {'procesado': 1})
+
+        self.assertEqual(PedidoModel.objects.filter(carrito=self.carrito).count(), 1)
+        pedido.refresh_from_db()
+        self.assertEqual(pedido.stripe_session_id, evento['data']['object']['id'])
+        guardado = EventoStripeModel.objects.get(stripe_event_id=evento['id'])
+        self.assertEqual(guardado.pedido_id, pedido.id)
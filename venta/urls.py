@@ -3,6 +3,7 @@ from django.urls import path
 # from rest_framework_simplejwt.views import TokenRefreshView
 from . import views
 from . import views_stripe
+from . import views_async
 urlpatterns = [
 # CRUD CARRITO_COMPRA
     path('agregar_producto_carrito', views.agregar_producto_carrito, name='agregar_producto_carrito'),
@@ -34,6 +35,18 @@ urlpatterns = [
     path('stripe/webhook', views_stripe.webhook_stripe, name='webhook_stripe'),
     path('stripe/verificar-pago/<str:session_id>', views_stripe.verificar_pago_stripe, name='verificar_pago_stripe'),
     path('stripe/crear-payment-intent', views_stripe.crear_payment_intent_stripe, name='crear-payment-intent'),
+    # STRIPE (async, pensado para correr bajo ASGI)
+    path('async/stripe/crear-sesion', views_async.crear_sesion_pago_stripe_async, name='crear_sesion_stripe_async'),
+    path('async/stripe/verificar-pago/<str:session_id>', views_async.verificar_pago_stripe_async, name='verificar_pago_stripe_async'),
+    path('async/stripe/crear-payment-intent', views_async.crear_payment_intent_stripe_async, name='crear-payment-intent-async'),
 
     path('listar_plan_pagos_pedido/<int:pedido_id>', views.listar_plan_pagos_pedido, name='listar_plan_pagos_pedido'),
+    path('simular_cuotas_carrito', views.simular_cuotas_carrito, name='simular_cuotas_carrito'),
+    path('antiguedad_cartera', views.antiguedad_cartera, name='antiguedad_cartera'),
+    path('conciliar_pagos', views.conciliar_pagos_archivo, name='conciliar_pagos'),
+
+# VENTAS FLASH
+    path('crear_venta_flash', views.crear_venta_flash, name='crear_venta_flash'),
+    path('listar_ventas_flash', views.listar_ventas_flash, name='listar_ventas_flash'),
+    path('finalizar_venta_flash/<int:venta_id>', views.finalizar_venta_flash, name='finalizar_venta_flash'),
 ]
\ No newline at end of file
@@ -0,0 +1,237 @@
+# venta/venta_flash.py
+"""
+Ventas flash: las unidades de un producto en promoción viven en un contador atómico
+de la caché (Redis con CACHE_REDIS_URL; memoria local del proceso si no).
+
+Con cientos de compras simultáneas la fila del producto sería un cuello de botella
+(todas esperan el SELECT ... FOR UPDATE). En modo flash:
+
+- `tomar_unidades` descuenta del contador con DECR; si queda negativo devuelve lo
+  tomado y la compra se rechaza. No se bloquea la fila del producto.
+- Lo vendido se acumula en un segundo contador ("pendiente") al confirmar el pedido.
+- `reconciliar` aplica los pendientes a la BD por lotes (stock del producto y
+  unidades_aplicadas), en un hilo del propio proceso cada VENTA_FLASH_RECONCILIAR_SEGUNDOS
+  y/o con el comando reconciliar_ventas_flash.
+
+Para tomar lo pendiente se descuenta con DECR lo leído: si el resultado es negativo
+otro reconciliador ya lo tomó y se devuelve, así nada se aplica dos veces.
+
+⚠️ El contador tiene que ser compartido por todos los procesos. Con la memoria local
+(sin CACHE_REDIS_URL) cada worker tendría su propio contador y entre todos venderían
+varias veces las mismas unidades. Por eso sin caché compartida el modo flash está
+apagado (las compras siguen por el bloqueo de fila y no se pueden crear ventas flash),
+salvo que VENTA_FLASH_PERMITIR_CACHE_LOCAL = True lo habilite explícitamente (solo para
+desarrollo con un único proceso; por defecto es False).
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from producto.models import ProductoModel
+from producto.inventario import movimiento, registrar_movimientos
+from .models import VentaFlashModel
+
+logger = logging.getLogger(__name__)
+
+RECONCILIAR_SEGUNDOS = getattr(settings, 'VENTA_FLASH_RECONCILIAR_SEGUNDOS', 2)
+PERMITIR_CACHE_LOCAL = getattr(settings, 'VENTA_FLASH_PERMITIR_CACHE_LOCAL', False)
+TTL_ACTIVAS = 15
+CLAVE_ACTIVAS = "flash:activas"
+
+
+def _clave(venta_id, tipo):
+    return f"flash:{venta_id}:{tipo}"
+
+
+# --------------------------
+# Ventas activas
+# --------------------------
+def habilitadas():
+    """El modo flash solo corre con caché compartida (o permitido explícitamente con la local)."""
+    return getattr(settings, 'CACHE_COMPARTIDA', False) or PERMITIR_CACHE_LOCAL
+
+
+if not habilitadas():
+    logger.error(
+        "Ventas flash DESACTIVADAS: la caché es local a cada proceso y los contadores no serían "
+        "compartidos (configure CACHE_REDIS_URL o VENTA_FLASH_PERMITIR_CACHE_LOCAL)."
+    )
+
+
+def ventas_activas():
+    """{producto_id: venta_id} de las ventas flash en curso (cacheado unos segundos)."""
+    if not habilitadas():
+        return {}
+    activas = cache.get(CLAVE_ACTIVAS)
+    if activas is None:
+        ahora = timezone.now()
+        activas = dict(
+            VentaFlashModel.objects.filter(is_active=True, inicio__lte=ahora, fin__gt=ahora)
+            .values_list('producto_id', 'id')
+        )
+        cache.set(CLAVE_ACTIVAS, activas, TTL_ACTIVAS)
+    return activas
+
+
+def invalidar_activas():
+    cache.delete(CLAVE_ACTIVAS)
+
+
+# --------------------------
+# Contador de unidades
+# --------------------------
+def _inicializar(venta_id):
+    venta = VentaFlashModel.objects.get(pk=venta_id)
+    pendiente = cache.get(_clave(venta_id, 'pendiente')) or 0
+    # add: si otro proceso lo inicializó primero, se respeta su valor
+    cache.add(_clave(venta_id, 'disponibles'), venta.unidades - venta.unidades_aplicadas - pendiente, timeout=None)
+
+
+def disponibles(venta_id):
+    valor = cache.get(_clave(venta_id, 'disponibles'))
+    if valor is None:
+        _inicializar(venta_id)
+        valor = cache.get(_clave(venta_id, 'disponibles'))
+    return max(0, valor or 0)
+
+
+def _decrementar(venta_id, cantidad):
+    clave = _clave(venta_id, 'disponibles')
+    try:
+        return cache.decr(clave, cantidad)
+    except ValueError:
+        _inicializar(venta_id)
+        return cache.decr(clave, cantidad)
+
+
+def devolver_unidades(tomadas):
+    """tomadas: {venta_id: cantidad}. Devuelve al contador unidades de un pedido que no se creó."""
+    for venta_id, cantidad in tomadas.items():
+        try:
+            cache.incr(_clave(venta_id, 'disponibles'), cantidad)
+        except ValueError:
+            pass  # el contador se vuelve a armar desde la BD
+
+
+class UnidadesAgotadas(Exception):
+    def __init__(self, producto_id, disponibles):
+        super().__init__(f"Se agotaron las unidades de la venta flash del producto {producto_id}")
+        self.producto_id = producto_id
+        self.disponibles = disponibles
+
+
+def tomar_unidades(cantidades, activas=None):
+    """
+    cantidades: {producto_id: cantidad} de productos en venta flash.
+    Devuelve {venta_id: cantidad}; lanza UnidadesAgotadas sin dejar nada tomado.
+    """
+    activas = activas if activas is not None else ventas_activas()
+    tomadas = {}
+    for producto_id, cantidad in cantidades.items():
+        venta_id = activas[producto_id]
+        restantes = _decrementar(venta_id, cantidad)
+        tomadas[venta_id] = tomadas.get(venta_id, 0) + cantidad
+        if restantes < 0:
+            devolver_unidades(tomadas)
+            raise UnidadesAgotadas(producto_id, max(0, restantes + cantidad))
+    return tomadas
+
+
+def registrar_vendidas(tomadas):
+    """Se llama al confirmar el pedido: lo tomado queda pendiente de aplicar en la BD."""
+    for venta_id, cantidad in tomadas.items():
+        clave = _clave(venta_id, 'pendiente')
+        cache.add(clave, 0, timeout=None)
+        cache.incr(clave, cantidad)
+    _asegurar_reconciliador()
+
+
+# --------------------------
+# Reconciliación (write-behind)
+# --------------------------
+def reconciliar(venta_ids=None):
+    """Aplica a la BD lo vendido en la caché, en una transacción. Devuelve {venta_id: unidades}."""
+    if venta_ids is None:
+        venta_ids = list(VentaFlashModel.objects.filter(is_active=True).values_list('id', flat=True))
+    claves = {venta_id: _clave(venta_id, 'pendiente') for venta_id in venta_ids}
+    leidos = cache.get_many(list(claves.values()))
+
+    tomados = {}
+    for venta_id, clave in claves.items():
+        cantidad = leidos.get(clave) or 0
+        if cantidad <= 0:
+            continue
+        if cache.decr(clave, cantidad) < 0:
+            cache.incr(clave, cantidad)  # otro reconciliador se adelantó
+            continue
+        tomados[venta_id] = cantidad
+    if not tomados:
+        return {}
+
+    try:
+        with transaction.atomic():
+            productos = dict(VentaFlashModel.objects.filter(id__in=tomados).values_list('id', 'producto_id'))
+            for venta_id, cantidad in tomados.items():
+                VentaFlashModel.objects.filter(pk=venta_id).update(unidades_aplicadas=F('unidades_aplicadas') + cantidad)
+                ProductoModel.objects.filter(pk=productos[venta_id]).update(stock=F('stock') - cantidad)
+            # Las filas ya quedaron bloqueadas por el UPDATE: el stock leído es el resultante
+            stocks = dict(ProductoModel.objects.filter(id__in=productos.values()).values_list('id', 'stock'))
+            registrar_movimientos([
+                movimiento(productos[venta_id], 'venta', -cantidad, stocks[productos[venta_id]], f"venta_flash:{venta_id}")
+                for venta_id, cantidad in tomados.items()
+            ])
+    except Exception:
+        for venta_id, cantidad in tomados.items():
+            cache.incr(claves[venta_id], cantidad)
+        raise
+    return tomados
+
+
+def resincronizar(venta_id):
+    """Rearma el contador desde la BD (por ejemplo, después de reiniciar la caché)."""
+    reconciliar([venta_id])
+    cache.delete(_clave(venta_id, 'disponibles'))
+    return disponibles(venta_id)
+
+
+def finalizar(venta):
+    """Aplica lo pendiente, desactiva la venta y borra sus contadores."""
+    reconciliar([venta.id])
+    VentaFlashModel.objects.filter(pk=venta.pk).update(is_active=False)
+    cache.delete_many([_clave(venta.id, 'disponibles'), _clave(venta.id, 'pendiente')])
+    invalidar_activas()
+
+
+_reconciliador = None
+_reconciliador_lock = threading.Lock()
+
+
+def _bucle_reconciliador():
+    while True:
+        time.sleep(RECONCILIAR_SEGUNDOS)
+        try:
+            reconciliar()
+        except Exception as e:
+            logger.error("Error reconciliando ventas flash: %s", e)
+        finally:
+            close_old_connections()
+
+
+def _asegurar_reconciliador():
+    """Arranca (una vez por proceso) el hilo que aplica los pendientes a la BD."""
+    global _reconciliador
+    if _reconciliador is not None or RECONCILIAR_SEGUNDOS <= 0:
+        return
+    with _reconciliador_lock:
+        if _reconciliador is None:
+            _reconciliador = threading.Thread(
+                target=_bucle_reconciliador,
+                name="reconciliador-ventas-flash", daemon=True,
+            )
+            _reconciliador.start()
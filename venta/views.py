@@ -7,14 +7,22 @@ from comercio.permissions import requiere_permiso
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
 from rest_framework.views import APIView 
 # from .serializers import 
 from producto.models import ProductoModel
-from .models import CarritoModel, DetalleCarritoModel, FormaPagoModel, PedidoModel, DetallePedidoModel, PlanPagoModel
-from .serializers import CarritoSerializer, DetalleCarritoSerializer, FormaPagoSerializer, PedidoSerializer, DetallePedidoSerializer
+from .models import CarritoModel, DetalleCarritoModel, FormaPagoModel, PedidoModel, DetallePedidoModel, PlanPagoModel, VentaFlashModel
+from .serializers import CarritoSerializer, DetalleCarritoSerializer, FormaPagoSerializer, PedidoSerializer, DetallePedidoSerializer, VentaFlashSerializer
 from django.core.paginator import Paginator, EmptyPage
 from django.db.models import Q
 from utils.encrypted_logger import registrar_accion 
+from .checkout import crear_pedido_desde_carrito, ErrorCheckout
+from .reservas import reservar, ajustar_reserva, liberar_carrito, stock_disponible, StockInsuficiente
+from . import venta_flash
+from .cuotas import MESES_CREDITO_VALIDOS, simular
+from . import cobranzas
+from .conciliacion import conciliar_pagos
+from producto.importacion import leer_filas
 
 # Create your views here.
 
@@ -37,15 +45,6 @@ def agregar_producto_carrito(request):
     producto = get_object_or_404(ProductoModel, id=producto_id)
     precio_unitario = Decimal(producto.precio_contado)
 
-    # Verificar stock
-    if cantidad > producto.stock:
-        return Response({
-            "status": 0,
-            "error": 1,
-            "message": "Cantidad solicitada excede el stock disponible",
-            "values": {}
-        })
-
     # Obtener o crear carrito
     carrito, created = CarritoModel.objects.get_or_create(usuario=usuario, is_active=True)
 
@@ -58,14 +57,18 @@ def agregar_producto_carrito(request):
         producto=producto
     ).first()
 
+    # Verificar stock disponible (stock menos lo reservado por otros carritos) y reservar la línea
+    try:
+        reservar(carrito, {producto.id: cantidad + (detalle_carrito.cantidad if detalle_carrito else 0)})
+    except StockInsuficiente as e:
+        return Response({
+            "status": 0,
+            "error": 1,
+            "message": "Cantidad solicitada excede el stock disponible",
+            "values": {"disponible": e.disponible}
+        })
+
     if detalle_carrito:
-        if producto.stock < detalle_carrito.cantidad + cantidad:
-            return Response({
-                "status": 0,
-                "error": 1,
-                "message": "Cantidad solicitada excede el stock disponible",
-                "values": {}
-            })
         # Actualizar cantidad y subtotal
         detalle_carrito.cantidad += cantidad
         detalle_carrito.subtotal += subtotal
@@ -121,8 +124,9 @@ def vaciar_carrito(request):
     # Obtener todos los detalles del carrito
     detalles_carrito = DetalleCarritoModel.objects.filter(carrito=carrito)
 
-    # Eliminar todos los detalles
+    # Eliminar todos los detalles y liberar el stock reservado
     detalles_carrito.delete()
+    liberar_carrito(carrito)
 
     # Reiniciar el total del carrito
     carrito.total = 0
@@ -227,6 +231,9 @@ def eliminar_producto_carrito(request):
 
         print(f"🔧 Eliminando {cantidad_eliminada} unidades de {detalle.cantidad + cantidad_eliminada} totales")
 
+        # Ajustar la reserva a lo que queda en el carrito
+        ajustar_reserva(carrito, producto_id, cantidad_restante)
+
         # Actualizar total del carrito
         carrito.total = max(0, carrito.total - subtotal_a_restar)
         carrito.save()
@@ -262,6 +269,23 @@ def generar_pedido(request):
     meses_credito = request.data.get('meses_credito', None)
 
     try:
+        # 0️⃣ Pago con Stripe: si el webhook ya generó el pedido de esta sesión, devolverlo
+        session_id = request.data.get('session_id')
+        if session_id:
+            pedido = PedidoModel.objects.filter(stripe_session_id=session_id, usuario=usuario).select_related('forma_pago').first()
+            if pedido:
+                return Response({
+                    "status": 1,
+                    "error": 0,
+                    "message": "Pedido con tarjeta procesado exitosamente",
+                    "values": {
+                        "pedido_id": pedido.id,
+                        "estado": pedido.estado,
+                        "total": float(pedido.total),
+                        "forma_pago": pedido.forma_pago.nombre
+                    }
+                })
+
         # 1️⃣ Verificar carrito activo
         carrito = CarritoModel.objects.filter(usuario=usuario, is_active=True).first()
         if not carrito or not carrito.carrito_detalles.exists():
@@ -293,7 +317,7 @@ def generar_pedido(request):
                 }, status=400)
             try:
                 meses_credito = int(meses_credito)
-                if meses_credito not in [6, 12, 18, 24]:
+                if meses_credito not in MESES_CREDITO_VALIDOS:
                     return Response({
                         "status": 0,
                         "error": 1,
@@ -308,141 +332,18 @@ def generar_pedido(request):
                     "values": {}
                 }, status=400)
 
-        # 4️⃣ Iniciar transacción atómica
-        with transaction.atomic():
-            total_pedido = 0
-            fecha_actual = datetime.datetime.now()
-
-            # 5️⃣ Verificar stock y precios antes de crear pedido
-            productos_verificados = []
-            for detalle in carrito.carrito_detalles.select_related("producto"):
-                producto = detalle.producto
-                
-                # Verificar stock
-                if detalle.cantidad > producto.stock:
-                    return Response({
-                        "status": 0,
-                        "error": 1,
-                        "message": f"Stock insuficiente para '{producto.nombre}'. Disponible: {producto.stock}, solicitado: {detalle.cantidad}",
-                        "values": {}
-                    }, status=400)
-                
-                # Verificar que el producto esté activo
-                if not producto.is_active:
-                    return Response({
-                        "status": 0,
-                        "error": 1,
-                        "message": f"El producto '{producto.nombre}' no está disponible",
-                        "values": {}
-                    }, status=400)
-
-                # Determinar precio según forma de pago
-                if forma_pago.nombre.lower() == "credito":
-                    precio_unitario = producto.precio_cuota
-                    if not precio_unitario or precio_unitario <= 0:
-                        return Response({
-                            "status": 0,
-                            "error": 1,
-                            "message": f"El producto '{producto.nombre}' no tiene precio a crédito configurado",
-                            "values": {}
-                        }, status=400)
-                else:
-                    precio_unitario = producto.precio_contado
-                    if not precio_unitario or precio_unitario <= 0:
-                        return Response({
-                            "status": 0,
-                            "error": 1,
-                            "message": f"El producto '{producto.nombre}' no tiene precio contado configurado",
-                            "values": {}
-                        }, status=400)
-
-                subtotal = precio_unitario * detalle.cantidad
-                total_pedido += subtotal
-                
-                productos_verificados.append({
-                    'producto': producto,
-                    'detalle': detalle,
-                    'precio_unitario': precio_unitario,
-                    'subtotal': subtotal
-                })
-
-            # 6️⃣ Determinar estado del pedido según forma de pago
-            if forma_pago.nombre.lower() in ["tarjeta de débito", "tarjeta de crédito","tarjeta"]:
-                estado_pedido = 'confirmado'  # Pagos con tarjeta se confirman inmediatamente
-            elif forma_pago.nombre.lower() == "credito":
-                estado_pedido = 'pendiente'   # Crédito requiere aprobación
-            else:
-                estado_pedido = 'pendiente'   # Otros métodos pendientes de pago
-
-            # 7️⃣ Crear el pedido
-            pedido = PedidoModel.objects.create(
-                usuario=usuario,
-                carrito=carrito,
-                forma_pago=forma_pago,
-                total=total_pedido,
-                estado=estado_pedido
+        # 4️⃣ Crear pedido, detalles, plan de pagos y desactivar carrito (venta/checkout.py)
+        try:
+            pedido, mensaje = crear_pedido_desde_carrito(
+                usuario, carrito, forma_pago, meses_credito, ip=request.META.get('REMOTE_ADDR')
             )
-
-            # 8️⃣ Crear detalles del pedido y actualizar stock
-            for item in productos_verificados:
-                producto = item['producto']
-                detalle = item['detalle']
-                
-                DetallePedidoModel.objects.create(
-                    pedido=pedido,
-                    producto=producto,
-                    cantidad=detalle.cantidad,
-                    precio_unitario=item['precio_unitario'],
-                    subtotal=item['subtotal']
-                )
-
-                # Actualizar stock SOLO si el pedido está confirmado
-                if estado_pedido == 'confirmado':
-                    producto.stock -= detalle.cantidad
-                    producto.save()
-
-            # 9️⃣ Crear plan de pagos según forma de pago
-            if forma_pago.nombre.lower() == "credito":
-                monto_mensual = total_pedido / meses_credito
-                
-                for i in range(meses_credito):
-                    fecha_vencimiento = fecha_actual + relativedelta(months=i + 1)
-                    PlanPagoModel.objects.create(
-                        pedido=pedido,
-                        numero_cuota=i + 1,
-                        monto=monto_mensual,
-                        fecha_vencimiento=fecha_vencimiento,
-                        estado='pendiente'
-                    )
-                registrar_accion(usuario, "Pedido a crédito creado", request.META.get('REMOTE_ADDR'))
-                mensaje = f"Pedido a crédito creado exitosamente. {meses_credito} cuotas de {monto_mensual:.2f} Bs"
-                
-            elif forma_pago.nombre.lower() in ["tarjeta de débito", "tarjeta de crédito","tarjeta"]:
-                # Para tarjetas, crear un solo pago inmediato
-                PlanPagoModel.objects.create(
-                    pedido=pedido,
-                    numero_cuota=1,
-                    monto=total_pedido,
-                    fecha_vencimiento=fecha_actual + relativedelta(days=1),
-                    estado='pagado'  # Asumimos pago inmediato con tarjeta
-                )
-                registrar_accion(usuario, "Pedido con tarjeta procesado", request.META.get('REMOTE_ADDR'))
-                mensaje = "Pedido con tarjeta procesado exitosamente"
-                
-            else:
-                # Para otros métodos, crear pago pendiente
-                PlanPagoModel.objects.create(
-                    pedido=pedido,
-                    numero_cuota=1,
-                    monto=total_pedido,
-                    fecha_vencimiento=fecha_actual + relativedelta(days=3),  # 3 días para pagar
-                    estado='pendiente'
-                )
-                mensaje = "Pedido creado exitosamente. Complete el pago en 3 días"
-
-            # 🔟 Desactivar carrito
-            carrito.is_active = False
-            carrito.save()
+        except ErrorCheckout as e:
+            return Response({
+                "status": 0,
+                "error": 1,
+                "message": str(e),
+                "values": {}
+            }, status=400)
 
         # ✅ Si todo fue bien
         return Response({
@@ -451,8 +352,8 @@ def generar_pedido(request):
             "message": mensaje,
             "values": {
                 "pedido_id": pedido.id,
-                "estado": estado_pedido,
-                "total": float(total_pedido),
+                "estado": pedido.estado,
+                "total": float(pedido.total),
                 "forma_pago": forma_pago.nombre
             }
         })
@@ -487,7 +388,8 @@ def obtener_mi_carrito(request):
         mensaje = "Carrito obtenido correctamente"
 
     # 2️⃣ Obtener detalles del carrito
-    detalles = carrito.carrito_detalles.select_related('producto').all()
+    detalles = list(carrito.carrito_detalles.select_related('producto').all())
+    disponible = stock_disponible([detalle.producto for detalle in detalles], carrito.id)
     productos = []
     for detalle in detalles:
         productos.append({
@@ -497,6 +399,7 @@ def obtener_mi_carrito(request):
             "precio_unitario": detalle.precio_unitario,
             "subtotal": detalle.subtotal,
             "stock": detalle.producto.stock,
+            "stock_disponible": disponible[detalle.producto.id],
         })
 
     # 3️⃣ Devolver respuesta
@@ -840,4 +743,196 @@ def listar_plan_pagos_pedido(request, pedido_id):
         "error": 0,
         "message": "Plan de pagos obtenido correctamente",
         "values": {"plan_pagos": resultado}
-    })
\ No newline at end of file
+    })
+
+@swagger_auto_schema(method="get", operation_description="Simula las cuotas del carrito activo para todos los plazos de crédito")
+@api_view(['GET'])
+def simular_cuotas_carrito(request):
+    """Planes de 6/12/18/24 meses del carrito con el precio a crédito, sin crear el pedido"""
+    carrito = CarritoModel.objects.filter(usuario=request.user, is_active=True).first()
+    detalles = list(carrito.carrito_detalles.select_related('producto')) if carrito else []
+    if not detalles:
+        return Response({
+            "status": 0,
+            "error": 1,
+            "message": "El carrito está vacío o no existe",
+            "values": {}
+        }, status=400)
+
+    sin_precio = [d.producto.nombre for d in detalles if not d.producto.precio_cuota or d.producto.precio_cuota <= 0]
+    if sin_precio:
+        return Response({
+            "status": 0,
+            "error": 1,
+            "message": f"Productos sin precio a crédito configurado: {', '.join(sin_precio)}",
+            "values": {}
+        }, status=400)
+
+    total_credito = sum(d.producto.precio_cuota * d.cantidad for d in detalles)
+    total_contado = sum((d.producto.precio_contado or 0) * d.cantidad for d in detalles)
+    planes = simular(total_credito)
+    return Response({
+        "status": 1,
+        "error": 0,
+        "message": "Simulación de cuotas generada correctamente",
+        "values": {
+            "carrito_id": carrito.id,
+            "total_contado": float(total_contado),
+            "total_credito": float(total_credito),
+            "planes": [
+                {
+                    "meses": meses,
+                    "cuota": float(plan["cuota"]),
+                    "ultima_cuota": float(plan["ultima_cuota"]),
+                    "total": float(plan["total"]),
+                    "cuotas": [
+                        {
+                            "numero_cuota": c["numero_cuota"],
+                            "monto": float(c["monto"]),
+                            "fecha_vencimiento": c["fecha_vencimiento"],
+                        }
+                        for c in plan["cuotas"]
+                    ],
+                }
+                for meses, plan in planes.items()
+            ]
+        }
+    })
+
+@swagger_auto_schema(
+    method="get",
+    operation_description="Saldo impago de las cuotas por tramo de atraso y clientes con más deuda vencida",
+    manual_parameters=[
+        openapi.Parameter('limite', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description="Clientes a listar (por defecto 10)"),
+    ]
+)
+@api_view(['GET'])
+@requiere_permiso("Pedido", "leer")
+def antiguedad_cartera(request):
+    try:
+        limite = min(max(int(request.GET.get('limite', 10)), 0), 100)
+    except ValueError:
+        limite = 10
+    return Response({
+        "status": 1,
+        "error": 0,
+        "message": "Antigüedad de cartera obtenida correctamente",
+        "values": cobranzas.antiguedad_cartera(limite_clientes=limite)
+    })
+
+@swagger_auto_schema(
+    method="post",
+    operation_description="Concilia un extracto de pagos (CSV o JSON lines) con las cuotas pendientes",
+    manual_parameters=[
+        openapi.Parameter('archivo', openapi.IN_FORM, type=openapi.TYPE_FILE, required=True,
+                          description="Extracto en CSV o JSON lines (pedido_id, monto, comprobante, numero_cuota, fecha_pago, metodo_pago)"),
+        openapi.Parameter('formato', openapi.IN_FORM, type=openapi.TYPE_STRING, required=False,
+                          description="'csv' o 'jsonl' (por defecto según la extensión)"),
+        openapi.Parameter('metodo_pago', openapi.IN_FORM, type=openapi.TYPE_STRING, required=False,
+                          description="Id o nombre del método de pago para las filas que no lo traen"),
+    ],
+)
+@api_view(['POST'])
+@requiere_permiso("Pedido", "actualizar")
+def conciliar_pagos_archivo(request):
+    archivo = request.FILES.get('archivo')
+    if not archivo:
+        return Response({
+            "status": 0,
+            "error": 1,
+            "message": "Se requiere el archivo del extracto",
+            "values": {}
+        }, status=400)
+
+    try:
+        resultado = conciliar_pagos(
+            leer_filas(archivo, request.data.get('formato')), metodo_pago=request.data.get('metodo_pago')
+        )
+    except ValueError as e:
+        return Response({
+            "status": 0,
+            "error": 1,
+            "message": str(e),
+            "values": {}
+        }, status=400)
+    registrar_accion(request.user, f"Conciliación de pagos: {resultado['conciliados']} pagos", request.META.get('REMOTE_ADDR'))
+    no_conciliados = resultado["no_conciliados"]
+
+    return Response({
+        "status": 1 if not no_conciliados else 0,
+        "error": len(no_conciliados),
+        "message": f"{resultado['conciliados']} de {resultado['procesadas']} pagos conciliados en {resultado['duracion_segundos']}s",
+        "values": resultado
+    }, status=201 if not no_conciliados else 207)
+
+# --------------------------
+# VENTAS FLASH
+# --------------------------
+@swagger_auto_schema(method="post", request_body=VentaFlashSerializer)
+@api_view(['POST'])
+@requiere_permiso("Producto", "actualizar")
+def crear_venta_flash(request):
+    """Pone un producto en venta flash: sus unidades se descuentan de un contador en caché"""
+    if not venta_flash.habilitadas():
+        return Response({
+            "status": 0,
+            "error": 1,
+            "message": "Las ventas flash requieren una caché compartida (CACHE_REDIS_URL)",
+            "values": {}
+        }, status=400)
+    serializer = VentaFlashSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({
+            "status": 0,
+            "error": 1,
+            "message": "Error al crear la venta flash",
+            "values": serializer.errors
+        }, status=400)
+    venta = serializer.save()
+    transaction.on_commit(venta_flash.invalidar_activas)
+    registrar_accion(request.user, f"Venta flash creada para el producto {venta.producto_id}", request.META.get('REMOTE_ADDR'))
+    return Response({
+        "status": 1,
+        "error": 0,
+        "message": "Venta flash creada correctamente",
+        "values": {"venta_flash": serializer.data}
+    })
+
+@api_view(['GET'])
+@requiere_permiso("Producto", "leer")
+def listar_ventas_flash(request):
+    """Ventas flash activas con las unidades que quedan en el contador"""
+    ventas = VentaFlashModel.objects.filter(is_active=True).select_related('producto').order_by('inicio')
+    resultado = []
+    for venta in ventas:
+        datos = VentaFlashSerializer(venta).data
+        datos["disponibles"] = venta_flash.disponibles(venta.id)
+        resultado.append(datos)
+    return Response({
+        "status": 1,
+        "error": 0,
+        "message": "Ventas flash obtenidas correctamente",
+        "values": {"ventas_flash": resultado}
+    })
+
+@api_view(['PATCH'])
+@requiere_permiso("Producto", "actualizar")
+def finalizar_venta_flash(request, venta_id):
+    """Aplica lo vendido pendiente al stock y termina la venta flash"""
+    venta = VentaFlashModel.objects.filter(id=venta_id, is_active=True).first()
+    if not venta:
+        return Response({
+            "status": 0,
+            "error": 1,
+            "message": "Venta flash no encontrada o ya finalizada",
+            "values": {}
+        }, status=404)
+    venta_flash.finalizar(venta)
+    venta.refresh_from_db()
+    registrar_accion(request.user, f"Venta flash {venta.id} finalizada", request.META.get('REMOTE_ADDR'))
+    return Response({
+        "status": 1,
+        "error": 0,
+        "message": "Venta flash finalizada",
+        "values": {"venta_flash": VentaFlashSerializer(venta).data}
+    })
@@ -0,0 +1,85 @@
+# venta/views_async.py
+"""
+Versiones async de los endpoints de Stripe para el modo ASGI (uvicorn comercio.asgi:application).
+
+La llamada a Stripe usa el cliente HTTP async del SDK (`*_async`, httpx), así que
+mientras Stripe responde el worker atiende otros requests. El ORM solo se toca
+dentro de `sync_to_async`.
+"""
+import json
+
+import stripe
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from utils.async_views import requiere_jwt_async, respuesta_json
+from .views_stripe import ErrorPagoStripe, _armar_sesion_checkout, _armar_payment_intent
+from .idempotencia import opciones_stripe
+from .estado_pagos import esperar_estado_async, respuesta
+
+
+def _leer_json(request):
+    try:
+        return json.loads(request.body or b"{}")
+    except json.JSONDecodeError:
+        return {}
+
+
+@csrf_exempt
+@require_POST
+@requiere_jwt_async
+async def crear_sesion_pago_stripe_async(request):
+    """Crear sesión de pago con Stripe (async)"""
+    data = _leer_json(request)
+    try:
+        parametros = await sync_to_async(_armar_sesion_checkout)(request.user, data.get('forma_pago'))
+        session = await stripe.checkout.Session.create_async(**parametros, **opciones_stripe(request))
+        return respuesta_json(1, "Sesión de pago creada", {
+            "sessionId": session.id,
+            "publicKey": settings.STRIPE_PUBLISHABLE_KEY
+        })
+    except ErrorPagoStripe as e:
+        return respuesta_json(0, str(e), http_status=400)
+    except stripe.error.InvalidRequestError as e:
+        print("❌ Error de solicitud Stripe:", str(e))
+        return respuesta_json(0, f"Error en la configuración del pago: {str(e)}", http_status=400)
+    except Exception as e:
+        print("❌ Error general:", str(e))
+        return respuesta_json(0, f"Error interno del servidor: {str(e)}", http_status=500)
+
+
+@csrf_exempt
+@require_POST
+@requiere_jwt_async
+async def crear_payment_intent_stripe_async(request):
+    """Crear Payment Intent para Stripe Elements (async)"""
+    data = _leer_json(request)
+    try:
+        parametros, monto_a_cobrar = await sync_to_async(_armar_payment_intent)(
+            request.user, data.get('forma_pago'), data.get('monto')
+        )
+        intent = await stripe.PaymentIntent.create_async(**parametros, **opciones_stripe(request))
+        return respuesta_json(1, "Payment Intent creado", {
+            "clientSecret": intent.client_secret,
+            "montoProcesado": float(monto_a_cobrar)
+        })
+    except ErrorPagoStripe as e:
+        return respuesta_json(0, str(e), http_status=400)
+    except Exception as e:
+        print("❌ Error:", str(e))
+        return respuesta_json(0, f"Error interno: {str(e)}", http_status=500)
+
+
+@require_GET
+@requiere_jwt_async
+async def verificar_pago_stripe_async(request, session_id):
+    """Verificar estado de un pago (async), con el mismo estado local y long-poll que la versión sync"""
+    try:
+        estado, origen = await esperar_estado_async(
+            session_id, request.GET.get('version'), request.GET.get('esperar')
+        )
+        return respuesta_json(1, "Estado del pago obtenido", respuesta(estado, origen))
+    except stripe.error.StripeError as e:
+        return respuesta_json(0, f"Error al verificar pago: {str(e)}", http_status=400)
@@ -2,13 +2,109 @@ import stripe
 from django.conf import settings
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
+from usuario.models import Usuario
 from .models import CarritoModel, FormaPagoModel
+from .eventos_stripe import registrar_evento
+from .idempotencia import opciones_stripe
+from .reservas import reservar_carrito, StockInsuficiente
+from .estado_pagos import guardar_sesion, esperar_estado, respuesta
 from decimal import Decimal
 import json
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
+if getattr(settings, 'STRIPE_API_BASE', None):
+    # Permite apuntar a un Stripe simulado (pruebas de carga / desarrollo local)
+    stripe.api_base = settings.STRIPE_API_BASE
+
+class ErrorPagoStripe(Exception):
+    """Error de validación del carrito antes de llamar a Stripe (se responde con 400)."""
+
+
+def _armar_sesion_checkout(usuario, forma_pago_id):
+    """Valida carrito y forma de pago y devuelve los parámetros de checkout.Session.create"""
+    # 1️⃣ Verificar carrito activo
+    carrito = CarritoModel.objects.filter(usuario=usuario, is_active=True).first()
+    if not carrito or not carrito.carrito_detalles.exists():
+        raise ErrorPagoStripe("El carrito está vacío")
+
+    # 2️⃣ Verificar forma de pago
+    forma_pago = FormaPagoModel.objects.filter(id=forma_pago_id).first()
+    if not forma_pago or forma_pago.nombre.lower() not in ["tarjeta de débito", "tarjeta de crédito"]:
+        raise ErrorPagoStripe("Forma de pago no válida para Stripe")
+
+    # 3️⃣ Reservar el stock mientras dura la sesión de pago y verificar precios
+    try:
+        reservar_carrito(carrito)
+    except StockInsuficiente as e:
+        raise ErrorPagoStripe(str(e))
+
+    line_items = []
+    metadata_items = []
+    
+    for detalle in carrito.carrito_detalles.select_related("producto"):
+        producto = detalle.producto
+        
+        # Usar precio contado para Stripe
+        precio_unitario = producto.precio_contado
+        if not precio_unitario or precio_unitario <= 0:
+            raise ErrorPagoStripe(f"Precio no configurado para {producto.nombre}")
+
+        # Crear item para Stripe
+        line_items.append({
+            'price_data': {
+                'currency': 'bob',
+                'product_data': {
+                    'name': producto.nombre,
+                    'description': producto.descripcion or f"Modelo: {producto.modelo}",
+                    'metadata': {
+                        'producto_id': producto.id,
+                    }
+                },
+                'unit_amount': int(precio_unitario * 100),  # Convertir a centavos
+            },
+            'quantity': detalle.cantidad,
+        })
+        
+        metadata_items.append(f"{producto.nombre} x{detalle.cantidad}")
+
+    # 4️⃣ Crear URLs válidas
+    # Asegúrate de que FRONTEND_URL tenga el formato correcto (con http:// o https://)
+    frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:5173/')
+    if not frontend_url.startswith(('http://', 'https://')):
+        frontend_url = 'http://' + frontend_url
+    
+    # Asegurar que termine con /
+    if not frontend_url.endswith('/'):
+        frontend_url += '/'
+        
+    success_url = f"{frontend_url}home/pago-exitoso?session_id={{CHECKOUT_SESSION_ID}}"
+    cancel_url = f"{frontend_url}home/carrito"
+
+    print("🔗 Success URL:", success_url)
+    print("🔗 Cancel URL:", cancel_url)
+
+    return dict(
+        payment_method_types=['card'],
+        line_items=line_items,
+        mode='payment',
+        success_url=success_url,
+        cancel_url=cancel_url,
+        customer_email=Usuario.objects.filter(pk=usuario.pk).values_list('email', flat=True).first(),
+        client_reference_id=str(usuario.id),
+        metadata={
+            'usuario_id': str(usuario.id),
+            'carrito_id': str(carrito.id),
+            'forma_pago_id': str(forma_pago_id),
+            'productos': ', '.join(metadata_items)
+        },
+        shipping_address_collection={
+            'allowed_countries': ['BO'],
+        }
+    )
+
 
 @api_view(['POST'])
 def crear_sesion_pago_stripe(request):
@@ -18,106 +114,11 @@ def crear_sesion_pago_stripe(request):
         forma_pago_id = request.data.get('forma_pago')
         
         print("🛒 Creando sesión Stripe para usuario:", usuario.id)
-        
-        # 1️⃣ Verificar carrito activo
-        carrito = CarritoModel.objects.filter(usuario=usuario, is_active=True).first()
-        if not carrito or not carrito.carrito_detalles.exists():
-            return Response({
-                "status": 0,
-                "error": 1,
-                "message": "El carrito está vacío",
-                "values": {}
-            }, status=400)
-
-        # 2️⃣ Verificar forma de pago
-        forma_pago = FormaPagoModel.objects.filter(id=forma_pago_id).first()
-        if not forma_pago or forma_pago.nombre.lower() not in ["tarjeta de débito", "tarjeta de crédito"]:
-            return Response({
-                "status": 0,
-                "error": 1,
-                "message": "Forma de pago no válida para Stripe",
-                "values": {}
-            }, status=400)
-
-        # 3️⃣ Verificar stock y precios
-        line_items = []
-        metadata_items = []
-        
-        for detalle in carrito.carrito_detalles.select_related("producto"):
-            producto = detalle.producto
-            
-            # Verificar stock
-            if detalle.cantidad > producto.stock:
-                return Response({
-                    "status": 0,
-                    "error": 1,
-                    "message": f"Stock insuficiente para {producto.nombre}",
-                    "values": {}
-                }, status=400)
-            
-            # Usar precio contado para Stripe
-            precio_unitario = producto.precio_contado
-            if not precio_unitario or precio_unitario <= 0:
-                return Response({
-                    "status": 0,
-                    "error": 1,
-                    "message": f"Precio no configurado para {producto.nombre}",
-                    "values": {}
-                }, status=400)
-
-            # Crear item para Stripe
-            line_items.append({
-                'price_data': {
-                    'currency': 'bob',
-                    'product_data': {
-                        'name': producto.nombre,
-                        'description': producto.descripcion or f"Modelo: {producto.modelo}",
-                        'metadata': {
-                            'producto_id': producto.id,
-                        }
-                    },
-                    'unit_amount': int(precio_unitario * 100),  # Convertir a centavos
-                },
-                'quantity': detalle.cantidad,
-            })
-            
-            metadata_items.append(f"{producto.nombre} x{detalle.cantidad}")
-
-        # 4️⃣ Crear URLs válidas
-        # Asegúrate de que FRONTEND_URL tenga el formato correcto (con http:// o https://)
-        frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:5173/')
-        if not frontend_url.startswith(('http://', 'https://')):
-            frontend_url = 'http://' + frontend_url
-        
-        # Asegurar que termine con /
-        if not frontend_url.endswith('/'):
-            frontend_url += '/'
-            
-        success_url = f"{frontend_url}home/pago-exitoso?session_id={{CHECKOUT_SESSION_ID}}"
-        cancel_url = f"{frontend_url}home/carrito"
 
-        print("🔗 Success URL:", success_url)
-        print("🔗 Cancel URL:", cancel_url)
+        parametros = _armar_sesion_checkout(usuario, forma_pago_id)
 
         # 5️⃣ Crear sesión de Stripe
-        session = stripe.checkout.Session.create(
-            payment_method_types=['card'],
-            line_items=line_items,
-            mode='payment',
-            success_url=success_url,
-            cancel_url=cancel_url,
-            customer_email=usuario.email,
-            client_reference_id=str(usuario.id),
-            metadata={
-                'usuario_id': str(usuario.id),
-                'carrito_id': str(carrito.id),
-                'forma_pago_id': str(forma_pago_id),
-                'productos': ', '.join(metadata_items)
-            },
-            shipping_address_collection={
-                'allowed_countries': ['BO'],
-            }
-        )
+        session = stripe.checkout.Session.create(**parametros, **opciones_stripe(request))
 
         print("✅ Sesión Stripe creada:", session.id)
 
@@ -131,6 +132,13 @@ def crear_sesion_pago_stripe(request):
             }
         })
 
+    except ErrorPagoStripe as e:
+        return Response({
+            "status": 0,
+            "error": 1,
+            "message": str(e),
+            "values": {}
+        }, status=400)
     except stripe.error.InvalidRequestError as e:
         print("❌ Error de solicitud Stripe:", str(e))
         return Response({
@@ -149,12 +157,17 @@ def crear_sesion_pago_stripe(request):
         }, status=500)
 
 @api_view(['POST'])
+@authentication_classes([])
+@permission_classes([AllowAny])
 @csrf_exempt
 def webhook_stripe(request):
-    """Webhook para recibir notificaciones de Stripe"""
+    """
+    Webhook para recibir notificaciones de Stripe.
+    Solo verifica la firma y guarda el evento (una vez por event.id); el pedido se genera
+    en venta/eventos_stripe.py, así Stripe recibe 200 enseguida y los fallos se reintentan.
+    """
     payload = request.body
-    sig_header = request.META['HTTP_STRIPE_SIGNATURE']
-    event = None
+    sig_header = request.META.get('HTTP_STRIPE_SIGNATURE', '')
 
     try:
         event = stripe.Webhook.construct_event(
@@ -167,39 +180,33 @@ def webhook_stripe(request):
         # Invalid signature
         return Response({"error": str(e)}, status=400)
 
-    # Manejar el evento
-    if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-        print("💰 Pago completado:", session.id)
-        
-        # Aquí puedes procesar el pedido automáticamente
-        # usuario_id = session.metadata.get('usuario_id')
-        # carrito_id = session.metadata.get('carrito_id')
-        # ... procesar pedido ...
-
-    elif event['type'] == 'checkout.session.expired':
-        session = event['data']['object']
-        print("❌ Sesión expirada:", session.id)
+    datos = json.loads(payload)  # payload ya verificado
+    nuevo = registrar_evento(datos)
+    if datos['type'].startswith('checkout.session.'):
+        # El polling de verificar_pago_stripe se responde con este estado sin llamar a Stripe
+        guardar_sesion(datos['data']['object'])
+    print("📥 Evento Stripe recibido:", event['id'], event['type'], "" if nuevo else "(repetido)")
 
     return Response({"status": "success"})
 
 @api_view(['GET'])
 def verificar_pago_stripe(request, session_id):
-    """Verificar estado de un pago en Stripe"""
+    """
+    Verificar estado de un pago en Stripe.
+    Responde desde el estado local (venta/estado_pagos.py). Con ?version=<última vista>&esperar=<segundos>
+    espera hasta que el estado cambie (long-poll), como mucho STRIPE_ESTADO_PAGO_ESPERA_MAXIMA_SYNC
+    segundos (por defecto no espera); el long-poll completo es el de la versión async, que no ocupa un hilo.
+    """
     try:
-        session = stripe.checkout.Session.retrieve(session_id)
-        
+        estado, origen = esperar_estado(
+            session_id, request.query_params.get('version'), request.query_params.get('esperar')
+        )
+
         return Response({
             "status": 1,
             "error": 0,
             "message": "Estado del pago obtenido",
-            "values": {
-                "payment_status": session.payment_status,
-                "status": session.status,
-                "customer_email": session.customer_details.get('email'),
-                "amount_total": session.amount_total / 100,  # Convertir a Bs
-                "metadata": session.metadata
-            }
+            "values": respuesta(estado, origen)
         })
         
     except stripe.error.StripeError as e:
@@ -210,6 +217,46 @@ def verificar_pago_stripe(request, session_id):
             "values": {}
         }, status=400)
 
+def _armar_payment_intent(usuario, forma_pago_id, monto_frontend):
+    """Valida el carrito y el monto y devuelve (parámetros de PaymentIntent.create, monto a cobrar)"""
+    # 1️⃣ Verificar carrito activo
+    carrito = CarritoModel.objects.filter(usuario=usuario, is_active=True).first()
+    if not carrito or not carrito.carrito_detalles.exists():
+        raise ErrorPagoStripe("El carrito está vacío")
+
+    # 2️⃣ Calcular total en el backend
+    total_backend = Decimal(str(carrito.total))  # Convertir a Decimal
+    print("💰 Total calculado en backend:", total_backend)
+    
+    if total_backend <= 0:
+        raise ErrorPagoStripe("Total inválido")
+
+    # 3️⃣ VALIDACIÓN CRÍTICA: Comparar montos
+    if monto_frontend is not None:
+        monto_frontend = Decimal(str(monto_frontend))  # Convertir a Decimal
+        # Permitir pequeña diferencia por redondeo (1 Bs de tolerancia)
+        if abs(monto_frontend - total_backend) > Decimal('1.0'):
+            print(f"❌ Discrepancia en montos: Frontend={monto_frontend}, Backend={total_backend}")
+            raise ErrorPagoStripe("Discrepancia en el monto del carrito")
+    
+    # 4️⃣ Usar el monto del backend
+    monto_a_cobrar = total_backend
+
+    parametros = dict(
+        amount=int(monto_a_cobrar * 100),  # Convertir a centavos
+        currency='bob',
+        payment_method_types=['card'],
+        metadata={
+            'usuario_id': str(usuario.id),
+            'carrito_id': str(carrito.id),
+            'forma_pago_id': str(forma_pago_id),
+            'monto_total': str(monto_a_cobrar),
+            'monto_frontend': str(monto_frontend) if monto_frontend else 'no_proporcionado'
+        }
+    )
+    return parametros, monto_a_cobrar
+
+
 @api_view(['POST'])
 def crear_payment_intent_stripe(request):
     """Crear Payment Intent para Stripe Elements con validación de monto"""
@@ -220,58 +267,11 @@ def crear_payment_intent_stripe(request):
         
         print("🛒 Creando Payment Intent para usuario:", usuario.id)
         print("💰 Monto recibido del frontend:", monto_frontend)
-        
-        # 1️⃣ Verificar carrito activo
-        carrito = CarritoModel.objects.filter(usuario=usuario, is_active=True).first()
-        if not carrito or not carrito.carrito_detalles.exists():
-            return Response({
-                "status": 0,
-                "error": 1,
-                "message": "El carrito está vacío",
-                "values": {}
-            }, status=400)
-
-        # 2️⃣ Calcular total en el backend
-        total_backend = Decimal(str(carrito.total))  # Convertir a Decimal
-        print("💰 Total calculado en backend:", total_backend)
-        
-        if total_backend <= 0:
-            return Response({
-                "status": 0,
-                "error": 1,
-                "message": "Total inválido",
-                "values": {}
-            }, status=400)
-
-        # 3️⃣ VALIDACIÓN CRÍTICA: Comparar montos
-        if monto_frontend is not None:
-            monto_frontend = Decimal(str(monto_frontend))  # Convertir a Decimal
-            # Permitir pequeña diferencia por redondeo (1 Bs de tolerancia)
-            if abs(monto_frontend - total_backend) > Decimal('1.0'):
-                print(f"❌ Discrepancia en montos: Frontend={monto_frontend}, Backend={total_backend}")
-                return Response({
-                    "status": 0,
-                    "error": 1,
-                    "message": "Discrepancia en el monto del carrito",
-                    "values": {}
-                }, status=400)
-        
-        # 4️⃣ Usar el monto del backend
-        monto_a_cobrar = total_backend
+
+        parametros, monto_a_cobrar = _armar_payment_intent(usuario, forma_pago_id, monto_frontend)
         
         # 5️⃣ Crear Payment Intent
-        intent = stripe.PaymentIntent.create(
-            amount=int(monto_a_cobrar * 100),  # Convertir a centavos
-            currency='bob',
-            payment_method_types=['card'],
-            metadata={
-                'usuario_id': str(usuario.id),
-                'carrito_id': str(carrito.id),
-                'forma_pago_id': str(forma_pago_id),
-                'monto_total': str(monto_a_cobrar),
-                'monto_frontend': str(monto_frontend) if monto_frontend else 'no_proporcionado'
-            }
-        )
+        intent = stripe.PaymentIntent.create(**parametros, **opciones_stripe(request))
 
         print("✅ Payment Intent creado:", intent.id)
         print("🔑 Client Secret:", intent.client_secret)
@@ -287,6 +287,13 @@ def crear_payment_intent_stripe(request):
             }
         })
 
+    except ErrorPagoStripe as e:
+        return Response({
+            "status": 0,
+            "error": 1,
+            "message": str(e),
+            "values": {}
+        }, status=400)
     except Exception as e:
         print("❌ Error:", str(e))
         return Response({
@@ -294,4 +301,4 @@ def crear_payment_intent_stripe(request):
             "error": 1,
             "message": f"Error interno: {str(e)}",
             "values": {}
-        }, status=500)
\ No newline at end of file
+        }, status=500)